@@ -0,0 +1,102 @@
+"""
+chunk count benchmark: the old fixed 50,000 character slices of raw css + html (chunk_text)
+against the preprocessed views packed by ChunkPacker
+
+usage: python src/benchmarks/bench_chunking.py [page.html ...]
+without arguments a synthetic site with bloated pages (vendor css, inline js, svg, base64 images) is used
+"""
+import base64
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from functions.chunking import ChunkPacker, MAX_CHARS_PER_CHUNK, chunk_text
+from functions.preprocess import ContentView, StyleView
+from functions.tokens import estimate_tokens
+
+STYLE = "modern minimalist"
+
+def vendor_css(rules=4000) -> str:
+    """framework-sized stylesheet, most of it unused by any one page"""
+    rng = random.Random(1)
+    css = []
+    for i in range(rules):
+        css.append(f".u-{i}, .u-{i}-hover:hover {{\n  margin: {rng.randint(0, 40)}px;\n  color: #{rng.randint(0, 0xffffff):06x};\n}}\n")
+    css.append(".hero { padding: 4rem 2rem; }\n.card { border-radius: 8px; }\n@media (max-width: 600px) { .hero { padding: 1rem; } }\n")
+    return "".join(css)
+
+def sample_page(number: int) -> str:
+    icon = "<svg viewBox='0 0 24 24'>" + "<path d='M0 0h24v24H0z'/>" * 200 + "</svg>"
+    image = base64.b64encode(os.urandom(60000)).decode()
+    script = "<script>" + "window.dataLayer=window.dataLayer||[];" * 2000 + "</script>"
+    nav = "<nav><ul>" + "".join(f"<li class='u-{i}'><a href='/page-{i}'>Page {i}</a></li>" for i in range(12)) + "</ul></nav>"
+    sections = "".join(
+        f"<section class='card'><h2>Service {number}.{i}</h2><p>We provide service {i} to customers in the area. "
+        f"Call 555-01{i:02d} for a quote.</p>{icon}</section>"
+        for i in range(6)
+    )
+    return (
+        f"<html><head><title>Acme page {number}</title><style>.card h2 {{ font-size: 2rem; }}</style></head>"
+        f"<body>{script}{nav}<div class='hero'><h1>Acme page {number}</h1>"
+        f"<img alt='hero' src='data:image/png;base64,{image}'></div>{sections}"
+        f"<footer><p>Acme Inc, 1 Main St</p></footer></body></html>"
+    )
+
+def load_pages(paths):
+    if not paths:
+        css = vendor_css()
+        pages = {f"https://acme.test/page-{i}": sample_page(i) for i in range(20)}
+        return pages, {"vendor": css}
+
+    pages = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            pages[path] = f.read()
+    return pages, {}
+
+def old_chunks(pages, stylesheets):
+    """every page as raw css + html, sliced at MAX_CHARS_PER_CHUNK, sent to both agents"""
+    chunks = []
+    for page_url, html in pages.items():
+        css = "\n".join(stylesheets.values())
+        chunks.extend(chunk_text(f"URL: {page_url}\nCSS:\n{css}\nHTML:\n{html}\n", MAX_CHARS_PER_CHUNK))
+    return chunks
+
+def new_chunks(pages, stylesheets, view):
+    packer = ChunkPacker(STYLE)
+    chunks = []
+    for page_url, html in pages.items():
+        soup = BeautifulSoup(html, "html.parser")
+        page = {"html": html, "css": "", "stylesheets": list(stylesheets)}
+        chunks.extend(packer.add(page_url, view(page_url, page, soup, stylesheets)))
+    return chunks + packer.flush()
+
+def main():
+    pages, stylesheets = load_pages(sys.argv[1:])
+
+    start = time.perf_counter()
+    old = old_chunks(pages, stylesheets)
+    old_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    content = new_chunks(pages, stylesheets, ContentView())
+    style = new_chunks(pages, stylesheets, StyleView())
+    new_time = time.perf_counter() - start
+
+    old_tokens = 2 * sum(estimate_tokens(chunk) for chunk in old) # both agents got every chunk
+    new_tokens = sum(estimate_tokens(chunk) for chunk in content + style)
+
+    print(f"pages: {len(pages)}, raw size: {sum(map(len, pages.values())):,} chars")
+    print(f"{'':<28}{'api calls':>12}{'est. tokens':>14}{'seconds':>10}")
+    print(f"{'chunk_text (both agents)':<28}{2 * len(old):>12}{old_tokens:>14,}{old_time:>10.2f}")
+    print(f"{'packed agent 1 + agent 2':<28}{len(content) + len(style):>12}{new_tokens:>14,}{new_time:>10.2f}")
+    print(f"{'  agent 1 (content)':<28}{len(content):>12}")
+    print(f"{'  agent 2 (css)':<28}{len(style):>12}")
+
+if __name__ == "__main__":
+    main()
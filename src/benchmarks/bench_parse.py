@@ -0,0 +1,97 @@
+"""
+page parsing micro-benchmark: the old BeautifulSoup tree + four find_all walks against the
+single-pass PageExtractor, serial and on a process pool
+
+usage: python src/benchmarks/bench_parse.py [--pages 24] [--size 2000000] [page.html ...]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from functions.web_scraper import parse_page
+
+PAGE_URL = "https://acme.test/services/index.html"
+
+def parse_page_soup(html: str, page_url: str) -> dict:
+    """the previous implementation, kept here as the baseline"""
+    soup = BeautifulSoup(html, "html.parser")
+    links = [urljoin(page_url, a.get("href")) for a in soup.find_all("a") if a.get("href")]
+    inline_css = [tag['style'] for tag in soup.find_all(style=True)]
+    inline_css.extend(style_tag.text for style_tag in soup.find_all('style'))
+    stylesheets = [urljoin(page_url, tag.get('href')) for tag in soup.find_all('link', rel="stylesheet") if tag.get('href')]
+    return {"links": links, "inline_css": inline_css, "stylesheets": stylesheets}
+
+def large_page(number: int, size: int) -> str:
+    """a page of roughly `size` characters: nav, cards with inline styles, style blocks, stylesheets"""
+    rng = random.Random(number)
+    head = "".join(f"<link rel='stylesheet' href='/css/{k}.css'>" for k in range(6))
+    head += "<link rel='icon' href='/favicon.ico'><style>.hero{padding:4rem}</style>"
+    parts = [f"<html><head><title>Page {number}</title>{head}</head><body><nav><ul>"]
+    parts.extend(f"<li><a href='/page-{i}.html?ref=nav&amp;x={i}'>Page {i}</a></li>" for i in range(40))
+    parts.append("</ul></nav><main>")
+    length = sum(map(len, parts))
+    card = 0
+    while length < size:
+        piece = (f"<section class='card c{card % 17}' style='margin:{rng.randint(0, 40)}px'>"
+                 f"<h2>Card {card}</h2><p>Text for card {card} with <a href='#c{card}'>an anchor</a> "
+                 f"and <a href='https://other.test/{card}'>an external link</a> &copy; 2024.</p>"
+                 f"<style>.c{card % 17} h2{{color:#{rng.randint(0, 0xffffff):06x}}}</style>"
+                 f"<img src='/img/{card}.png' alt='card {card}'></section>")
+        parts.append(piece)
+        length += len(piece)
+        card += 1
+    parts.append("</main><footer><a href='/contact'>Contact</a></footer></body></html>")
+    return "".join(parts)
+
+def timed(function, pages):
+    start = time.perf_counter()
+    results = [function(html, PAGE_URL) for html in pages]
+    return results, time.perf_counter() - start
+
+def timed_pool(pages, workers):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pool.submit(int).result() # start the workers before timing
+        start = time.perf_counter()
+        results = list(pool.map(parse_page, pages, [PAGE_URL] * len(pages)))
+        return results, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="page parsing micro-benchmark")
+    parser.add_argument("--pages", type=int, default=24)
+    parser.add_argument("--size", type=int, default=2_000_000, help="characters per generated page")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("files", nargs="*")
+    args = parser.parse_args()
+
+    if args.files:
+        pages = []
+        for path in args.files:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+    else:
+        pages = [large_page(number, args.size) for number in range(args.pages)]
+    total = sum(map(len, pages))
+
+    old, old_time = timed(parse_page_soup, pages)
+    new, new_time = timed(parse_page, pages)
+    pooled, pool_time = timed_pool(pages, args.workers)
+    # the baseline predates image collection, only the fields it has are compared
+    compared = lambda results: [{key: page[key] for key in ("links", "inline_css", "stylesheets")} for page in results]
+    assert old == compared(new) == compared(pooled), "single-pass extraction differs from the BeautifulSoup baseline"
+
+    print(f"pages: {len(pages)}, {total:,} chars, {sum(len(page['links']) for page in new):,} links")
+    print(f"{'':<34}{'seconds':>10}{'MB/s':>10}")
+    print(f"{'bs4 tree + 4 find_all (old)':<34}{old_time:>10.2f}{total / old_time / 1e6:>10.1f}")
+    print(f"{'single pass':<34}{new_time:>10.2f}{total / new_time / 1e6:>10.1f}")
+    print(f"{f'single pass, {args.workers} processes':<34}{pool_time:>10.2f}{total / pool_time / 1e6:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+end to end offline benchmark: fixture site on a local http server, fake gemini backend
+
+the fixture pages show a few photos (one served twice, one only from css) for the asset pipeline
+the fake answers every summary chunk (and keeps cached contexts in memory), runs agent 3 (writes every page of the fixture site through the
+file tools) and agent 4 (reads a file, then passes it) with simulated latency and 429s; every sleep is
+virtual, so wall time is the pipeline's own cpu/io cost and the simulated api time is reported apart
+
+usage: python src/benchmarks/bench_pipeline.py [--pages 40] [--stylesheets 4] [--links 6] [--rate-429 0.05] [--site-latency 0.05]
+                                              [--no-context-cache] [--no-stream]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.genai import types
+from PIL import Image
+
+import functions.api as api
+import functions.key_pool as key_pool
+from functions.assets import load_manifest
+from functions.checkpoint import Run
+from functions.context_cache import LocalCaches
+from functions.key_pool import KeyPool
+from functions.rate_limit import limiter_for
+from functions.trace import tracer
+from functions.crawler import scrape_website_concurrent
+from functions.web_scraper import scrape_website
+import main
+
+STYLE = "modern minimalist"
+KEYS = ["bench-key-0001", "bench-key-0002"]
+
+# fixture site
+
+def page_path(number: int) -> str:
+    return "/" if number == 0 else f"/page-{number}.html"
+
+def page_file(number: int) -> str:
+    return page_path(number).lstrip("/") or "index.html"
+
+def page_body(number: int, pages: int, links: int, href=page_path) -> str:
+    """visible part of a page, also what the fake coding agent writes back (with file links)"""
+    rng = random.Random(number)
+    targets = sorted({(number + 1) % pages, *(rng.randrange(pages) for _ in range(links))})
+    nav = "".join(f"<li><a href='{href(target)}'>Page {target}</a></li>" for target in targets)
+    sections = "".join(
+        f"<section class='card card-{i}'><h2>Service {number}.{i}</h2>"
+        f"<p>We provide service {i} to customers around town, ask for package {number}-{i}.</p></section>"
+        for i in range(4)
+    )
+    photo = f"<img src='/img/photo-{number % 3}.png' alt='Photo {number % 3}'>" if href is page_path else ""
+    return (
+        f"<nav><ul>{nav}</ul></nav><h1>Acme page {number}</h1>{photo}{sections}"
+        f"<footer><p>Call (555) 010-{number:04d}, {100 + number} Main Street</p></footer>"
+    )
+
+def fixture_image(number: int, fmt="PNG") -> bytes:
+    """1600x1000 color gradient, twice the size the asset pipeline keeps"""
+    image = Image.new("RGB", (1600, 1000))
+    image.putdata([((x + number * 40) % 256, y % 256, (x * y) % 256) for y in range(1000) for x in range(1600)])
+    out = io.BytesIO()
+    image.save(out, fmt)
+    return out.getvalue()
+
+def fixture_site(pages: int, stylesheets: int, links: int) -> dict:
+    """{path: (body, content type)}, 3 photos on the pages, one copy of a photo and a css background image"""
+    site = {}
+    for number in range(3):
+        site[f"/img/photo-{number}.png"] = (fixture_image(number), "image/png")
+    site["/img/copy-0.png"] = site["/img/photo-0.png"] # same file under another url
+    site["/img/hero.jpg"] = (fixture_image(3, "JPEG"), "image/jpeg")
+    sheet_links = "".join(f"<link rel='stylesheet' href='/css/site-{k}.css'>" for k in range(stylesheets))
+    for number in range(pages):
+        html = (f"<html><head><title>Acme {number}</title>{sheet_links}<style>.card h2 {{ font-size: 2rem; }}</style></head>"
+                f"<body>{page_body(number, pages, links)}</body></html>")
+        site[page_path(number)] = (html, "text/html")
+    for k in range(stylesheets):
+        css = "".join(f".card-{i} {{ margin: {i + k}px; color: #{(i * 4099 + k) % 0xffffff:06x}; }}\n" for i in range(200))
+        css += ".hero { background: url('../img/hero.jpg'); } .logo { background: url(/img/copy-0.png); }\n"
+        site[f"/css/site-{k}.css"] = (css, "text/css")
+    return site
+
+def serve(site: dict, latency=0.0):
+    """serves the fixture site on a free local port (each answer `latency` seconds late), returns (server, base url)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if latency:
+                time.sleep(latency) # a real delay, the crawler has to overlap it
+            body, content_type = site.get(self.path.split("?")[0], (None, None))
+            if body is None:
+                self.send_error(404)
+                return
+            data = body if isinstance(body, bytes) else body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+# virtual time
+
+class VirtualTime:
+    """stands in for the time module of the api code: sleep() only advances a shared virtual offset"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slept = 0.0
+
+    def sleep(self, seconds: float):
+        with self.lock:
+            self.slept += max(seconds, 0.0)
+
+    def monotonic(self) -> float:
+        return time.monotonic() + self.slept
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+# fake gemini backend
+
+class FakeBackend:
+    """
+    deterministic stand-in for the gemini api, shared by every fake client
+    latency = base + per 1k prompt tokens, every call fails with a 429 with probability rate_429
+    """
+
+    def __init__(self, clock: VirtualTime, pages: int, links: int, latency=0.8, latency_per_1k=0.05, rate_429=0.05,
+                 caches=None):
+        self.clock = clock
+        self.caches = caches or LocalCaches() # cached contexts, shared like the backend (one per key on the real api)
+        self.pages = pages
+        self.links = links
+        self.latency = latency
+        self.latency_per_1k = latency_per_1k
+        self.rate_429 = rate_429
+        self.rng = random.Random(0)
+        self.lock = threading.Lock()
+        self.calls = {}  # model -> calls answered
+        self.rejected = 0
+        self.tool_calls = 0
+
+    def _response(self, parts, prompt_tokens, cached_tokens=0):
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=parts))],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens, candidates_token_count=200, total_token_count=prompt_tokens + 200,
+                cached_content_token_count=cached_tokens or None),
+        )
+
+    def _agent_turn(self, tools: set, turn: int):
+        """agent 3 creates the site on its first turn, agent 4 reads a page then passes it"""
+        if "write_file" in tools and turn == 1:
+            calls = []
+            for number in range(self.pages):
+                html = (f"<!DOCTYPE html><html><head><meta name='viewport' content='width=device-width, initial-scale=1'>"
+                        f"<link rel='stylesheet' href='style.css'></head><body>{page_body(number, self.pages, self.links, page_file)}</body></html>")
+                calls.append(types.Part.from_function_call(name="create_file", args={"filepath": page_file(number), "content": html}))
+            calls.append(types.Part.from_function_call(name="create_file", args={"filepath": "style.css", "content": "body { margin: 0; } .card h2 { font-size: 2rem; }"}))
+            return calls
+        if "write_file" not in tools and turn == 1:
+            return [types.Part.from_function_call(name="read_file_contents", args={"filepath": "index.html"})]
+        if "write_file" in tools:
+            return [types.Part(text="built every page")]
+        return [types.Part(text="looks complete\nVERDICT: PASS")]
+
+    def generate_content(self, model: str, contents=None, config=None):
+        prompt_tokens = api.request_tokens(contents if isinstance(contents, list) else [contents])
+        cached_tokens = 0
+        if getattr(config, "cached_content", None): # tools and context come from the cached content
+            config = self.caches.get(name=config.cached_content)
+            cached_tokens = api.request_tokens(config.contents) + api.request_tokens([config.system_instruction])
+        elif getattr(config, "system_instruction", None):
+            prompt_tokens += api.request_tokens([config.system_instruction])
+        prompt_tokens += cached_tokens
+        self.clock.sleep(self.latency + self.latency_per_1k * (prompt_tokens - cached_tokens) / 1000) # cached input is cheap
+
+        with self.lock:
+            if self.rng.random() < self.rate_429:
+                self.rejected += 1
+                raise Exception("429 RESOURCE_EXHAUSTED {'retryDelay': '2s'}")
+            self.calls[model] = self.calls.get(model, 0) + 1
+
+        tools = {declaration.name for tool in (getattr(config, "tools", None) or []) for declaration in tool.function_declarations}
+        if not tools: # summarizer
+            chunk = contents if isinstance(contents, str) else str(contents)
+            summary = f"summary of {prompt_tokens} tokens\n\n{chunk[:len(chunk) // 3]}" # about as long as a real one
+            return self._response([types.Part(text=summary)], prompt_tokens)
+
+        turn = sum(1 for content in contents if content.role == "model") + 1
+        parts = self._agent_turn(tools, turn)
+        with self.lock:
+            self.tool_calls += sum(1 for part in parts if part.function_call)
+        return self._response(parts, prompt_tokens, cached_tokens)
+
+    def generate_content_stream(self, model: str, contents=None, config=None):
+        """the same answer as generate_content, one chunk per part with the usage on the last one"""
+        response = self.generate_content(model, contents=contents, config=config)
+        parts = response.candidates[0].content.parts
+        for index, part in enumerate(parts):
+            self.clock.sleep(self.latency / 10) # time between chunks
+            last = index == len(parts) - 1
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))],
+                usage_metadata=response.usage_metadata if last else None,
+            )
+
+class FakeClient:
+    def __init__(self, backend: FakeBackend):
+        self.models = backend
+        self.caches = backend.caches
+
+# benchmark
+
+def bench_crawl(crawl, base_url: str, expected: int) -> tuple:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        site_map = crawl(base_url, max_pages=expected)
+    return len(site_map), time.perf_counter() - start
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="offline pipeline benchmark")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--stylesheets", type=int, default=4)
+    parser.add_argument("--links", type=int, default=6, help="extra links per page")
+    parser.add_argument("--rate-429", type=float, default=0.05)
+    parser.add_argument("--latency", type=float, default=0.8, help="simulated seconds per api call")
+    parser.add_argument("--site-latency", type=float, default=0.0, help="real seconds the fixture server takes per response")
+    parser.add_argument("--no-stream", action="store_true", help="agent 3 waits for whole responses instead of streaming")
+    parser.add_argument("--no-context-cache", action="store_true", help="the fake refuses context caching, summaries go inline")
+    args = parser.parse_args()
+
+    site = fixture_site(args.pages, args.stylesheets, args.links)
+    server, base_url = serve(site, args.site_latency)
+    site_bytes = sum(len(body) for body, _ in site.values())
+
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.chdir(workdir)
+    os.environ["CRAWL_CACHE_DIR"] = os.path.join(workdir, "crawl_cache")
+    os.environ["AGENT3_STREAM"] = "0" if args.no_stream else "1"
+
+    # every sleep in the api code becomes virtual, rate limiters run on the same virtual clock
+    clock = VirtualTime()
+    api.time = clock
+    key_pool.time = clock
+    for key in KEYS:
+        for model in (main.SUMMARY_MODEL, main.AGENT3_MODEL, main.AGENT4_MODEL):
+            limiter_for(key, model, clock=clock.monotonic)
+
+    backend = FakeBackend(clock, args.pages, args.links, latency=args.latency, rate_429=args.rate_429,
+                          caches=LocalCaches(available=not args.no_context_cache))
+    pool = KeyPool(KEYS, make_client=lambda key: FakeClient(backend))
+
+    crawls = [(name, *bench_crawl(crawl, base_url, args.pages))
+              for name, crawl in (("scrape_website", scrape_website), ("scrape_website_concurrent", scrape_website_concurrent))]
+
+    run = Run.start(base_url, STYLE, site_dir="final_product")
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.revamp_site(run, pool, "final_product")
+    wall = time.perf_counter() - start
+    server.shutdown()
+
+    spans = tracer.spans
+    summary_calls = backend.calls.get(main.SUMMARY_MODEL, 0)
+    print(f"fixture: {args.pages} pages, {args.stylesheets} stylesheets, {site_bytes:,} bytes, run dir {workdir}")
+    for name, pages, seconds in crawls:
+        print(f"{name:<32}{pages:>6} pages {seconds:>8.2f} s {pages / seconds:>8.1f} pages/s")
+    print(f"{'crawl + summaries (pipeline)':<32}{spans['crawl + summaries'][1]:>21.2f} s")
+    print(f"{'chunks summarized':<32}{summary_calls:>6}")
+    print(f"{'api calls (per model)':<32}{sum(backend.calls.values()):>6}  {backend.calls}")
+    print(f"{'simulated 429s':<32}{backend.rejected:>6}")
+    print(f"{'tool calls':<32}{backend.tool_calls:>6}")
+    assets = [entry["path"] for entry in load_manifest("final_product")]
+    print(f"{'images in assets/':<32}{len(assets):>6}  {assets}")
+    print(f"{'cached contexts (created/refreshed)':<32}{backend.caches.created:>6} / {backend.caches.refreshed}")
+    print(f"{'iterations':<32}{run.state['loop']['iteration']:>6}")
+    print(f"{'simulated api + wait time':<32}{clock.slept:>21.2f} s (virtual)")
+    print(f"{'wall time (pipeline)':<32}{wall:>21.2f} s")
+    print()
+    print(tracer.summary())
+
+if __name__ == "__main__":
+    main_bench()
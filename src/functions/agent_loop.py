@@ -0,0 +1,145 @@
+import contextvars
+import queue
+import threading
+from google.genai import types
+
+from functions.api import api_call_with_retry, stream_with_retry, request_tokens, usage_tokens
+from functions.call_functions import run_batch
+from functions.tokens import estimate_tokens
+
+MAX_TURNS = 12        # model calls per agent session
+MAX_TOKENS = 600_000  # total tokens (prompt + output, summed over turns) per agent session
+MAX_TURN_OUTPUT = 60_000 # estimated output tokens after which a streamed turn is cut off as runaway
+STALL_SECONDS = 120   # a stream without a new chunk for this long is given up as stuck
+
+def function_response_turn(calls, results) -> types.Content:
+    """one user turn answering every function call of the previous model turn"""
+    parts = []
+    for call, call_result in zip(calls, results):
+        parts.append(types.Part.from_function_response(name=call.name, response={"result": call_result.result}))
+    return types.Content(role="user", parts=parts)
+
+def stream_turn(client, model: str, config, contents, batch, limiter=None, max_output=MAX_TURN_OUTPUT,
+                stall_seconds=STALL_SECONDS):
+    """
+    one streamed model turn, every function call is submitted to `batch` (a StreamingBatch) as soon as its
+    chunk arrives, so files are written while the rest of the response is still generating
+    the turn is cut off once it produced more than max_output tokens or no chunk came for stall_seconds
+    returns (model parts, function calls, usage tokens or None, reason it was cut off or None)
+    """
+    chunks = queue.Queue()
+    stop = threading.Event()
+
+    def read():
+        stream = None
+        try:
+            stream = stream_with_retry(client=client, contents=contents, model=model, config=config, limiter=limiter)
+            for chunk in stream:
+                chunks.put(chunk)
+                if stop.is_set(): # a cut off stream is closed at its next chunk, the thread cannot interrupt a read
+                    break
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            if stream is not None:
+                stream.close()
+            chunks.put(None)
+
+    # the reader runs in this context, so its usage is booked on the caller's span
+    threading.Thread(target=contextvars.copy_context().run, args=(read,), daemon=True).start()
+
+    parts, calls = [], []
+    output, used, cut_off = 0, None, None
+    timeout = None # no stall timer before the first chunk, quota waits and 429 retries happen there
+    try:
+        while True:
+            try:
+                chunk = chunks.get(timeout=timeout)
+            except queue.Empty:
+                cut_off = f"no output for {stall_seconds}s"
+                break
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            timeout = stall_seconds
+            used = usage_tokens(chunk) or used
+
+            content = chunk.candidates[0].content if chunk.candidates else None
+            for part in (content.parts or []) if content is not None else []:
+                parts.append(part)
+                if part.function_call: # gemini sends every call whole, never split over chunks
+                    calls.append(part.function_call)
+                    batch.submit(part.function_call)
+                    output += estimate_tokens(str(part.function_call.args))
+                elif part.text:
+                    output += estimate_tokens(part.text)
+            if output > max_output:
+                cut_off = f"more than {max_output} output tokens"
+                break
+    finally:
+        stop.set()
+    return parts, calls, used, cut_off
+
+def run_agent(client, model: str, config, prompt: str, limiter=None, max_turns=MAX_TURNS, max_tokens=MAX_TOKENS,
+              execute=run_batch, stream_batch=None) -> str:
+    """
+    multi-turn tool loop
+    the conversation history is kept and every batch of tool results goes back to the model in a single turn,
+    the session ends when the model answers without calling a tool (it is done) or a budget runs out
+    with stream_batch (makes a StreamingBatch) every turn is streamed and its calls run while it generates
+    returns the last text the model produced
+    """
+    contents = [types.Content(role="user", parts=[types.Part(text=prompt)])]
+    tokens_used = 0
+    text = ""
+    batch = stream_batch() if stream_batch is not None else None
+
+    try:
+        for turn in range(1, max_turns + 1):
+            cut_off = None
+            if batch is None:
+                response = api_call_with_retry(
+                    client=client,
+                    contents=contents,
+                    model=model,
+                    config=config,
+                    limiter=limiter,
+                )
+                used = usage_tokens(response)
+                content = response.candidates[0].content if response.candidates else None
+                calls = response.function_calls
+            else:
+                parts, calls, used, cut_off = stream_turn(client, model, config, contents, batch, limiter)
+                content = types.Content(role="model", parts=parts) if parts else None
+            tokens_used += used or request_tokens(contents)
+
+            if content is None:
+                print(f"turn {turn}: empty response, stopping")
+                break
+            contents.append(content) # keep the model turn (tool calls included) in the history
+            if cut_off:
+                print(f"turn {turn}: generation cut off ({cut_off}), keeping the {len(calls or [])} calls that arrived")
+
+            turn_text = "".join(part.text for part in content.parts or [] if part.text)
+            if turn_text:
+                text = turn_text
+
+            if not calls: # the model answered without tools, it is done
+                break
+
+            results = batch.results() if batch is not None else execute(calls) # CallResults, in call order
+            for call_result in results:
+                print(f"{call_result.name} ({call_result.seconds * 1000:.1f} ms): {call_result.result}")
+            contents.append(function_response_turn(calls, results))
+
+            if tokens_used >= max_tokens:
+                print(f"token budget used up after {turn} turns ({tokens_used} tokens)")
+                break
+        else:
+            print(f"turn budget used up ({max_turns} turns)")
+    finally:
+        if batch is not None:
+            batch.close()
+
+    return text
@@ -0,0 +1,160 @@
+import random
+import re
+import time
+from contextlib import nullcontext
+
+from functions.tokens import estimate_tokens
+from functions.trace import count, record_usage, span, tracer
+
+# "retryDelay": "37s" inside the error details gemini sends with a 429
+RETRY_DELAY = re.compile(r"retry_?delay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", re.IGNORECASE)
+
+class RetriesExhausted(Exception):
+    """raised when api_call_with_retry keeps getting 429s after max_retries attempts"""
+
+def retry_after(error):
+    """seconds the server asked us to wait (Retry-After header or retryDelay detail), None if it did not say"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        try:
+            return float(headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            pass
+
+    match = RETRY_DELAY.search(str(error))
+    return float(match.group(1)) if match else None
+
+def request_tokens(contents) -> int:
+    """local estimate of the prompt size of a generate_content call"""
+    return sum(estimate_tokens(part if isinstance(part, str) else str(part)) for part in contents or [])
+
+def usage_tokens(response):
+    """total tokens reported in the response usage metadata, None if missing"""
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None)
+
+def book_tokens(limiter, estimated: int, response):
+    """settles a reservation with the usage the response reported (the estimate if it reported none)"""
+    actual = usage_tokens(response)
+    limiter.record(estimated, actual if actual is not None else estimated)
+
+def stream_chunks(first, stream, finished):
+    """
+    yields first and the rest of a response stream, then closes it (also when the caller stops early)
+    and calls finished(last chunk carrying usage metadata, or None); streamed usage is cumulative, the last one has the totals
+    """
+    last_usage = None
+    try:
+        chunk = first
+        while chunk is not None:
+            if getattr(chunk, "usage_metadata", None) is not None:
+                last_usage = chunk
+            yield chunk
+            chunk = next(stream, None)
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close() # stops the download when the caller cut the stream off
+        finished(last_usage)
+
+def _times_requests(client) -> bool:
+    return getattr(client, "times_requests", False)
+
+def _request_span(client, name: str, **attrs):
+    return nullcontext() if _times_requests(client) else span(name, **attrs)
+
+def _reserve(limiter, estimated: int):
+    """only wait as long as the quota window actually requires"""
+    if limiter is not None:
+        wait = limiter.reserve(estimated)
+        if wait > 0:
+            count("api.quota_wait_s", wait)
+            with span("quota wait"): # kept out of the "api call" span, which times the request alone
+                time.sleep(wait)
+
+def _back_off(error, limiter, estimated: int, backoff: float) -> float:
+    """waits out a 429, returns the next fallback backoff"""
+    # honor the server's retry hint, fall back to exponential backoff
+    hint = retry_after(error)
+    wait = hint if hint is not None else backoff + random.random()
+    print(f"429 received - waiting {wait:.2f}s...")
+    count("api.429")
+    count("api.backoff_s", wait)
+    if limiter is not None:
+        limiter.pause(wait) # the whole key is out of quota, not just this call
+        limiter.record(estimated, 0) # rejected requests do not use up tokens
+    else:
+        time.sleep(wait) # sleep
+    return min(backoff * 4, 60)
+
+def api_call_with_retry(client, *args, limiter=None, max_retries=10, **kwargs):
+    """
+    calls api, pacing it with the key's rate limiter (if given) and waiting if limits exhausted
+    raises RetriesExhausted instead of returning None when every retry hit a 429
+    a client that times its own requests (KeyPool, its quota waits happen inside the call) is not wrapped in a span
+    """
+
+    backoff = 1
+    retries = 0
+    estimated = request_tokens(kwargs.get("contents"))
+
+    while retries < max_retries:
+        _reserve(limiter, estimated)
+
+        try:
+            with _request_span(client, "api call", model=kwargs.get("model")):
+                response = client.models.generate_content(*args, **kwargs) # generate response
+        except Exception as e: 
+            if "429" not in str(e): # only rate limit errors are retried
+                raise e
+            backoff = _back_off(e, limiter, estimated, backoff)
+            retries += 1 # increment
+            continue
+
+        if limiter is not None:
+            book_tokens(limiter, estimated, response)
+        record_usage(kwargs.get("model"), response)
+        return response
+
+    raise RetriesExhausted(f"rate limited {max_retries} times in a row, giving up")
+
+def stream_with_retry(client, *args, limiter=None, max_retries=10, **kwargs):
+    """
+    api_call_with_retry for generate_content_stream, returns an iterator over the response chunks
+    429s are retried until the first chunk arrives, an error after that ends the stream;
+    usage is booked from the last chunk carrying it once the stream is done (or closed early)
+    """
+
+    backoff = 1
+    retries = 0
+    estimated = request_tokens(kwargs.get("contents"))
+
+    while retries < max_retries:
+        _reserve(limiter, estimated)
+
+        start = time.perf_counter()
+        try:
+            stream = iter(client.models.generate_content_stream(*args, **kwargs))
+            first = next(stream, None) # the request only goes out (and can be rejected) here
+        except Exception as e:
+            if "429" not in str(e):
+                raise e
+            backoff = _back_off(e, limiter, estimated, backoff)
+            retries += 1
+            continue
+
+        return _stream_chunks(first, stream, start, limiter, estimated, kwargs.get("model"), timed=not _times_requests(client))
+
+    raise RetriesExhausted(f"rate limited {max_retries} times in a row, giving up")
+
+def _stream_chunks(first, stream, start, limiter, estimated: int, model, timed=True):
+    def finished(last_usage):
+        if timed:
+            tracer.record_span("api stream", time.perf_counter() - start, model=model)
+        if limiter is not None:
+            book_tokens(limiter, estimated, last_usage)
+        if last_usage is not None:
+            record_usage(model, last_usage)
+
+    return stream_chunks(first, stream, finished)
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+import httpx
+from PIL import Image
+
+from functions.crawler import MAX_PER_HOST, TIMEOUT
+from functions.workspace import atomic_write
+from functions.trace import count
+
+ASSETS_DIR = "assets"  # inside the site directory, next to the generated pages
+MANIFEST = "manifest.json"
+MAX_SIZE = 800         # px, longest side of a processed image
+JPEG_QUALITY = 70
+MAX_ASSETS = 200       # distinct image urls fetched per site
+MAX_ASSET_BYTES = 10_000_000 # bigger downloads are skipped
+PROCESS_WORKERS = (os.cpu_count() or 1) - 1 # processes running pillow, 0 runs it on a thread
+
+def shrink_image(data: bytes, max_size=MAX_SIZE):
+    """
+    grayscale copy of an image, no side longer than max_size
+    returns (bytes, extension, width, height), None if pillow cannot read it (svg, html error pages, ...)
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("L", (max_size, max_size)) # jpegs are decoded at a reduced scale straight away
+            has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+            image = image.convert("LA" if has_alpha else "L") # first frame only for animations
+            image.thumbnail((max_size, max_size))
+            out = io.BytesIO()
+            if has_alpha:
+                image.save(out, "PNG", optimize=True)
+                extension = "png"
+            else:
+                image.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+                extension = "jpg"
+            return out.getvalue(), extension, image.width, image.height
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+class AssetPipeline:
+    """
+    images of the crawled site, downloaded once each and stored as small grayscale copies in <site_dir>/assets/
+    pages report their images with add() while the crawl runs, downloads start right away (start() first),
+    identical files behind different urls are processed once (content hash), pillow runs on a process pool
+    finish() waits for the rest and writes assets/manifest.json, which the agents get to reference images by path
+    """
+
+    def __init__(self, site_dir: str, max_assets=MAX_ASSETS, workers=PROCESS_WORKERS, client=None):
+        self.site_dir = site_dir
+        self.directory = os.path.join(site_dir, ASSETS_DIR)
+        self.max_assets = max_assets
+        self.workers = workers
+        self.client = client # optional pre-built httpx.AsyncClient
+        self.images = {}     # image url -> {"alt": text, "pages": [page urls]}
+        self.entries = {}    # content hash -> manifest entry
+        self.by_hash = {}    # content hash -> in-flight processing, shared by urls serving the same file
+        self.tasks = []
+        self.running = False
+
+    def add(self, page_url: str, images):
+        """records a page's images ({"src", "alt"} dicts), new urls are fetched now if the pipeline is running"""
+        for image in images:
+            known = self.images.get(image["src"])
+            if known is not None:
+                known["alt"] = known["alt"] or image["alt"]
+                if page_url not in known["pages"]:
+                    known["pages"].append(page_url)
+                continue
+            if len(self.images) >= self.max_assets:
+                count("assets.over_limit")
+                continue
+            self.images[image["src"]] = {"alt": image["alt"], "pages": [page_url]}
+            if self.running:
+                self.tasks.append(asyncio.ensure_future(self._fetch(image["src"])))
+
+    async def start(self):
+        self.host_limits = defaultdict(lambda: asyncio.Semaphore(MAX_PER_HOST))
+        self.owns_client = self.client is None
+        if self.owns_client:
+            self.client = httpx.AsyncClient(timeout=TIMEOUT, follow_redirects=True)
+        self.pool = None
+        if self.workers:
+            # spawned, not forked: batch mode runs sites on several threads
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self.running = True
+        self.tasks = [asyncio.ensure_future(self._fetch(src)) for src in self.images]
+
+    async def _download(self, src: str):
+        async with self.host_limits[urlparse(src).netloc]:
+            try:
+                response = await self.client.get(src)
+            except (httpx.HTTPError, httpx.InvalidURL):
+                return None
+        if response.status_code != 200 or len(response.content) > MAX_ASSET_BYTES:
+            return None
+        count("assets.bytes_in", len(response.content))
+        return response.content
+
+    async def _process(self, digest: str, data: bytes):
+        """shrinks one distinct file and stores it, returns its manifest entry (None if it is not an image)"""
+        if self.pool is not None:
+            result = await asyncio.get_running_loop().run_in_executor(self.pool, shrink_image, data)
+        else:
+            result = await asyncio.to_thread(shrink_image, data) # pillow releases the gil while decoding
+        if result is None:
+            count("assets.unreadable")
+            return None
+        image, extension, width, height = result
+        path = f"{ASSETS_DIR}/{digest[:16]}.{extension}"
+        await asyncio.to_thread(atomic_write, os.path.join(self.site_dir, path), image)
+        count("assets.bytes_out", len(image))
+        entry = {"path": path, "width": width, "height": height, "alt": "", "sources": [], "pages": []}
+        self.entries[digest] = entry
+        return entry
+
+    async def _fetch(self, src: str):
+        data = await self._download(src)
+        if data is None:
+            count("assets.failed")
+            return
+        count("assets.fetched")
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self.by_hash:
+            count("assets.duplicates")
+        else:
+            self.by_hash[digest] = asyncio.ensure_future(self._process(digest, data))
+        entry = await self.by_hash[digest]
+        if entry is not None:
+            entry["sources"].append(src)
+
+    async def finish(self) -> list:
+        """waits for every download, writes the manifest and returns its entries"""
+        try:
+            while self.tasks: # pages added while waiting bring more tasks
+                tasks, self.tasks = self.tasks, []
+                for result in await asyncio.gather(*tasks, return_exceptions=True):
+                    if isinstance(result, Exception):
+                        print(f"asset failed: {result}")
+                        count("assets.failed")
+        finally:
+            self.running = False
+            if self.owns_client:
+                await self.client.aclose()
+                self.client = None
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+
+        # alt texts and pages of every url behind an asset
+        for entry in self.entries.values():
+            entry["sources"].sort()
+            for src in entry["sources"]:
+                image = self.images[src]
+                entry["alt"] = entry["alt"] or image["alt"]
+                entry["pages"].extend(page for page in image["pages"] if page not in entry["pages"])
+        entries = sorted(self.entries.values(), key=lambda entry: entry["path"])
+        atomic_write(os.path.join(self.directory, MANIFEST), json.dumps(entries, indent=1).encode("utf-8"))
+        return entries
+
+    async def run(self) -> list:
+        """fetches everything added so far, for a crawl that already finished"""
+        await self.start()
+        return await self.finish()
+
+def load_manifest(site_dir: str) -> list:
+    with open(os.path.join(site_dir, ASSETS_DIR, MANIFEST), "r") as f:
+        return json.load(f)
+
+def format_manifest(entries: list, limit=MAX_ASSETS) -> str:
+    """one line per asset for the agents: path, size, alt text and the pages that showed it"""
+    lines = []
+    for entry in entries[:limit]:
+        pages = ", ".join(urlparse(page).path or "/" for page in entry["pages"][:5])
+        alt = f' "{entry["alt"]}"' if entry["alt"] else ""
+        lines.append(f"{entry['path']} ({entry['width']}x{entry['height']}){alt} - on {pages}")
+    return "\n".join(lines)
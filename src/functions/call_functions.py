@@ -1,9 +1,17 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from functions.create_file import create_file
 from functions.get_files_info import get_files_info
+from functions.patch_file import patch_file
 from functions.read_file_contents import read_file_contents
+from functions.read_file_range import read_file_range
 from functions.write_file import write_file
+from functions.trace import tracer
 
 WORKING_DIRECTORY = "final_product" # website code will be stored here
+MAX_WORKERS = 8 # tool calls of one response run at the same time
 
 # create function map to call functions
 FUNCTION_MAP = {
@@ -11,9 +19,14 @@ FUNCTION_MAP = {
     "get_files_info": get_files_info,
     "read_file_contents": read_file_contents,
     "write_file": write_file,
+    "patch_file": patch_file,
+    "read_file_range": read_file_range,
 }
 
-def execute_function_call(call):
+# functions that take a filepath, used to keep calls on the same file in order
+FILE_FUNCTIONS = {"create_file", "read_file_contents", "write_file", "patch_file", "read_file_range"}
+
+def execute_function_call(call, working_directory=WORKING_DIRECTORY):
 
     """executes the function specified by the agent"""
 
@@ -21,7 +34,7 @@ def execute_function_call(call):
     function_args = {**call.args}
 
     # overwrite working_directory to all function calls just in case
-    function_args['working_directory'] = WORKING_DIRECTORY
+    function_args['working_directory'] = working_directory
 
     if function_name in FUNCTION_MAP:
         function_to_call = FUNCTION_MAP[function_name]
@@ -30,3 +43,103 @@ def execute_function_call(call):
     else:
         return f'function {function_name} not found!'
 
+class CallResult:
+
+    """result of one function call plus how long it took"""
+
+    def __init__(self, name, result, seconds):
+        self.name = name
+        self.result = result
+        self.seconds = seconds
+
+def _timed_call(call, working_directory):
+    start = time.perf_counter()
+    try:
+        result = execute_function_call(call, working_directory)
+    except Exception as e: # one bad call should not take the rest of the batch down
+        result = {"error": str(e)}
+    seconds = time.perf_counter() - start
+    tracer.record_span(f"tool {call.name}", seconds)
+    return CallResult(call.name, result, seconds)
+
+def _chain_key(call, index, working_directory):
+
+    """calls touching the same file share a key (and run in order), every other call gets its own"""
+
+    filepath = (call.args or {}).get("filepath")
+    if call.name not in FILE_FUNCTIONS or not filepath:
+        return ("call", index)
+    if not filepath.startswith(working_directory):
+        filepath = os.path.join(working_directory, filepath)
+    return ("file", os.path.normpath(filepath))
+
+def run_batch(calls, max_workers=MAX_WORKERS, working_directory=WORKING_DIRECTORY):
+
+    """
+    executes every function call of one model response
+    calls on different files (and all reads) run in parallel on a thread pool, calls on the
+    same file run one after another in the order the model gave them
+    returns a CallResult per call, in call order
+    """
+
+    chains = {}
+    for index, call in enumerate(calls):
+        chains.setdefault(_chain_key(call, index, working_directory), []).append(index)
+
+    results = [None] * len(calls)
+
+    def run_chain(indices):
+        for index in indices:
+            results[index] = _timed_call(calls[index], working_directory)
+
+    if len(chains) == 1: # nothing to overlap
+        run_chain(next(iter(chains.values())))
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chains))) as pool:
+        for future in [pool.submit(run_chain, indices) for indices in chains.values()]:
+            future.result()
+    return results
+
+class StreamingBatch:
+
+    """
+    run_batch for calls that arrive one at a time from a streamed response: each call starts as soon as it
+    is submitted, calls on the same file still run one after another in arrival order
+    after_call(call, call_result) runs on the worker thread once a call is done
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, working_directory=WORKING_DIRECTORY, after_call=None):
+        self.working_directory = working_directory
+        self.after_call = after_call
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.calls = []
+        self.futures = []
+        self.chains = {} # chain key -> future of the last call submitted on it
+
+    def _run(self, call, previous):
+        if previous is not None:
+            previous.result() # submitted earlier, so already running or done: waiting here cannot deadlock
+        call_result = _timed_call(call, self.working_directory)
+        if self.after_call is not None:
+            try:
+                self.after_call(call, call_result)
+            except Exception as e: # a failing hook must not lose the call's result
+                print(f"after {call.name}: {e}")
+        return call_result
+
+    def submit(self, call):
+        key = _chain_key(call, len(self.calls), self.working_directory)
+        future = self.pool.submit(self._run, call, self.chains.get(key))
+        self.chains[key] = future
+        self.calls.append(call)
+        self.futures.append(future)
+
+    def results(self) -> list:
+        """waits for every submitted call, returns a CallResult per call in call order and starts a new batch"""
+        results = [future.result() for future in self.futures]
+        self.calls, self.futures, self.chains = [], [], {}
+        return results
+
+    def close(self):
+        self.pool.shutdown(wait=True)
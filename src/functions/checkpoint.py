@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import time
+
+from functions.web_scraper import parse_page
+from functions.workspace import atomic_write
+
+RUNS_DIR = "runs" # one directory of checkpoints per run
+
+class ChunkStore:
+    """summaries of single chunks, keyed by the chunk's content hash, so a resumed run only sends the rest"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, chunk: str) -> str:
+        return os.path.join(self.directory, f"{hashlib.sha256(chunk.encode('utf-8')).hexdigest()[:24]}.txt")
+
+    def get(self, chunk: str):
+        path = self._path(chunk)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def put(self, chunk: str, text: str):
+        atomic_write(self._path(chunk), text.encode("utf-8"))
+
+def read_records(path: str):
+    """records of a pages.jsonl and the byte offset right after the last complete one (an interrupted write leaves half a line)"""
+    records, end = [], 0
+    if not os.path.isfile(path):
+        return records, end
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            end += len(line)
+    return records, end
+
+class RecordingCrawler:
+    """
+    wraps a crawler, every page it yields (and any new stylesheet) is appended to pages.jsonl
+    pages already in the file (an interrupted crawl) are preloaded into the crawler: they come out first,
+    in their recorded order, and only the pages after them are downloaded and appended
+    """
+
+    def __init__(self, crawler, path: str):
+        self.crawler = crawler
+        self.path = path
+
+    def __getattr__(self, name):
+        return getattr(self.crawler, name) # crawled, stylesheets, ...
+
+    async def stream(self):
+        records, end = read_records(self.path)
+        stylesheets = {}
+        for record in records:
+            stylesheets.update(record["stylesheets"])
+        if records:
+            print(f"replaying {len(records)} recorded pages, crawling the rest")
+            # crawls recorded before links were kept get them from their html again
+            self.crawler.preload([(record["url"], record["page"], record.get("links") or parse_page(record["page"]["html"], record["url"])["links"])
+                                  for record in records], stylesheets)
+        replayed = {record["url"] for record in records}
+        recorded = set(stylesheets)
+
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.truncate(end) # drops half a line left by the interruption
+            async for page_url, page in self.crawler.stream():
+                if page_url not in replayed:
+                    new_sheets = {blob_id: self.crawler.stylesheets[blob_id] for blob_id in page["stylesheets"] if blob_id not in recorded}
+                    recorded.update(new_sheets)
+                    f.write(json.dumps({"url": page_url, "page": page, "stylesheets": new_sheets,
+                                        "links": self.crawler.links[page_url]}) + "\n")
+                    f.flush()
+                yield page_url, page
+
+class SavedCrawl:
+    """replays a recorded crawl with the crawler's stream() interface, nothing is downloaded"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.crawled = []
+        self.stylesheets = {}
+
+    def pages(self):
+        records, _ = read_records(self.path)
+        for record in records:
+            self.stylesheets.update(record["stylesheets"])
+            self.crawled.append(record["url"])
+            yield record["url"], record["page"]
+
+    async def stream(self):
+        for page_url, page in self.pages():
+            yield page_url, page
+
+class Run:
+    """
+    checkpoints of one pipeline run in runs/<run_id>/
+    state.json records the arguments and every finished stage, the crawl is kept in pages.jsonl,
+    chunk summaries in summaries/<agent>/ and the agent loop's snapshots in iterations/
+    """
+
+    def __init__(self, run_id: str, runs_dir=RUNS_DIR):
+        self.run_id = run_id
+        self.directory = os.path.join(runs_dir, run_id)
+        self.state_path = os.path.join(self.directory, "state.json")
+        self.state = {}
+        if os.path.isfile(self.state_path):
+            with open(self.state_path, "r") as f:
+                self.state = json.load(f)
+
+    @classmethod
+    def start(cls, url: str, style: str, site_dir=None, runs_dir=RUNS_DIR) -> "Run":
+        """new run, the id is the start time plus a short hash of the job (batch runs start in the same second)"""
+        job_hash = hashlib.sha256(f"{url} {style}".encode("utf-8")).hexdigest()[:6]
+        run = cls(f"{time.strftime('%Y%m%d-%H%M%S')}-{job_hash}", runs_dir)
+        run.state = {"url": url, "style": style, "site_dir": site_dir, "stages": {}}
+        run.save()
+        return run
+
+    @classmethod
+    def resume(cls, run_id: str, runs_dir=RUNS_DIR) -> "Run":
+        run = cls(run_id, runs_dir)
+        if not run.state:
+            raise FileNotFoundError(f"no run {run_id} in {runs_dir}/")
+        return run
+
+    def save(self):
+        atomic_write(self.state_path, json.dumps(self.state, indent=1).encode("utf-8"))
+
+    def done(self, stage: str) -> bool:
+        return stage in self.state["stages"]
+
+    def complete(self, stage: str, **values):
+        """marks a stage finished, values (small json) are kept with it"""
+        self.state["stages"][stage] = values
+        self.save()
+
+    def stage(self, stage: str) -> dict:
+        return self.state["stages"][stage]
+
+    @property
+    def pages_path(self) -> str:
+        return os.path.join(self.directory, "pages.jsonl")
+
+    @property
+    def snapshot_dir(self) -> str:
+        return os.path.join(self.directory, "iterations")
+
+    def record(self, crawler) -> RecordingCrawler:
+        return RecordingCrawler(crawler, self.pages_path)
+
+    def saved_crawl(self) -> SavedCrawl:
+        return SavedCrawl(self.pages_path)
+
+    def chunks(self, agent: str) -> ChunkStore:
+        return ChunkStore(os.path.join(self.directory, "summaries", agent))
+
+    def save_text(self, name: str, text: str):
+        atomic_write(os.path.join(self.directory, name), text.encode("utf-8"))
+
+    def load_text(self, name: str) -> str:
+        with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def save_loop(self, iteration: int, step: str, snapshot: str, prev_feedback):
+        """agent loop position: the last finished step ("build" or "review") and the snapshot it left"""
+        self.state["loop"] = {"iteration": iteration, "step": step, "snapshot": snapshot, "prev_feedback": prev_feedback}
+        self.save()
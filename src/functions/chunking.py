@@ -0,0 +1,82 @@
+from functions.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+MAX_CHARS_PER_CHUNK = 50000  # keep prompt under gemini 2.0 flash-lite token (1 million lmao) for chunking
+TOKENS_PER_CHUNK = MAX_CHARS_PER_CHUNK // CHARS_PER_TOKEN # same prompt size, measured in (estimated) tokens
+
+def chunk_text(text, max_chars=MAX_CHARS_PER_CHUNK):
+    """split a long string into chunks of max_chars each"""
+    chunks = []
+    start = 0
+    while start < len(text):
+        chunks.append(text[start:start + max_chars])
+        start += max_chars
+    return chunks
+
+def split_piece(piece: str, budget: int) -> list:
+    """breaks a piece bigger than the budget on line boundaries, cutting single huge lines as a last resort"""
+    if estimate_tokens(piece) <= budget:
+        return [piece]
+
+    parts = []
+    current = ""
+    for line in piece.splitlines(keepends=True):
+        if estimate_tokens(line) > budget:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.extend(chunk_text(line, budget * CHARS_PER_TOKEN))
+        elif current and estimate_tokens(current + line) > budget:
+            parts.append(current)
+            current = line
+        else:
+            current += line
+    if current:
+        parts.append(current)
+    return parts
+
+class ChunkPacker:
+    """
+    packs the pieces a view cut from each page (outline sections, css rules) greedily
+    into chunks of at most `budget` estimated tokens, across page boundaries
+    every chunk starts with a short shared header (the style), every page section with its url
+    """
+
+    def __init__(self, style: str, budget=TOKENS_PER_CHUNK):
+        self.header = f"STYLE: {style}\n"
+        self.budget = budget
+        self._reset()
+
+    def _reset(self):
+        self.parts = [self.header]
+        self.tokens = estimate_tokens(self.header)
+        self.current_page = None
+
+    def _emit(self) -> str:
+        chunk = "".join(self.parts)
+        self._reset()
+        return chunk
+
+    def add(self, page_url: str, pieces: list) -> list:
+        """adds a page's pieces, returns the chunks that filled up on the way"""
+        chunks = []
+        page_header = f"\nURL: {page_url}\n"
+        header_tokens = estimate_tokens(page_header)
+        piece_budget = self.budget - estimate_tokens(self.header) - header_tokens
+
+        for piece in pieces:
+            for part in split_piece(piece, piece_budget):
+                part_tokens = estimate_tokens(part)
+                needed = part_tokens + (header_tokens if self.current_page != page_url else 0)
+                if len(self.parts) > 1 and self.tokens + needed > self.budget:
+                    chunks.append(self._emit())
+                if self.current_page != page_url:
+                    self.parts.append(page_header)
+                    self.tokens += header_tokens
+                    self.current_page = page_url
+                self.parts.append(part if part.endswith("\n") else part + "\n")
+                self.tokens += part_tokens
+        return chunks
+
+    def flush(self) -> list:
+        """the last, partly filled chunk (if any)"""
+        return [self._emit()] if len(self.parts) > 1 else []
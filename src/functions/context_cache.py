@@ -0,0 +1,128 @@
+import itertools
+import threading
+import time
+from google.genai import types
+
+from functions.tokens import estimate_tokens
+from functions.trace import count
+
+CACHE_TTL = 3600      # seconds a cached context lives on the server
+REFRESH_MARGIN = 300  # refresh a cached context this long before it would expire
+MIN_CACHE_TOKENS = 1024 # gemini refuses to cache less than this, smaller contexts are simply inlined
+
+class LocalCaches:
+    """
+    in-memory stand-in for client.caches (create/update/delete), for tests and the offline benchmark
+    a fake backend looks up what a request's cached_content holds with get()
+    """
+
+    def __init__(self, available=True):
+        self.available = available # False behaves like a model or tier without context caching
+        self.lock = threading.Lock()
+        self.entries = {}          # name -> CreateCachedContentConfig
+        self.numbers = itertools.count(1)
+        self.created = 0
+        self.refreshed = 0
+
+    def create(self, *, model: str, config=None):
+        if not self.available:
+            raise Exception(f"400 INVALID_ARGUMENT context caching is not supported for {model}")
+        with self.lock:
+            name = f"cachedContents/local-{next(self.numbers)}"
+            self.entries[name] = config
+            self.created += 1
+        return types.CachedContent(name=name, model=model)
+
+    def update(self, *, name: str, config=None):
+        with self.lock:
+            if name not in self.entries:
+                raise Exception(f"404 NOT_FOUND {name}")
+            self.refreshed += 1
+        return types.CachedContent(name=name)
+
+    def delete(self, *, name: str, config=None):
+        with self.lock:
+            self.entries.pop(name, None)
+
+    def get(self, *, name: str, config=None):
+        with self.lock:
+            return self.entries.get(name)
+
+class SharedContext:
+    """
+    system prompt, tools and a large shared text (the site summaries) of one agent, sent as gemini cached content
+    caches belong to the api key that created them, so one is created per key on first use and refreshed
+    before its ttl runs out; if caching fails (model, tier or size) that key gets the plain inline config instead
+    passed as `config` to a KeyPool, which resolves it for whichever key sends the request
+    """
+
+    def __init__(self, model: str, system_instruction: str, context: str, tools=None, ttl=CACHE_TTL,
+                 display_name=None, clock=time.monotonic):
+        self.model = model
+        self.system_instruction = system_instruction
+        self.context = context
+        self.tools = tools
+        self.ttl = ttl
+        self.display_name = display_name
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.caches = {}    # key -> (client, cache name, expires at)
+        self.inline = set() # keys that could not cache, they always send everything inline
+        self.tokens = estimate_tokens(context) # counted against the key's tpm quota on every request
+
+    def inline_config(self) -> types.GenerateContentConfig:
+        """everything in the request: the shared text goes after the system prompt"""
+        return types.GenerateContentConfig(system_instruction=f"{self.system_instruction}\n\n{self.context}",
+                                           tools=self.tools)
+
+    def _create(self, client) -> str:
+        cache = client.caches.create(model=self.model, config=types.CreateCachedContentConfig(
+            system_instruction=self.system_instruction,
+            contents=[types.Content(role="user", parts=[types.Part(text=self.context)])],
+            tools=self.tools,
+            ttl=f"{self.ttl}s",
+            display_name=self.display_name,
+        ))
+        count("context.created")
+        return cache.name
+
+    def resolve(self, key, client) -> types.GenerateContentConfig:
+        """config for one request sent with `key`: a reference to its cached content, or everything inline"""
+        if self.tokens < MIN_CACHE_TOKENS:
+            return self.inline_config()
+
+        with self.lock: # requests of one key wait for its cache instead of each creating one
+            if key in self.inline:
+                return self.inline_config()
+            now = self.clock()
+            _, name, expires = self.caches.get(key, (None, None, 0))
+            try:
+                if name is None:
+                    name = self._create(client)
+                    expires = now + self.ttl
+                elif expires - now < REFRESH_MARGIN:
+                    try:
+                        client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"))
+                        count("context.refreshed")
+                    except Exception:
+                        name = self._create(client) # expired or deleted on the server
+                    expires = now + self.ttl # only a create or refresh moves the server side expiry
+            except Exception as e:
+                print(f"context caching unavailable for key ...{str(key)[-4:]} ({e}), sending the context inline")
+                count("context.inline")
+                self.inline.add(key)
+                self.caches.pop(key, None)
+                return self.inline_config()
+            self.caches[key] = (client, name, expires)
+
+        return types.GenerateContentConfig(cached_content=name)
+
+    def close(self):
+        """deletes every cached copy, whatever is left expires on its own after the ttl"""
+        with self.lock:
+            caches, self.caches = self.caches, {}
+        for client, name, _ in caches.values():
+            try:
+                client.caches.delete(name=name)
+            except Exception:
+                pass
@@ -0,0 +1,112 @@
+import os
+import re
+from bs4 import BeautifulSoup
+
+from functions.local_checks import expected_page
+
+PHONE = re.compile(r"(?:\+?\d{1,2}[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}\b")
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+ADDRESS = re.compile(
+    r"\b\d{1,5}\s+(?:[A-Z][\w.]*\s+){1,4}"
+    r"(?:St|Street|Ave|Avenue|Rd|Road|Blvd|Boulevard|Dr|Drive|Ln|Lane|Way|Ct|Court|Pl|Place|Pkwy|Hwy|Highway)\b\.?"
+)
+HEADINGS = ["h1", "h2", "h3"]
+MIN_HEADING_CHARS = 4 # "Home", shorter headings are mostly icons and counters
+
+# a line of its own, markdown emphasis allowed ("**VERDICT: PASS**"), "VERDICT: PASSABLE" or a verdict mid-sentence do not count
+VERDICT = re.compile(r"^[\s*_#>`-]*VERDICT\s*:\s*[*_`]*(PASS|FAIL)[\s*_`.!]*$", re.IGNORECASE | re.MULTILINE)
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def _digits(text: str) -> str:
+    return re.sub(r"\D", "", text)[-10:] # drop the country code, "+1 (555) 010-9999" == "555.010.9999"
+
+def key_facts(soup: BeautifulSoup) -> set:
+    """content a rebuilt page has to keep: phone numbers, emails, street addresses and headings"""
+    text = soup.get_text(" ")
+    facts = {("phone", _digits(phone)) for phone in PHONE.findall(text)}
+    facts.update(("email", email.lower()) for email in EMAIL.findall(text))
+    facts.update(("address", _normalize(address)) for address in ADDRESS.findall(text))
+    for heading in soup.find_all(HEADINGS):
+        heading_text = _normalize(heading.get_text(" "))
+        if len(heading_text) >= MIN_HEADING_CHARS:
+            facts.add(("heading", heading_text))
+    return facts
+
+def evaluator_verdict(feedback: str):
+    """True/False for a "VERDICT: PASS/FAIL" line in the reviewer's feedback, None if it gave none"""
+    matches = VERDICT.findall(feedback or "")
+    if not matches:
+        return None
+    return matches[-1].upper() == "PASS"
+
+class CoverageIndex:
+    """
+    what the crawl found vs. what has been generated
+    pages are indexed while they stream out of the crawler (add_page), update() then rescans only the
+    generated files whose content changed since the last call and returns the coverage score:
+    the share of crawled pages with a generated file plus key facts present anywhere in the site
+    """
+
+    def __init__(self):
+        self.pages = {}       # page url -> expected generated file
+        self.facts = {}       # fact -> page url it was first seen on
+        self.file_hashes = {} # generated file -> blob hash it was last scanned at
+        self.file_facts = {}  # generated file -> facts it covers
+        self.rescanned = 0    # files scanned by the last update()
+
+    def add_page(self, page_url: str, soup: BeautifulSoup):
+        self.pages[page_url] = expected_page(page_url)
+        for fact in key_facts(soup):
+            self.facts.setdefault(fact, page_url)
+
+    def _scan(self, html: str) -> set:
+        """the indexed facts a generated file contains"""
+        text = BeautifulSoup(html, "html.parser").get_text(" ")
+        found = {("phone", _digits(phone)) for phone in PHONE.findall(text)}
+        found.update(("email", email.lower()) for email in EMAIL.findall(text))
+        normalized = _normalize(text)
+        found.update(fact for fact in self.facts if fact[0] in ("address", "heading") and fact[1] in normalized)
+        return found & set(self.facts)
+
+    def update(self, workspace) -> float:
+        """rescans the changed html files of the workspace, returns the current score"""
+        files = {relpath.replace(os.sep, "/"): digest for relpath, digest in dict(workspace.files).items()
+                 if relpath.endswith((".html", ".htm"))}
+
+        for relpath in set(self.file_hashes) - set(files): # deleted since last time
+            del self.file_hashes[relpath]
+            del self.file_facts[relpath]
+
+        self.rescanned = 0
+        for relpath, digest in files.items():
+            if self.file_hashes.get(relpath) == digest:
+                continue
+            self.file_facts[relpath] = self._scan(workspace.read(relpath))
+            self.file_hashes[relpath] = digest
+            self.rescanned += 1
+        return self.score()
+
+    def covered_pages(self) -> set:
+        generated = set(self.file_hashes)
+        return {page_url for page_url, page in self.pages.items()
+                if page in generated or f"{page[:-len('.html')]}/index.html" in generated}
+
+    def covered_facts(self) -> set:
+        return set().union(*self.file_facts.values()) if self.file_facts else set()
+
+    def score(self) -> float:
+        total = len(self.pages) + len(self.facts)
+        if not total:
+            return 1.0
+        return (len(self.covered_pages()) + len(self.covered_facts())) / total
+
+    def missing(self, limit=20) -> str:
+        """readable list of what is still missing, for the coding agent's next prompt"""
+        lines = [f"- page {page_url} -> {self.pages[page_url]}" for page_url in sorted(set(self.pages) - self.covered_pages())]
+        lines += [f"- {kind}: {value} (from {self.facts[(kind, value)]})"
+                  for kind, value in sorted(set(self.facts) - self.covered_facts())]
+        if len(lines) > limit:
+            lines = lines[:limit] + [f"- ... and {len(lines) - limit} more"]
+        return "\n".join(lines)
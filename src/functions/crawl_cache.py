@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import zstandard
+
+CACHE_DIR = "crawl_cache" # default location, main() lets CRAWL_CACHE_DIR override it
+
+class CrawlCache:
+    """
+    persistent http cache for the scrapers
+    bodies are stored zstd-compressed next to their ETag/Last-Modified headers,
+    and every cached url is revalidated with a conditional GET instead of re-downloaded
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.compressor = zstandard.ZstdCompressor()
+        self.decompressor = zstandard.ZstdDecompressor()
+
+        self.hits = 0          # 304s answered from disk
+        self.misses = 0        # urls with nothing cached yet
+        self.revalidations = 0 # conditional requests sent
+
+    def _path(self, url, ext):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.{ext}")
+
+    def _meta(self, url):
+        try:
+            with open(self._path(url, "json"), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def conditional_headers(self, url: str) -> dict:
+        """If-None-Match/If-Modified-Since for a cached url, empty when nothing is cached"""
+        meta = self._meta(url)
+        if meta is None:
+            self.misses += 1
+            return {}
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        if headers:
+            self.revalidations += 1
+        return headers
+
+    def final_url(self, url: str) -> str:
+        """url a cached url was answered from after redirects (links on the page are relative to it)"""
+        meta = self._meta(url)
+        return (meta or {}).get("final_url") or url
+
+    def content_type(self, url: str) -> str:
+        """Content-Type a cached url was served with, "" for entries stored before it was kept"""
+        meta = self._meta(url)
+        return (meta or {}).get("content_type") or ""
+
+    def load(self, url: str):
+        """body of a cached url after a 304, None if the entry has gone missing"""
+        try:
+            with open(self._path(url, "zst"), "rb") as f:
+                body = self.decompressor.decompress(f.read()).decode("utf-8")
+        except (OSError, zstandard.ZstdError):
+            return None
+        self.hits += 1
+        return body
+
+    def store(self, url: str, body: str, headers, final_url=None):
+        """saves a 200 response so the next crawl can revalidate it"""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return # nothing to revalidate against, caching it would never pay off
+
+        with open(self._path(url, "zst"), "wb") as f:
+            f.write(self.compressor.compress(body.encode("utf-8")))
+        with open(self._path(url, "json"), "w") as f:
+            json.dump({"url": url, "final_url": final_url or url, "etag": etag, "last_modified": last_modified,
+                       "content_type": headers.get("Content-Type")}, f)
+
+    def report(self) -> str:
+        return f"crawl cache: {self.hits} hits, {self.misses} misses, {self.revalidations} revalidations"
@@ -0,0 +1,240 @@
+import asyncio
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+import httpx
+
+from functions.css_cache import StylesheetCache
+from functions.frontier import Frontier
+from functions.web_scraper import Fetched, SiteMap, parse_page, css_image_urls, unique_images
+from functions.trace import count
+
+MAX_WORKERS = 10   # pages fetched at the same time
+MAX_PER_HOST = 4   # open requests allowed against a single host
+TIMEOUT = 5        # seconds, same as the blocking scraper
+PARSE_WORKERS = (os.cpu_count() or 1) - 1 # processes parsing big pages (one core stays with the event loop), 0 parses inline
+POOL_MIN_CHARS = 200_000 # smaller pages parse faster than they can be shipped to another process
+
+class AsyncCrawler:
+    """
+    concurrent version of scrape_website
+    a fixed pool of workers pulls urls off a shared queue, every request goes
+    through one keep-alive httpx client and a per-host semaphore
+    big pages are parsed on a process pool, so parsing uses every core and never stalls the fetches
+    pages are fetched concurrently but handed out (and their links admitted) in the order the
+    breadth-first scraper visits them, so the same site always gives the same pages in the same order
+    """
+
+    def __init__(self, url: str, max_pages=50, workers=MAX_WORKERS, per_host=MAX_PER_HOST, client=None, css_cache=None, crawl_cache=None,
+                 parse_workers=PARSE_WORKERS):
+        self.url = url
+        self.max_pages = max_pages
+        self.workers = workers
+        self.per_host = per_host
+        self.client = client # optional pre-built httpx.AsyncClient (tests, shared pools)
+        self.css_cache = css_cache or StylesheetCache()
+        self.crawl_cache = crawl_cache # optional CrawlCache, turns repeat crawls into conditional GETs
+        self.parse_workers = parse_workers
+        self.parse_pool = None # started on the first big page
+
+        self.frontier = Frontier(url, max_pages) # seen-set (by normalized url) covering queued and visited pages
+        self.admitted = []  # page urls in discovery order
+        self.results = {}   # page url -> future of (page, links), None if the page failed
+        self.crawled = []   # urls of every page that was fetched, in discovery order
+        self.links = {}     # page url -> its resolved links, for every page handed out
+        self.recorded = {}  # page url -> (page, links) of an interrupted crawl, handed out again without a download
+        self.stylesheets = {} # blob id -> css for every stylesheet seen so far
+        self.css_fetches = {} # stylesheet url -> in-flight fetch, shared by every page linking it
+        self.sheet_images = {} # stylesheet url -> image urls of its url()s, scanned once per crawl
+
+    def _host_limit(self, url):
+        return self.host_limits[urlparse(url).netloc]
+
+    async def _get(self, url):
+        """fetch a url, returns a Fetched on a 200 (or a 304 answered from the crawl cache) and None otherwise"""
+        headers = self.crawl_cache.conditional_headers(url) if self.crawl_cache else {}
+        async with self._host_limit(url):
+            try:
+                response = await self.client.get(url, headers=headers)
+                count("crawl.requests")
+                count("crawl.bytes", len(response.content))
+                if response.status_code == 304 and self.crawl_cache:
+                    count("crawl.not_modified")
+                    body = self.crawl_cache.load(url)
+                    if body is not None:
+                        return Fetched(body, self.crawl_cache.final_url(url), self.crawl_cache.content_type(url))
+                    response = await self.client.get(url) # cached body went missing, download it again
+            except (httpx.HTTPError, httpx.InvalidURL): # a stylesheet url with a bad port only fails here
+                return None
+
+        if response.status_code != 200:
+            return None
+        if self.crawl_cache:
+            self.crawl_cache.store(url, response.text, response.headers, str(response.url))
+        return Fetched(response.text, str(response.url), response.headers.get("Content-Type"))
+
+    def preload(self, pages, stylesheets: dict):
+        """
+        pages of an interrupted crawl as (page_url, page, links), in the order they were handed out
+        stream() hands them out first, in that order, and only downloads the pages they lead to
+        """
+        self.recorded = {page_url: (page, links) for page_url, page, links in pages}
+        self.stylesheets.update(stylesheets)
+
+    def _admit(self, url):
+        """url as it will be fetched and its future result, None if the frontier turns it down"""
+        url = self.frontier.admit(url)
+        if url is None:
+            return None, None
+        self.admitted.append(url)
+        self.results[url] = asyncio.get_running_loop().create_future()
+        return url, self.results[url]
+
+    def _enqueue(self, url):
+        url, _ = self._admit(url)
+        if url is not None:
+            self.queue.put_nowait(url)
+
+    async def _fetch_stylesheet(self, css_url):
+        fetched = await self._get(css_url)
+        if fetched is None:
+            return None
+        css = fetched.text
+        blob_id = self.css_cache.put(css_url, css)
+        self.stylesheets[blob_id] = css
+        return blob_id
+
+    async def _stylesheet(self, css_url):
+        """blob id for a stylesheet, downloading it at most once per crawl"""
+        cached = self.css_cache.get(css_url)
+        if cached is not None:
+            blob_id, css = cached
+            self.stylesheets[blob_id] = css
+            return blob_id
+
+        if css_url not in self.css_fetches:
+            self.css_fetches[css_url] = asyncio.ensure_future(self._fetch_stylesheet(css_url))
+        return await self.css_fetches[css_url]
+
+    async def _parse(self, html, page_url):
+        if not self.parse_workers or len(html) < POOL_MIN_CHARS:
+            return parse_page(html, page_url)
+        if self.parse_pool is None:
+            # spawned, not forked: batch mode runs crawlers on several threads
+            self.parse_pool = ProcessPoolExecutor(self.parse_workers, mp_context=multiprocessing.get_context("spawn"))
+        return await asyncio.get_running_loop().run_in_executor(self.parse_pool, parse_page, html, page_url)
+
+    async def _crawl_page(self, current_url):
+        """(page, links) of a url, None if it could not be fetched or is not html"""
+        fetched = await self._get(current_url)
+        if fetched is None:
+            return None
+        if not fetched.is_html: # a linked pdf or api endpoint is not a page of the site
+            count("crawl.not_html")
+            return None
+        html = fetched.text
+
+        # relative links are resolved against where the page ended up after redirects ("/blog" -> "/blog/")
+        page = await self._parse(html, fetched.url)
+        links = page["links"]
+
+        # external stylesheets for this page are resolved together, pages only keep blob ids
+        blob_ids = await asyncio.gather(*(self._stylesheet(css_url) for css_url in page["stylesheets"]))
+
+        # images of the page and of the url()s in its stylesheets
+        images = page["images"]
+        for css_url, blob_id in zip(page["stylesheets"], blob_ids):
+            if blob_id is None:
+                continue
+            if css_url not in self.sheet_images:
+                self.sheet_images[css_url] = css_image_urls(self.stylesheets[blob_id], css_url)
+            images = images + [{"src": src, "alt": ""} for src in self.sheet_images[css_url]]
+        blob_ids = list(dict.fromkeys(blob_id for blob_id in blob_ids if blob_id is not None))
+
+        page = {"html": html, "css": "\n".join(page["inline_css"]), "stylesheets": blob_ids, "images": unique_images(images)}
+        return page, links
+
+    async def _worker(self):
+        while True:
+            current_url = await self.queue.get()
+            result = None
+            try:
+                result = await self._crawl_page(current_url)
+            except Exception as e:
+                print(f"crawl failed for {current_url}: {e}")
+            finally:
+                self.results[current_url].set_result(result)
+
+    async def stream(self):
+        """
+        crawl the site, yielding (page_url, page) in breadth-first discovery order
+        workers fetch every admitted page at once, the next page is handed out (and its links admitted)
+        as soon as it and every page before it are done, so order and page set do not depend on timing
+        page: {"html": html_string, "css": inline_css_string, "stylesheets": [blob_id, ...], "images": [{"src", "alt"}, ...]},
+        blobs are in self.stylesheets
+        """
+        self.queue = asyncio.Queue()
+        self.host_limits = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+
+        owns_client = self.client is None
+        if owns_client:
+            limits = httpx.Limits(max_connections=self.workers * 2, max_keepalive_connections=self.workers)
+            self.client = httpx.AsyncClient(timeout=TIMEOUT, limits=limits, follow_redirects=True)
+
+        tasks = []
+        try:
+            # recorded pages go first, exactly as they were handed out before, their links pick up the crawl
+            recorded, self.recorded = self.recorded, {}
+            for page_url, result in recorded.items():
+                _, future = self._admit(page_url)
+                if future is not None:
+                    count("crawl.replayed")
+                    future.set_result(result)
+            self._enqueue(self.url)
+            tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+            position = 0
+            while position < len(self.admitted): # admitted grows as pages are handed out
+                page_url = self.admitted[position]
+                position += 1
+                result = await self.results[page_url]
+                del self.results[page_url]
+                if result is None:
+                    continue
+                page, links = result
+                for full_link in links: # only new internal links make it into the queue
+                    self._enqueue(full_link)
+                self.crawled.append(page_url)
+                self.links[page_url] = links
+                yield page_url, page
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if owns_client:
+                await self.client.aclose()
+                self.client = None
+            if self.parse_pool is not None:
+                self.parse_pool.shutdown(wait=False, cancel_futures=True)
+                self.parse_pool = None
+            if self.crawl_cache:
+                print(self.crawl_cache.report())
+
+    async def run(self) -> SiteMap:
+        """
+        crawl the whole site
+        returns: SiteMap {page_url: {"html": html_string, "css": inline_css_string, "stylesheets": [blob_id, ...], "images": [...]}}
+        """
+        site_map = SiteMap()
+        async for page_url, page in self.stream(): # already in the order the breadth-first scraper produces
+            site_map[page_url] = page
+        site_map.stylesheets = self.stylesheets
+        return site_map
+
+def scrape_website_concurrent(url: str, max_pages=50, workers=MAX_WORKERS, per_host=MAX_PER_HOST, css_cache=None, crawl_cache=None) -> SiteMap:
+    """blocking entry point for the async crawler, same result shape as scrape_website"""
+    crawler = AsyncCrawler(url, max_pages=max_pages, workers=workers, per_host=per_host,
+                           css_cache=css_cache, crawl_cache=crawl_cache)
+    return asyncio.run(crawler.run())
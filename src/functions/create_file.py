@@ -1,7 +1,11 @@
 import os
 from google.genai import types
 
+from functions.workspace import active_workspace
+
 def create_file(working_directory:str, filepath: str, content: str=""):
+    content = content or "" # the schema lets the model send null for an empty file
+
     # gets absolute paths
     abs_path = os.path.abspath(os.path.join(working_directory, filepath)) if not filepath.startswith(working_directory) else filepath
 
@@ -9,6 +13,12 @@ def create_file(working_directory:str, filepath: str, content: str=""):
     if not abs_path.startswith(os.path.abspath(working_directory)):
         return {"error" : "path out side working directory is not allowed"}
     
+    # in-memory workspace (if one is open), written to disk at the end of the iteration
+    workspace = active_workspace(working_directory)
+    if workspace is not None:
+        workspace.write(os.path.relpath(abs_path, os.path.abspath(working_directory)), content)
+        return {"success": True, "path": filepath}
+
     # create parent directories if required
     os.makedirs(os.path.dirname(abs_path), exist_ok=True)
 
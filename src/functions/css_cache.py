@@ -0,0 +1,67 @@
+import hashlib
+from collections import OrderedDict
+
+MAX_ENTRIES = 256               # stylesheet urls kept in memory
+MAX_BYTES = 32 * 1024 * 1024    # total css kept in memory
+
+def css_hash(css: str) -> str:
+    """content hash used as the blob id of a stylesheet"""
+    return hashlib.sha256(css.encode("utf-8")).hexdigest()[:16]
+
+class StylesheetCache:
+    """
+    url keyed stylesheet cache for one crawl, bodies are stored once per content hash
+    entries are evicted least recently used first
+    nothing is kept between crawls: the CrawlCache persists stylesheets like pages and revalidates them
+    with a conditional GET, so a changed stylesheet is never served from an old copy
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.entries = OrderedDict() # url -> blob id, most recently used last
+        self.blobs = {}              # blob id -> css
+        self.refs = {}               # blob id -> number of urls pointing at it
+        self.size = 0                # bytes held in self.blobs
+
+        self.hits = 0
+        self.misses = 0
+
+    def _release(self, blob_id):
+        """drops one reference to a blob, freeing it once nothing points at it"""
+        self.refs[blob_id] -= 1
+        if self.refs[blob_id] == 0:
+            del self.refs[blob_id]
+            self.size -= len(self.blobs.pop(blob_id))
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            _, blob_id = self.entries.popitem(last=False)
+            self._release(blob_id)
+
+    def _store(self, url, css):
+        blob_id = css_hash(css)
+        if url in self.entries: # url now points at new content
+            self._release(self.entries.pop(url))
+        if blob_id not in self.blobs:
+            self.blobs[blob_id] = css
+            self.size += len(css)
+        self.refs[blob_id] = self.refs.get(blob_id, 0) + 1
+        self.entries[url] = blob_id
+        self._evict()
+        return blob_id
+
+    def get(self, url: str):
+        """returns (blob_id, css) for a cached url, None on a miss"""
+        if url in self.entries:
+            self.entries.move_to_end(url)
+            self.hits += 1
+            blob_id = self.entries[url]
+            return blob_id, self.blobs[blob_id]
+        self.misses += 1
+        return None
+
+    def put(self, url: str, css: str) -> str:
+        """caches a freshly downloaded stylesheet, returns its blob id"""
+        return self._store(url, css)
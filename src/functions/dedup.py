@@ -0,0 +1,84 @@
+import hashlib
+import re
+
+WORD = re.compile(r"\w+")
+SHINGLE_SIZE = 3   # words per shingle
+MIN_SHINGLES = 8   # shorter texts are only matched exactly, simhash is too coarse for a line or two
+MAX_DISTANCE = 10  # differing bits (of 64) for two texts to count as near-duplicates, unrelated texts differ in ~32
+# emails, urls and digit runs (phone numbers, prices, house numbers, postcodes) a near-duplicate has to share
+# a paragraph that is only a markdown heading: "## Contact", "**Contact**", "__Hours__:"
+HEADING = re.compile(r"^(#{1,6}\s.*|\*\*[^*\n]+\*\*:?|__[^_\n]+__:?)$")
+FACT = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+|https?://\S+|\d+")
+
+def shingles(text: str, size=SHINGLE_SIZE) -> set:
+    words = WORD.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def simhash(features) -> int:
+    """64-bit simhash of a set of string features"""
+    weights = [0] * 64
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def facts(text: str) -> frozenset:
+    """emails, urls and digit runs of a text"""
+    return frozenset(FACT.findall(text.lower()))
+
+class NearDuplicateIndex:
+    """
+    remembers texts and tells whether a new one is a (near) duplicate of any of them
+    long texts are compared by simhash of their word shingles, short ones by their normalized words only,
+    so "call 555-0101" and "call 555-0102" stay apart; max_distance=None matches exact repeats only
+    long texts only count as near-duplicates if they hold the same emails, urls and numbers,
+    a paragraph that differs from another in a phone number or an address is never merged into it
+    """
+
+    def __init__(self, max_distance=MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.exact = set()
+        self.fingerprints = [] # (simhash, facts), a few hundred blocks per crawl, a linear scan is cheap
+        self.duplicates = 0
+
+    def seen(self, text: str) -> bool:
+        """True if text (or something very close) was added before, otherwise adds it and returns False"""
+        normalized = " ".join(WORD.findall(text.lower()))
+        if normalized in self.exact:
+            self.duplicates += 1
+            return True
+        self.exact.add(normalized)
+
+        if self.max_distance is None:
+            return False
+        features = shingles(normalized)
+        if len(features) < MIN_SHINGLES:
+            return False
+
+        fingerprint, text_facts = simhash(features), facts(text)
+        if any(hamming(fingerprint, other) <= self.max_distance and text_facts == other_facts
+               for other, other_facts in self.fingerprints):
+            self.duplicates += 1
+            return True
+        self.fingerprints.append((fingerprint, text_facts))
+        return False
+
+def _mergeable(paragraph: str) -> bool:
+    """a real block of text, headings and short labels repeat on purpose (each section of a summary has its "Contact")"""
+    return not HEADING.match(paragraph.strip()) and len(shingles(paragraph)) >= MIN_SHINGLES
+
+def merge_paragraphs(text: str) -> str:
+    """
+    drops summary paragraphs that repeat (or nearly repeat, with the same numbers and emails) an earlier one, order is kept
+    headings and paragraphs under MIN_SHINGLES are always kept, so what follows them stays in its own section
+    """
+    index = NearDuplicateIndex()
+    kept = [paragraph for paragraph in re.split(r"\n\s*\n", text)
+            if paragraph.strip() and not (_mergeable(paragraph) and index.seen(paragraph))]
+    return "\n\n".join(kept)
@@ -0,0 +1,85 @@
+from collections import deque
+from urllib.parse import parse_qsl, urldefrag, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+def normalize_url(url: str):
+    """
+    canonical form of a page url: lowercase scheme/host, no default port,
+    no #fragment, sorted query, no trailing slash (except the root)
+    returns None for anything that is not http(s), or is too malformed to parse ("http://host:abc/", "http://[oops/")
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port # parsed lazily, a bad port only raises here
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return None # mailto:, tel:, javascript:, ...
+
+    host = (parts.hostname or "").lower()
+    if not host:
+        return None
+    if port is not None and str(port) != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+def url_key(url: str) -> str:
+    """dedup key for a normalized url, http and https versions of a page are the same page"""
+    return url.split("://", 1)[1]
+
+def site_host(url: str) -> str:
+    """host[:port] of a normalized url without a leading www."""
+    host = url_key(url).split("/", 1)[0]
+    return host[4:] if host.startswith("www.") else host
+
+def same_origin(url: str, other: str) -> bool:
+    """True if both normalized urls belong to the same site"""
+    return site_host(url) == site_host(other)
+
+class Frontier:
+    """
+    breadth-first crawl frontier
+    the seen-set covers queued as well as visited pages, so every page is
+    queued once and max_pages is only spent on distinct same-site urls
+    """
+
+    def __init__(self, start_url: str, max_pages=50):
+        self.start_url = normalize_url(start_url) or start_url
+        self.max_pages = max_pages
+        self.queue = deque()
+        self.seen = set()
+
+    def admit(self, url: str):
+        """
+        the url as discovered (minus its #fragment) if it is new, same-site and within budget, otherwise None
+        the normalized form is only the seen-set key: "blog/" has to be fetched as "blog/", or its relative links break
+        """
+        normalized = normalize_url(url)
+        if normalized is None or not same_origin(normalized, self.start_url):
+            return None
+        key = url_key(normalized)
+        if key in self.seen or len(self.seen) >= self.max_pages:
+            return None
+        self.seen.add(key)
+        return urldefrag(url.strip())[0]
+
+    def push(self, url: str) -> bool:
+        url = self.admit(url)
+        if url is None:
+            return False
+        self.queue.append(url)
+        return True
+
+    def pop(self) -> str:
+        return self.queue.popleft()
+
+    def __len__(self):
+        return len(self.queue)
@@ -1,6 +1,8 @@
 import os
 from google.genai import types
 
+from functions.workspace import active_workspace
+
 def get_files_info(working_directory: str, directory: str=None) -> dict:
 
     # simple guardrails to keep model from accessing private files
@@ -12,6 +14,14 @@ def get_files_info(working_directory: str, directory: str=None) -> dict:
     if not abs_directory.startswith(abs_working_dir): # checks the prefix of the working directory matches that of the directory the model is trying to access
         return {'error': f"{directory} is outside current working directory"}
     
+    # in-memory workspace (if one is open) knows about files not flushed to disk yet
+    workspace = active_workspace(working_directory)
+    if workspace is not None:
+        relpath = os.path.relpath(abs_directory, abs_working_dir)
+        if not workspace.isdir(relpath):
+            return {'error': f"{directory} is not a directory"}
+        return workspace.listdir(relpath)
+
     dir_contents = os.listdir(abs_directory) # lists out the contents of the directory
 
     return_dict = {} # initialize, will be returned
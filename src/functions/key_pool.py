@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from google import genai
+
+from functions.api import book_tokens, request_tokens, retry_after, stream_chunks
+from functions.rate_limit import limiter_for
+from functions.trace import count, span, tracer
+
+MAX_KEYS = 64 # KEY_1 ... KEY_64 are looked up in the environment
+RETRY_PAUSE = 30 # seconds a key sits out after a 429 that came without a retry hint
+
+def keys_from_env(prefix="KEY_") -> list:
+    """every KEY_1..KEY_N that is set (gaps are skipped), in order"""
+    keys = []
+    for number in range(1, MAX_KEYS + 1):
+        key = os.environ.get(f"{prefix}{number}")
+        if key:
+            keys.append(key)
+    return keys
+
+class KeyPool:
+    """
+    several api keys used as one client: pool.models.generate_content(...) works like genai.Client
+    every request goes to the key that can send it soonest (each key keeps its own rpm/tpm limiter per model),
+    a 429 only sits that key out and the request moves on to the next one
+    callers pass limiter=None to api_call_with_retry, pacing happens here
+    config may be a SharedContext, it is resolved for the key that sends the request (caches are per key)
+    requests are timed here, after the key's quota wait, so "api call" spans never include waiting
+    """
+
+    times_requests = True # api_call_with_retry leaves the "api call" span to the pool
+
+    def __init__(self, keys: list, make_client=None):
+        if not keys:
+            raise ValueError("the key pool needs at least one api key (KEY_1 in .env)")
+        make_client = make_client or (lambda key: genai.Client(api_key=key))
+        self.keys = list(keys)
+        self.clients = {key: make_client(key) for key in self.keys}
+        self.lock = threading.Lock() # picking a key and booking its quota happen together
+        self.models = self # drop-in for client.models
+
+    def _pick(self, model: str, tokens: int):
+        """least loaded key for the model, with its quota already booked"""
+        with self.lock:
+            key = min(self.keys, key=lambda key: limiter_for(key, model).delay(tokens))
+            return key, limiter_for(key, model).reserve(tokens)
+
+    def _attempts(self, model: str, estimated: int):
+        """(key, limiter) for every try of one request, each key's quota wait already served"""
+        for _ in self.keys: # every key gets one chance before the 429 goes back to the caller
+            key, wait = self._pick(model, estimated)
+            if wait > 0:
+                count("api.quota_wait_s", wait)
+                with span("quota wait"):
+                    time.sleep(wait)
+            yield key, limiter_for(key, model)
+
+    def _rejected(self, key: str, limiter, estimated: int, error):
+        """sits a key out after a 429, anything else goes straight back to the caller"""
+        if "429" not in str(error):
+            raise error
+        count("pool.429", key=f"...{key[-4:]}")
+        hint = retry_after(error)
+        limiter.pause(hint if hint is not None else RETRY_PAUSE)
+        limiter.record(estimated, 0)
+
+    def _config(self, key: str, config):
+        return config.resolve(key, self.clients[key]) if hasattr(config, "resolve") else config
+
+    def generate_content(self, *args, model: str, contents=None, config=None, **kwargs):
+        estimated = request_tokens(contents) + getattr(config, "tokens", 0) # a shared context counts on every request
+        error = None
+        for key, limiter in self._attempts(model, estimated):
+            try:
+                with span("api call", model=model):
+                    response = self.clients[key].models.generate_content(*args, model=model, contents=contents,
+                                                                         config=self._config(key, config), **kwargs)
+            except Exception as e:
+                self._rejected(key, limiter, estimated, e)
+                error = e
+                continue
+
+            book_tokens(limiter, estimated, response)
+            return response
+        raise error
+
+    def generate_content_stream(self, *args, model: str, contents=None, config=None, **kwargs):
+        """streamed generate_content, a key that rejects the request is swapped out before the first chunk"""
+        estimated = request_tokens(contents) + getattr(config, "tokens", 0)
+        error = None
+        for key, limiter in self._attempts(model, estimated):
+            start = time.perf_counter()
+            try:
+                stream = iter(self.clients[key].models.generate_content_stream(*args, model=model, contents=contents,
+                                                                               config=self._config(key, config), **kwargs))
+                first = next(stream, None)
+            except Exception as e:
+                self._rejected(key, limiter, estimated, e)
+                error = e
+                continue
+
+            def finished(last_usage):
+                tracer.record_span("api stream", time.perf_counter() - start, model=model)
+                book_tokens(limiter, estimated, last_usage)
+
+            yield from stream_chunks(first, stream, finished)
+            return
+        raise error
+
+    def report(self, models=()) -> str:
+        """requests and tokens sent per key (keys shown by their last 4 characters)"""
+        lines = []
+        for key in self.keys:
+            for model in models:
+                limiter = limiter_for(key, model)
+                if limiter.request_count:
+                    lines.append(f"key ...{key[-4:]} {model}: {limiter.request_count} requests, {limiter.token_count} tokens")
+        return "\n".join(lines)
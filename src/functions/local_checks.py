@@ -0,0 +1,222 @@
+import os
+import posixpath
+import threading
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+from bs4 import BeautifulSoup
+
+from functions.preprocess import DomIndex, NESTED_AT_RULES, minify_css, split_rules, split_selectors
+from functions.workspace import blob_hash
+
+# elements that never have a closing tag
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+# elements whose closing tag html lets you leave out
+OPTIONAL_CLOSE = {"p", "li", "dt", "dd", "tr", "td", "th", "thead", "tbody", "tfoot", "option", "colgroup", "html", "head", "body"}
+
+ERROR = "error"     # must be fixed before the evaluator model is asked
+WARNING = "warning" # passed along, does not block the evaluator
+
+class Finding:
+    """one problem found by the local checks"""
+
+    def __init__(self, severity: str, check: str, file: str, message: str, line=None):
+        self.severity = severity
+        self.check = check
+        self.file = file
+        self.message = message
+        self.line = line
+
+    def __str__(self):
+        where = f"{self.file}:{self.line}" if self.line else self.file
+        return f"[{self.severity}] {self.check} {where}: {self.message}"
+
+class TagBalanceParser(HTMLParser):
+    """reports unclosed and stray closing tags, with line numbers"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []    # (tag, line)
+        self.problems = [] # (line, message)
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in VOID_TAGS:
+            self.stack.append((tag, self.getpos()[0]))
+
+    def handle_startendtag(self, tag, attrs):
+        pass # <tag/> closes itself
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS:
+            return
+        open_tags = [name for name, _ in self.stack]
+        if tag not in open_tags:
+            self.problems.append((self.getpos()[0], f"</{tag}> closes nothing"))
+            return
+        # everything opened after the matching tag is implicitly closed here
+        while self.stack:
+            name, line = self.stack.pop()
+            if name == tag:
+                break
+            if name not in OPTIONAL_CLOSE:
+                self.problems.append((line, f"<{name}> is never closed (closed implicitly by </{tag}>)"))
+
+    def close(self):
+        super().close()
+        for name, line in self.stack:
+            if name not in OPTIONAL_CLOSE:
+                self.problems.append((line, f"<{name}> is never closed"))
+
+def site_files(workspace) -> dict:
+    """{relative path: text} of the generated site, read from the in-memory workspace"""
+    return {relpath.replace(os.sep, "/"): workspace.read(relpath) for relpath in list(workspace.files)}
+
+def _local_target(source: str, reference: str):
+    """site-relative path a reference in `source` points to, None for external/anchor/script links"""
+    parts = urlsplit(reference.strip())
+    if parts.scheme or parts.netloc or not parts.path:
+        return None # http(s), mailto:, tel:, javascript:, data:, "#section", "?q"
+    if parts.path.startswith("/"):
+        path = parts.path.lstrip("/")
+    else:
+        path = posixpath.join(posixpath.dirname(source), parts.path)
+    path = posixpath.normpath(path)
+    if parts.path.endswith("/") or path == ".":
+        path = posixpath.join(path, "index.html") if path != "." else "index.html"
+    return path
+
+def _exists(files: dict, path: str) -> bool:
+    return path in files or f"{path}.html" in files or posixpath.join(path, "index.html") in files
+
+def expected_page(page_url: str) -> str:
+    """file a crawled page is expected to become: / -> index.html, /about -> about.html, /a/b.php -> a/b.html"""
+    path = urlsplit(page_url).path.strip("/")
+    if not path:
+        return "index.html"
+    root, ext = posixpath.splitext(path)
+    return f"{root}.html" if ext else f"{path}.html"
+
+class PageCheck:
+    """what the checks need from one html file, parsed once: its own findings, local references and dom"""
+
+    def __init__(self, path: str, html: str):
+        self.findings = []
+
+        parser = TagBalanceParser()
+        parser.feed(html)
+        parser.close()
+        for line, message in parser.problems:
+            self.findings.append(Finding(ERROR, "unclosed-tag", path, message, line))
+
+        soup = BeautifulSoup(html, "html.parser")
+        if soup.find("meta", attrs={"name": "viewport"}) is None:
+            self.findings.append(Finding(ERROR, "viewport", path, 'missing <meta name="viewport" content="width=device-width, initial-scale=1">'))
+
+        # (tag, reference, site path it points to, line), only references to files of the site
+        self.links = [("a", a["href"], _local_target(path, a["href"]), a.sourceline) for a in soup.find_all("a", href=True)]
+        references = [(tag, "href") for tag in soup.find_all("link", href=True) if "stylesheet" in (tag.get("rel") or [])]
+        references += [(tag, "src") for tag in soup.find_all(["script", "img", "source"], src=True)]
+        self.references = [(tag.name, tag[attribute], _local_target(path, tag[attribute]), tag.sourceline) for tag, attribute in references]
+        self.links = [link for link in self.links if link[2]]
+        self.references = [reference for reference in self.references if reference[2]]
+
+        self.dom = DomIndex(soup)
+
+def check_html(path: str, html: str, files: dict, page=None) -> list:
+    page = page or PageCheck(path, html)
+    findings = list(page.findings)
+
+    for _, href, target, line in page.links:
+        if not _exists(files, target):
+            findings.append(Finding(ERROR, "broken-link", path, f'link to "{href}" but {target} does not exist', line))
+
+    for name, reference, target, line in page.references:
+        if target not in files:
+            findings.append(Finding(ERROR, "missing-file", path, f'<{name}> references "{reference}" but {target} does not exist', line))
+
+    return findings
+
+def check_css(path: str, css: str, doms: list) -> list:
+    """duplicate selectors in the same block and selectors no generated page uses"""
+    findings = []
+
+    def walk(block, context):
+        seen = set()
+        for prelude, body in split_rules(block):
+            if body is None:
+                continue
+            if prelude.startswith(NESTED_AT_RULES):
+                walk(body, prelude)
+                continue
+            if prelude.startswith("@"):
+                continue
+            for selector in split_selectors(prelude):
+                if selector in seen:
+                    findings.append(Finding(WARNING, "duplicate-selector", path, f'"{selector}" is defined more than once' + (f" in {context}" if context else "")))
+                seen.add(selector)
+                if doms and not any(dom.used(selector) for dom in doms):
+                    findings.append(Finding(WARNING, "unused-selector", path, f'"{selector}" matches nothing on any page'))
+
+    walk(minify_css(css), None)
+    return findings
+
+class LocalChecker:
+    """
+    the local checks with every html file's parse kept by content, so a file finished while agent 3 is still
+    generating (add() from the tool thread) or unchanged since the last iteration is not parsed again
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pages = {} # (path, content hash) -> PageCheck
+
+    def _page(self, path: str, html: str) -> PageCheck:
+        key = (path, blob_hash(html.encode("utf-8")))
+        with self.lock:
+            page = self.pages.get(key)
+        if page is None:
+            page = PageCheck(path, html)
+            with self.lock:
+                self.pages[key] = page
+        return page
+
+    def add(self, path: str, text: str):
+        """a file the agent has finished writing, html is parsed right away"""
+        if path.endswith((".html", ".htm")):
+            self._page(path, text)
+
+    def run(self, files: dict, crawled_urls=()) -> list:
+        """
+        deterministic checks over the generated site, returns a list of Findings
+        errors: broken internal links, missing css/js/img files, unclosed tags, missing viewport meta;
+        warnings: duplicate and unused css selectors, crawled pages that were not generated
+        """
+        findings = []
+        html_files = {path: text for path, text in files.items() if path.endswith((".html", ".htm"))}
+        pages = {path: self._page(path, html) for path, html in html_files.items()}
+        with self.lock: # older versions of the files are not needed again
+            current = {(path, blob_hash(html.encode("utf-8"))) for path, html in html_files.items()}
+            self.pages = {key: page for key, page in self.pages.items() if key in current}
+
+        for path, html in html_files.items():
+            findings.extend(check_html(path, html, files, pages[path]))
+
+        doms = [page.dom for page in pages.values()]
+        for path, css in files.items():
+            if path.endswith(".css"):
+                findings.extend(check_css(path, css, doms))
+
+        for page_url in crawled_urls:
+            page = expected_page(page_url)
+            if not _exists(files, page[:-len(".html")]):
+                # a warning: a big site may be rebuilt with fewer pages, coverage decides when enough is there
+                findings.append(Finding(WARNING, "missing-page", page, f"{page_url} was on the original site but has no generated page"))
+
+        return findings
+
+def has_errors(findings: list) -> bool:
+    return any(finding.severity == ERROR for finding in findings)
+
+def format_findings(findings: list) -> str:
+    """one line per finding, errors first"""
+    ordered = sorted(findings, key=lambda finding: (finding.severity != ERROR, finding.file, finding.line or 0))
+    return "\n".join(str(finding) for finding in ordered)
@@ -0,0 +1,141 @@
+import os
+import re
+from google.genai import types
+
+from functions.workspace import load_file, store_file
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+def apply_edits(text: str, edits: list) -> str:
+    """search/replace edits, every search text has to match exactly once"""
+    for number, edit in enumerate(edits, start=1):
+        old_text = edit.get("old_text") or ""
+        new_text = edit.get("new_text") or ""
+        if not old_text:
+            raise ValueError(f"edit {number}: old_text is empty")
+        count = text.count(old_text)
+        if count == 0:
+            raise ValueError(f"edit {number}: old_text not found")
+        if count > 1:
+            raise ValueError(f"edit {number}: old_text matches {count} times, add more surrounding lines")
+        text = text.replace(old_text, new_text, 1)
+    return text
+
+def _parse_hunks(diff: str) -> list:
+    hunks = []
+    for line in diff.splitlines():
+        match = HUNK_HEADER.match(line)
+        if match:
+            hunks.append({"start": int(match.group(1)), "old": [], "new": []})
+        elif not hunks:
+            continue # file headers ("--- a/x", "+++ b/x") and anything else before the first hunk
+        elif line.startswith("\\ No newline"):
+            continue # "\ No newline at end of file", the only marker inside a hunk
+        elif line.startswith("-"): # "---a: red;" removes the line "--a: red;"
+            hunks[-1]["old"].append(line[1:])
+        elif line.startswith("+"):
+            hunks[-1]["new"].append(line[1:])
+        else: # context line (a lone empty line is an empty context line)
+            hunks[-1]["old"].append(line[1:])
+            hunks[-1]["new"].append(line[1:])
+    return hunks
+
+def _find_block(lines, block, expected, start):
+    """index of block in lines at or after start, the match closest to the expected line wins"""
+    size = len(block)
+    matches = [i for i in range(start, len(lines) - size + 1) if lines[i:i + size] == block]
+    if not matches:
+        return None
+    return min(matches, key=lambda i: abs(i - expected))
+
+def apply_unified_diff(text: str, diff: str) -> str:
+    """applies the hunks of a unified diff, line numbers may be off as long as the context matches"""
+    hunks = _parse_hunks(diff)
+    if not hunks:
+        raise ValueError("diff has no @@ hunks")
+
+    trailing_newline = text.endswith("\n")
+    lines = text.splitlines()
+    position = 0
+    for number, hunk in enumerate(hunks, start=1):
+        if not hunk["old"]: # pure insertion
+            index = min(max(hunk["start"], 0), len(lines))
+        else:
+            index = _find_block(lines, hunk["old"], hunk["start"] - 1, position)
+            if index is None:
+                raise ValueError(f"hunk {number}: context/removed lines not found in the file")
+        lines[index:index + len(hunk["old"])] = hunk["new"]
+        position = index + len(hunk["new"])
+
+    return "\n".join(lines) + ("\n" if trailing_newline else "")
+
+def patch_file(working_directory: str, filepath: str, edits: list = None, diff: str = None):
+
+    # gets absolute paths
+    abs_working_dir = os.path.abspath(working_directory)
+    abs_filepath = os.path.abspath(os.path.join(abs_working_dir, filepath))
+
+    # checks if file is in cwd
+    if not abs_filepath.startswith(abs_working_dir):
+        return f"error: {filepath} is not a valid file to patch in the working directory"
+
+    text = load_file(working_directory, abs_filepath)
+    if text is None:
+        return f"error: {filepath} is either not a file or doesn't exist yet"
+
+    # apply the change, nothing is written if any part of it does not apply
+    try:
+        if edits:
+            text = apply_edits(text, list(edits))
+        if diff:
+            text = apply_unified_diff(text, diff)
+        if not edits and not diff:
+            return "error: pass either edits or diff"
+    except ValueError as e:
+        return f"error: {e} (file left unchanged)"
+
+    try:
+        store_file(working_directory, abs_filepath, text)
+    except Exception as e:
+        return f"exception {e} occurred when attempting to write to file"
+    return {"success": True, "path": filepath, "chars": len(text)}
+
+# schema
+patch_file_schema = types.FunctionDeclaration(
+    name='patch_file',
+    description='Changes part of an existing file without rewriting it. Pass either search/replace edits or a unified diff. Much cheaper than write_file for small fixes.',
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "working_directory": types.Schema(
+                type=types.Type.STRING,
+                description="The base working directory. The function restricts access to files within this directory.",
+                nullable=True
+            ),
+            "filepath": types.Schema(
+                type=types.Type.STRING,
+                description="Relative filepath to the file that should be patched.",
+                nullable=False
+            ),
+            "edits": types.Schema(
+                type=types.Type.ARRAY,
+                description="Search/replace edits applied in order. Each old_text must appear exactly once in the file.",
+                nullable=True,
+                items=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={
+                        "old_text": types.Schema(type=types.Type.STRING, description="Exact text to replace, include enough lines to be unique."),
+                        "new_text": types.Schema(type=types.Type.STRING, description="Replacement text (empty to delete)."),
+                    },
+                    required=["old_text", "new_text"]
+                )
+            ),
+            "diff": types.Schema(
+                type=types.Type.STRING,
+                description="Unified diff (@@ hunks with context, - and + lines) for this one file.",
+                nullable=True
+            )
+        },
+        required=["filepath"]
+    )
+)
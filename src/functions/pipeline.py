@@ -0,0 +1,123 @@
+import asyncio
+from bs4 import BeautifulSoup
+
+from functions.api import api_call_with_retry
+from functions.chunking import ChunkPacker, TOKENS_PER_CHUNK
+from functions.trace import count, span
+
+CHUNK_BACKLOG = 8 # chunks allowed to wait per summarizer before the crawl is paused
+MAX_IN_FLIGHT = 4 # parallel requests per summarizer, the key pool still decides when they go out
+
+class Summarizer:
+    """
+    one summarizing agent: its own model, config and view
+    `client` is usually the KeyPool every agent shares, it picks a key with quota left and paces each request
+    `view` cuts a crawled page into the pieces this agent needs (see functions/preprocess.py),
+    which are packed into chunks of up to `chunk_tokens` estimated tokens
+    with a checkpoint (ChunkStore) every chunk's summary is saved, a resumed run only sends the chunks it is missing
+    """
+
+    def __init__(self, name: str, client, model: str, config, view, concurrency=MAX_IN_FLIGHT, cache=None,
+                 chunk_tokens=TOKENS_PER_CHUNK, checkpoint=None):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.config = config
+        self.view = view
+        self.concurrency = concurrency
+        self.cache = cache # ResponseCache, repeated chunks are answered without an api call
+        self.chunk_tokens = chunk_tokens
+        self.checkpoint = checkpoint
+
+    async def summarize(self, chunk: str) -> str:
+        if self.checkpoint is not None:
+            text = self.checkpoint.get(chunk)
+            if text is not None:
+                count("checkpoint.chunk_hits")
+                return text
+
+        # the sdk call blocks (and the pool waits for rpm/tpm budget), so it runs on a worker thread while the crawl keeps going
+        call = self.cache.call if self.cache is not None else api_call_with_retry
+        with span(self.name): # usage of the call is booked on this agent
+            response = await asyncio.to_thread(
+                call,
+                client=self.client,
+                contents=[chunk], # prompt
+                model=self.model,
+                config=self.config,
+            )
+        if self.checkpoint is not None:
+            self.checkpoint.put(chunk, response.text or "")
+        return response.text
+
+async def stream_summaries(crawler, style: str, summarizers: list, coverage=None, assets=None) -> list:
+    """
+    crawl, chunk and summarize at the same time
+    pages go from the crawler through each summarizer's view and chunk packer straight on to the summarizer,
+    the summarizers run concurrently with up to `concurrency` requests each in flight
+    an optional CoverageIndex is filled from the same parsed pages, an optional AssetPipeline fetches
+    each page's images alongside
+    returns one combined response string per summarizer (chunk order is kept)
+    """
+    queues = [asyncio.Queue(maxsize=CHUNK_BACKLOG) for _ in summarizers]
+    packers = [ChunkPacker(style, summarizer.chunk_tokens) for summarizer in summarizers]
+
+    async def produce():
+        chunk_counter = 0
+
+        async def send(queue, chunks):
+            nonlocal chunk_counter
+            for chunk in chunks:
+                chunk_counter += 1
+                print(f"chunk {chunk_counter}")
+                await queue.put(chunk)
+
+        def cut(page_url, page):
+            """every view's pieces of one page, also fills the coverage index"""
+            soup = BeautifulSoup(page["html"], "html.parser") # parsed once, shared by every view
+            if coverage is not None:
+                coverage.add_page(page_url, soup)
+            return [summarizer.view(page_url, page, soup, crawler.stylesheets) for summarizer in summarizers]
+
+        try:
+            async for page_url, page in crawler.stream():
+                if assets is not None:
+                    assets.add(page_url, page.get("images", ())) # crawls recorded before images were collected have none
+                # the tree and the selector matching take milliseconds per page, on the loop they would hold up every fetch
+                # pages still go through the views one at a time and in crawl order (the views dedup across pages)
+                views = await asyncio.to_thread(cut, page_url, page)
+                for packer, queue, pieces in zip(packers, queues, views):
+                    await send(queue, packer.add(page_url, pieces))
+
+            # whatever is left in the packers once the crawl is over
+            for packer, queue in zip(packers, queues):
+                await send(queue, packer.flush())
+        finally:
+            for queue in queues:
+                await queue.put(None) # end of stream
+
+    async def consume(summarizer, queue):
+        in_flight = asyncio.Semaphore(summarizer.concurrency)
+        tasks = []
+
+        async def run(chunk_number, chunk):
+            try:
+                text = await summarizer.summarize(chunk)
+            finally:
+                in_flight.release()
+            print(f"{summarizer.name}: chunk {chunk_number}")
+            return f"\n{text}\n"
+
+        while (chunk := await queue.get()) is not None:
+            await in_flight.acquire() # stop pulling chunks while every slot is busy
+            tasks.append(asyncio.create_task(run(len(tasks) + 1, chunk)))
+        return "".join(await asyncio.gather(*tasks))
+
+    if assets is not None:
+        await assets.start()
+    try:
+        results = await asyncio.gather(produce(), *(consume(s, q) for s, q in zip(summarizers, queues)))
+    finally:
+        if assets is not None:
+            await assets.finish()
+    return results[1:]
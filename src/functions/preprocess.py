@@ -0,0 +1,290 @@
+import json
+import re
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+from functions.dedup import NearDuplicateIndex
+
+# never visible to a visitor (json-ld is pulled out separately)
+SKIP_TAGS = {"script", "style", "noscript", "svg", "template", "iframe", "canvas", "head", "object", "video", "audio", "map"}
+
+# elements that start a new line in the outline
+BLOCK_TAGS = {
+    "body", "main", "header", "footer", "nav", "section", "article", "aside", "div", "p", "ul", "ol", "li",
+    "table", "tr", "td", "th", "dl", "dt", "dd", "blockquote", "figure", "figcaption", "address", "form",
+    "label", "button", "option", "h1", "h2", "h3", "h4", "h5", "h6", "pre",
+}
+HEADINGS = {f"h{level}": "#" * level + " " for level in range(1, 7)}
+
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+CSS_SPACE = re.compile(r"\s+")
+CSS_PUNCTUATION = re.compile(r"\s*([{};,>])\s*")
+CSS_COLON = re.compile(r":\s+") # "a :hover" is a different selector from "a:hover", so only trailing space goes
+DECLARATION_COLON = re.compile(r"\s*:\s*") # inside a declaration block both sides can go
+
+# at-rules whose body is a list of rules that can be pruned
+NESTED_AT_RULES = ("@media", "@supports", "@container", "@layer", "@document")
+
+# pseudo classes/elements that depend on interaction or generated content, dropped before matching against the dom
+DYNAMIC_PSEUDO = re.compile(
+    r"::?(?:hover|focus|focus-within|focus-visible|active|visited|link|target|checked|disabled|enabled|"
+    r"before|after|placeholder|selection|first-letter|first-line|marker|backdrop|-webkit-[\w-]+|-moz-[\w-]+|-ms-[\w-]+)"
+    r"(?![\w-])(?:\([^)]*\))?"
+)
+NOT_PSEUDO = re.compile(r":not\([^)]*\)|\[[^\]]*\]") # negations and attribute selectors
+CLASS_TOKEN = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+ID_TOKEN = re.compile(r"#(-?[_a-zA-Z][\w-]*)")
+
+# blocks most sites repeat on every page
+TEMPLATE_TAGS = ["header", "nav", "footer", "aside"]
+TEMPLATE_ROLES = {"banner", "navigation", "contentinfo", "complementary"}
+TEMPLATE_HINT = re.compile(r"cookie|consent|gdpr|banner|newsletter|popup|modal|topbar|announcement", re.IGNORECASE)
+
+def _skipped(node, exclude=()) -> bool:
+    return any(parent.name in SKIP_TAGS or id(parent) in exclude for parent in node.parents)
+
+def _block(node):
+    for parent in node.parents:
+        if parent.name in BLOCK_TAGS:
+            return parent
+    return None
+
+def page_outline(soup: BeautifulSoup, exclude=()) -> str:
+    """
+    visible text of a page with its structure kept as light markdown
+    (headings, list items, image alt text, tel:/mailto: targets), no markup, css or js
+    elements in `exclude` (and everything inside them) are left out
+    """
+    lines = []
+
+    title = soup.title.get_text(" ", strip=True) if soup.title else ""
+    if title:
+        lines.append(f"TITLE: {title}")
+    description = soup.find("meta", attrs={"name": "description"})
+    if description and description.get("content"):
+        lines.append(f"DESCRIPTION: {description['content'].strip()}")
+
+    # structured data often holds the address, phone number and opening hours
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            lines.append(f"STRUCTURED DATA: {json.dumps(json.loads(script.string or ''), separators=(',', ':'))}")
+        except ValueError:
+            pass
+
+    lines.extend(_outline_lines(soup.body or soup, {id(tag) for tag in exclude}))
+    return "\n".join(lines)
+
+def block_outline(tag: Tag) -> str:
+    """outline of one element of a page (header, footer, ...), same format as page_outline"""
+    return "\n".join(_outline_lines(tag, set()))
+
+def _outline_lines(root, exclude: set) -> list:
+    lines = []
+    current_block = None
+    for node in root.descendants:
+        if isinstance(node, Tag):
+            if node.name == "img" and node.get("alt", "").strip() and not _skipped(node, exclude):
+                lines.append(f"[image: {node['alt'].strip()}]")
+                current_block = None
+            elif node.name == "a" and node.get("href", "").startswith(("tel:", "mailto:")) and not _skipped(node, exclude):
+                lines.append(f"[{node['href']}]")
+                current_block = None
+            continue
+
+        if type(node) is not NavigableString: # comments, doctype, cdata
+            continue
+        text = CSS_SPACE.sub(" ", node).strip()
+        if not text or _skipped(node, exclude):
+            continue
+
+        block = _block(node)
+        if block is current_block and lines:
+            lines[-1] += f" {text}"
+            continue
+        current_block = block
+        prefix = ""
+        if block is not None:
+            prefix = HEADINGS.get(block.name) or ("- " if block.name == "li" else "")
+        lines.append(prefix + text)
+    return lines
+
+def template_blocks(soup: BeautifulSoup) -> list:
+    """outermost header/nav/footer/aside, landmark roles and cookie/newsletter style banners of a page"""
+    def is_template(tag):
+        if tag.name in TEMPLATE_TAGS or tag.get("role") in TEMPLATE_ROLES:
+            return True
+        hints = " ".join([tag.get("id") or "", *(tag.get("class") or [])])
+        return tag.name not in ("body", "html", "main") and bool(hints.strip()) and bool(TEMPLATE_HINT.search(hints))
+
+    found = [tag for tag in (soup.body or soup).find_all(True) if is_template(tag)]
+    ids = {id(tag) for tag in found}
+    return [tag for tag in found if not any(id(parent) in ids for parent in tag.parents)]
+
+def minify_css(css: str) -> str:
+    """drops comments and every bit of whitespace css does not need"""
+    css = CSS_COMMENT.sub("", css)
+    css = CSS_SPACE.sub(" ", css)
+    css = CSS_PUNCTUATION.sub(r"\1", css)
+    css = CSS_COLON.sub(":", css)
+    return css.replace(";}", "}").strip()
+
+def split_rules(css: str) -> list:
+    """top level (prelude, body) pairs of minified css, @import-style statements have body None"""
+    rules = []
+    depth = 0
+    start = 0
+    body_start = None
+    for i, char in enumerate(css):
+        if char == "{":
+            if depth == 0:
+                body_start = i
+            depth += 1
+        elif char == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                rules.append((css[start:body_start].strip(), css[body_start + 1:i]))
+                start = i + 1
+        elif char == ";" and depth == 0:
+            statement = css[start:i].strip()
+            if statement:
+                rules.append((statement, None))
+            start = i + 1
+    return rules
+
+def split_selectors(prelude: str) -> list:
+    """selectors of a rule prelude, commas inside :is()/:not()/[...] do not split"""
+    selectors, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            selectors.append(prelude[start:i])
+            start = i + 1
+    selectors.append(prelude[start:])
+    return [selector.strip() for selector in selectors if selector.strip()]
+
+class DomIndex:
+    """answers "does this selector match anything on the page", with a cheap class/id pre-check"""
+
+    def __init__(self, soup: BeautifulSoup):
+        self.soup = soup
+        self.classes = set()
+        self.ids = set()
+        for tag in soup.find_all(True):
+            self.classes.update(tag.get("class") or [])
+            if tag.get("id"):
+                self.ids.add(tag["id"])
+        self.known = {}
+
+    def used(self, selector: str) -> bool:
+        if selector not in self.known:
+            self.known[selector] = self._match(selector)
+        return self.known[selector]
+
+    def _match(self, selector):
+        static = DYNAMIC_PSEUDO.sub("", selector).strip()
+        if not static or static in ("*", "html", ":root"):
+            return True
+
+        # every class/id outside :not() has to exist somewhere on the page
+        positive = NOT_PSEUDO.sub("", static)
+        if any(name not in self.classes for name in CLASS_TOKEN.findall(positive)):
+            return False
+        if any(name not in self.ids for name in ID_TOKEN.findall(positive)):
+            return False
+
+        try:
+            return self.soup.select_one(static) is not None
+        except Exception: # selectors soupsieve does not support are kept
+            return True
+
+def used_css_rules(css: str, dom: DomIndex) -> list:
+    """minified rules of a stylesheet that apply to the page, unused selectors removed"""
+    kept = []
+    for prelude, body in split_rules(minify_css(css)):
+        if body is None:
+            kept.append(f"{prelude};")
+        elif prelude.startswith(NESTED_AT_RULES):
+            inner = used_css_rules(body, dom)
+            if inner:
+                kept.append(f"{prelude}{{{''.join(inner)}}}")
+        elif prelude.startswith("@"): # @font-face, @keyframes, @page, ...
+            kept.append(f"{prelude}{{{body}}}")
+        else:
+            selectors = [selector for selector in split_selectors(prelude) if dom.used(selector)]
+            if selectors and body:
+                kept.append(f"{','.join(selectors)}{{{DECLARATION_COLON.sub(':', body)}}}")
+    return kept
+
+def outline_sections(outline: str) -> list:
+    """splits an outline before every heading, so each piece is one section of the page"""
+    sections = []
+    for line in outline.split("\n"):
+        if not sections or line.startswith("#"):
+            sections.append(line)
+        else:
+            sections[-1] += f"\n{line}"
+    return sections
+
+class ContentView:
+    """
+    agent 1 input: a page's visible text and structure, one piece per section
+    template blocks (header, nav, footer, banners) come first as site-wide pieces and are dropped once a
+    near-duplicate was sent during this crawl, sections are dropped only when repeated word for word,
+    so shared template content reaches the summarizer once instead of once per page
+    """
+
+    def __init__(self, dedup=True):
+        self.dedup = dedup
+        self.templates = NearDuplicateIndex()
+        self.sections = NearDuplicateIndex(max_distance=None) # cards that differ in a price or a name must stay
+
+    def __call__(self, page_url: str, page: dict, soup: BeautifulSoup, stylesheets: dict) -> list:
+        if not self.dedup:
+            outline = page_outline(soup)
+            return outline_sections(outline) if outline else []
+
+        blocks = template_blocks(soup)
+        pieces = []
+        for block in blocks:
+            text = block_outline(block)
+            if text and not self.templates.seen(text):
+                pieces.append(f"SITE-WIDE {block.name.upper()}:\n{text}")
+
+        outline = page_outline(soup, exclude=blocks)
+        for section in outline_sections(outline) if outline else []:
+            if not self.sections.seen(section):
+                pieces.append(section)
+        return pieces
+
+class StyleView:
+    """
+    agent 2 input: the minified css rules a page actually uses, one piece per rule
+    every rule is sent once per crawl, so a shared theme only shows up with the first page using it
+    """
+
+    def __init__(self):
+        self.sent = set()
+
+    def __call__(self, page_url: str, page: dict, soup: BeautifulSoup, stylesheets: dict) -> list:
+        dom = DomIndex(soup)
+        sources = [style_tag.text for style_tag in soup.find_all("style")]
+        sources.extend(stylesheets[blob_id] for blob_id in page["stylesheets"])
+
+        rules = []
+        for css in sources:
+            rules.extend(used_css_rules(css, dom))
+
+        # style attributes, keyed by tag so the reviewer knows what they style
+        for tag in soup.find_all(style=True):
+            declarations = DECLARATION_COLON.sub(":", minify_css(tag["style"])).rstrip(";")
+            if declarations:
+                rules.append(f"{tag.name}[style]{{{declarations}}}")
+
+        new_rules = []
+        for rule in rules:
+            if rule not in self.sent:
+                self.sent.add(rule)
+                new_rules.append(rule)
+        return new_rules
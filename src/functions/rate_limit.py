@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+
+# default free tier quotas per api key: model -> (requests per minute, tokens per minute)
+RATE_LIMITS = {
+    "gemini-2.0-flash": (15, 1_000_000),
+    "gemini-2.0-flash-lite": (30, 1_000_000),
+    "gemini-2.5-flash": (10, 250_000),
+}
+DEFAULT_LIMIT = (10, 250_000) # anything not listed above gets the strictest quota
+
+def parse_rate_limits(spec: str) -> dict:
+    """
+    "gemini-2.5-flash=1000:1000000, *=2000:4000000" -> {model: (rpm, tpm)}, "*" covers every model not named
+    for paid tiers, set as RATE_LIMITS in the environment (.env)
+    """
+    limits = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        try:
+            model, quota = entry.split("=")
+            rpm, tpm = quota.split(":")
+            limits[model.strip()] = (int(rpm), int(tpm))
+        except ValueError:
+            raise ValueError(f"bad RATE_LIMITS entry {entry.strip()!r}, expected model=rpm:tpm") from None
+    return limits
+
+def rate_limit(model: str) -> tuple:
+    """(rpm, tpm) of a model: RATE_LIMITS from the environment first, then the free tier defaults"""
+    overrides = parse_rate_limits(os.environ.get("RATE_LIMITS", ""))
+    return overrides.get(model) or overrides.get("*") or RATE_LIMITS.get(model) or DEFAULT_LIMIT
+
+class TokenBucket:
+    """
+    bucket refilled continuously at `per_minute` units per minute
+    reserve() takes the units right away (the balance may go negative) and returns
+    how long the caller has to wait before using them, so callers never busy-wait
+    """
+
+    def __init__(self, per_minute: float, capacity=None, clock=time.monotonic):
+        self.rate = per_minute / 60
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        self._refill()
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def delay(self, amount: float) -> float:
+        """how long reserve(amount) would make the caller wait, without taking anything"""
+        self._refill()
+        missing = amount - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+class RateLimiter:
+    """
+    rpm + tpm budget for one api key and model
+    token estimates are corrected with the real usage once a response arrives,
+    and a 429 pauses every caller on the key for as long as the server asked
+    """
+
+    def __init__(self, rpm: int, tpm: int, clock=time.monotonic):
+        self.requests = TokenBucket(rpm, clock=clock)
+        self.tokens = TokenBucket(tpm, clock=clock)
+        self.clock = clock
+        self.lock = threading.Lock() # shared by summarizer threads
+        self.blocked_until = 0.0
+
+        self.request_count = 0 # usage seen so far, for reporting
+        self.token_count = 0
+
+    def reserve(self, tokens: int) -> float:
+        """books one request of `tokens` tokens, returns the seconds to wait before sending it"""
+        with self.lock:
+            wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+            return max(wait, self.blocked_until - self.clock())
+
+    def delay(self, tokens: int) -> float:
+        """seconds a request of `tokens` tokens would wait right now, nothing is booked"""
+        with self.lock:
+            wait = max(self.requests.delay(1), self.tokens.delay(tokens))
+            return max(wait, self.blocked_until - self.clock())
+
+    def record(self, estimated: int, actual: int):
+        """charges the difference between the estimate booked in reserve() and the real usage"""
+        with self.lock:
+            self.tokens.reserve(actual - estimated)
+            self.request_count += 1
+            self.token_count += actual
+
+    def pause(self, seconds: float):
+        """nobody on this key sends anything for `seconds` (server side retry hint)"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+
+_limiters = {} # (api key, model) -> RateLimiter, so every caller on a key shares its quota
+
+def limiter_for(api_key: str, model: str, rpm=None, tpm=None, clock=time.monotonic) -> RateLimiter:
+    """shared limiter for a key/model pair, rpm/tpm/clock override the defaults (rate_limit) on first use"""
+    if (api_key, model) not in _limiters:
+        default_rpm, default_tpm = rate_limit(model)
+        _limiters[(api_key, model)] = RateLimiter(rpm or default_rpm, tpm or default_tpm, clock=clock)
+    return _limiters[(api_key, model)]
@@ -1,6 +1,8 @@
 import os
 from google.genai import types
 
+from functions.workspace import active_workspace
+
 MAX_CHARS = 10000 # to prevent overusing token limits
 
 def read_file_contents(working_directory: str, filepath: str) -> str:
@@ -13,6 +15,14 @@ def read_file_contents(working_directory: str, filepath: str) -> str:
     if not abs_filepath.startswith(abs_working_dir):
         return f"error: {filepath} is not a valid file to access in the working directory"
     
+    # in-memory workspace (if one is open) has the latest, not yet flushed contents
+    workspace = active_workspace(working_directory)
+    if workspace is not None:
+        contents = workspace.read(os.path.relpath(abs_filepath, abs_working_dir))
+        if contents is None:
+            return f'error: {filepath} is not a file'
+        return contents[:MAX_CHARS] # truncate
+
     # checks if given path is actually a file
     if not os.path.isfile(os.path.join(abs_filepath)):
         return f'error: {filepath} is not a file'
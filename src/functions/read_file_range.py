@@ -0,0 +1,107 @@
+import os
+from google.genai import types
+
+from functions.workspace import load_file
+
+MAX_CHARS = 10000 # same page size as read_file_contents
+MAX_LINES = 200
+
+def read_file_range(working_directory: str, filepath: str, start_line: int = None, end_line: int = None,
+                    offset: int = None, max_chars: int = MAX_CHARS) -> dict:
+
+    # gets absolute paths
+    abs_working_dir = os.path.abspath(working_directory)
+    abs_filepath = os.path.abspath(os.path.join(abs_working_dir, filepath))
+
+    # checks if file is in cwd
+    if not abs_filepath.startswith(abs_working_dir):
+        return {"error": f"{filepath} is not a valid file to access in the working directory"}
+
+    try:
+        text = load_file(working_directory, abs_filepath)
+    except Exception as e:
+        return {"error": f"exception {e} occured when attempting to read {filepath}"}
+    if text is None:
+        return {"error": f"{filepath} is not a file"}
+
+    max_chars = min(int(max_chars or MAX_CHARS), MAX_CHARS)
+
+    # character window
+    if offset is not None:
+        offset = max(int(offset), 0)
+        content = text[offset:offset + max_chars]
+        next_offset = offset + len(content)
+        return {
+            "content": content,
+            "offset": offset,
+            "next_offset": next_offset if next_offset < len(text) else None,
+            "total_chars": len(text),
+        }
+
+    # line window (1-based, inclusive), numbered so edits can point at lines
+    lines = text.splitlines()
+    start_line = max(int(start_line or 1), 1)
+    end_line = min(int(end_line or start_line + MAX_LINES - 1), len(lines))
+    if start_line > len(lines) and lines:
+        return {"error": f"start_line {start_line} is past the end of {filepath} ({len(lines)} lines)"}
+
+    numbered = []
+    size = 0
+    last_line = start_line - 1
+    for number in range(start_line, end_line + 1):
+        line = f"{number}: {lines[number - 1]}\n"
+        if numbered and size + len(line) > max_chars:
+            break
+        numbered.append(line)
+        size += len(line)
+        last_line = number
+
+    return {
+        "content": "".join(numbered),
+        "start_line": start_line,
+        "end_line": last_line,
+        "next_start_line": last_line + 1 if last_line < len(lines) else None,
+        "total_lines": len(lines),
+    }
+
+# create schema
+read_file_range_schema = types.FunctionDeclaration(
+    name='read_file_range',
+    description='Reads part of a file inside the working directory, either a range of lines (returned with line numbers) or a character window. Use it to page through large files.',
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "working_directory": types.Schema(
+                type=types.Type.STRING,
+                description="Base working directory. Will be overridden by the agent framework.",
+                nullable=True
+            ),
+            "filepath": types.Schema(
+                type=types.Type.STRING,
+                description="Relative path to the file to read.",
+                nullable=False
+            ),
+            "start_line": types.Schema(
+                type=types.Type.INTEGER,
+                description="First line to return (1-based). Defaults to 1.",
+                nullable=True
+            ),
+            "end_line": types.Schema(
+                type=types.Type.INTEGER,
+                description=f"Last line to return (inclusive). Defaults to start_line + {MAX_LINES - 1}.",
+                nullable=True
+            ),
+            "offset": types.Schema(
+                type=types.Type.INTEGER,
+                description="Character offset to start reading from. If given, lines are ignored.",
+                nullable=True
+            ),
+            "max_chars": types.Schema(
+                type=types.Type.INTEGER,
+                description=f"Maximum characters to return (at most {MAX_CHARS}).",
+                nullable=True
+            )
+        },
+        required=["filepath"]
+    )
+)
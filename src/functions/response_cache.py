@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from functions.api import api_call_with_retry
+
+CACHE_DIR = "response_cache"      # default location, main() lets RESPONSE_CACHE_DIR override it
+MAX_BYTES = 256 * 1024 * 1024     # oldest entries are dropped past this size
+
+class CachedResponse:
+    """the parts of a generate_content response the summarizers use"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.function_calls = None
+        self.usage_metadata = None
+
+def _dump(value):
+    # sdk types are pydantic models, everything else falls back to json/repr
+    if hasattr(value, "model_dump_json"):
+        return value.model_dump_json(exclude_none=True)
+    try:
+        return json.dumps(value, sort_keys=True)
+    except TypeError:
+        return repr(value)
+
+def cache_key(model: str, contents, config) -> str:
+    """content address of a request: hash of model, contents and config (system instruction included)"""
+    digest = hashlib.sha256()
+    for part in (model, _dump(contents), _dump(config)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+class ResponseCache:
+    """
+    persistent cache of text responses keyed by cache_key()
+    one json file per entry, least recently used entries are evicted once the
+    directory grows past max_bytes, entries older than ttl seconds (if set) are ignored
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES, ttl=None, clock=time.time):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock # wall clock, entries and their mtimes outlive the process
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # key -> (last used, size), rebuilt from the directory on start
+        self.index = {}
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                self.index[entry.name[:-5]] = (stat.st_mtime, stat.st_size)
+        self.size = sum(size for _, size in self.index.values())
+
+        self.lock = threading.Lock() # summarizers call in from worker threads
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _drop(self, key):
+        _, size = self.index.pop(key)
+        self.size -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def get(self, key: str):
+        """cached text for a key, None on a miss or an expired entry"""
+        with self.lock:
+            return self._get(key)
+
+    def _get(self, key):
+        if key not in self.index:
+            return None
+        try:
+            with open(self._path(key), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._drop(key)
+            return None
+
+        now = self.clock()
+        if self.ttl is not None and now - entry["created"] > self.ttl:
+            self._drop(key)
+            return None
+
+        os.utime(self._path(key), (now, now)) # mtime doubles as the lru clock across runs
+        self.index[key] = (now, self.index[key][1])
+        return entry["text"]
+
+    def put(self, key: str, text: str):
+        with self.lock:
+            self._put(key, text)
+
+    def _put(self, key, text):
+        now = self.clock()
+        data = json.dumps({"created": now, "text": text})
+        with open(self._path(key), "w") as f:
+            f.write(data)
+
+        if key in self.index:
+            self.size -= self.index[key][1]
+        self.index[key] = (now, len(data))
+        self.size += len(data)
+
+        # evict least recently used entries
+        for old_key, _ in sorted(self.index.items(), key=lambda item: item[1][0]):
+            if self.size <= self.max_bytes:
+                break
+            if old_key != key:
+                self._drop(old_key)
+
+    def call(self, client, model: str, contents, config, **kwargs):
+        """api_call_with_retry, skipping the round-trip when the same request was answered before"""
+        key = cache_key(model, contents, config)
+        with self.lock:
+            text = self._get(key)
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if text is not None:
+            return CachedResponse(text)
+
+        response = api_call_with_retry(client=client, model=model, contents=contents, config=config, **kwargs)
+        if not response.function_calls and response.text is not None: # tool calls are never replayed
+            self.put(key, response.text)
+        return response
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"response cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate)"
@@ -0,0 +1,5 @@
+CHARS_PER_TOKEN = 4 # rough average for english text and markup on gemini models
+
+def estimate_tokens(text: str) -> int:
+    """cheap local token estimate, good enough for budgeting requests"""
+    return max(1, len(text) // CHARS_PER_TOKEN)
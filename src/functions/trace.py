@@ -0,0 +1,115 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_stack = contextvars.ContextVar("trace_stack", default=()) # names of the open spans, copied into to_thread workers
+
+class Tracer:
+    """
+    timing spans, counters and token usage of a run
+    every event is appended to a json-lines file (if one is open) and aggregated for summary()
+    usage is attributed to the innermost open span (e.g. "agent 1", "agent 3")
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.file = None
+        self.spans = {}    # name -> [count, total seconds, max seconds]
+        self.counters = {} # name -> value
+        self.usage = {}    # span name -> [calls, input tokens, output tokens]
+
+    def open(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+            self.file = open(path, "a", encoding="utf-8")
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _write(self, event: dict):
+        """caller holds the lock"""
+        if self.file is not None:
+            event["time"] = round(time.time(), 3)
+            event["thread"] = threading.current_thread().name
+            self.file.write(json.dumps(event) + "\n")
+            self.file.flush()
+
+    def record_span(self, name: str, seconds: float, path=(), **attrs):
+        with self.lock:
+            stats = self.spans.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            self._write({"type": "span", "name": name, "path": "/".join(path), "seconds": round(seconds, 4), **attrs})
+
+    def count(self, name: str, value=1, **attrs):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            self._write({"type": "count", "name": name, "value": value, "path": "/".join(_stack.get()), **attrs})
+
+    def record_usage(self, model: str, input_tokens: int, output_tokens: int):
+        path = _stack.get()
+        owner = path[-1] if path else "unattributed"
+        with self.lock:
+            stats = self.usage.setdefault(owner, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += input_tokens
+            stats[2] += output_tokens
+            self._write({"type": "usage", "name": owner, "model": model, "path": "/".join(path),
+                         "input_tokens": input_tokens, "output_tokens": output_tokens})
+
+    def summary(self) -> str:
+        """plain text tables: spans by total time, token usage per agent, counters"""
+        with self.lock:
+            lines = [f"{'span':<28}{'count':>7}{'total s':>11}{'mean s':>10}{'max s':>10}"]
+            for name, (count, total, longest) in sorted(self.spans.items(), key=lambda item: -item[1][1]):
+                lines.append(f"{name[:27]:<28}{count:>7}{total:>11.2f}{total / count:>10.3f}{longest:>10.3f}")
+
+            if self.usage:
+                lines.append("")
+                lines.append(f"{'tokens':<28}{'calls':>7}{'input':>11}{'output':>10}")
+                for name, (calls, input_tokens, output_tokens) in sorted(self.usage.items()):
+                    lines.append(f"{name[:27]:<28}{calls:>7}{input_tokens:>11}{output_tokens:>10}")
+
+            if self.counters:
+                lines.append("")
+                for name, value in sorted(self.counters.items()):
+                    value = f"{value:.2f}" if isinstance(value, float) else value
+                    lines.append(f"{name:<35}{value:>11}")
+        return "\n".join(lines)
+
+tracer = Tracer() # one per process, shared by every site in batch mode
+
+@contextmanager
+def span(name: str, **attrs):
+    """times the block as `name`, nested spans and api usage inside it are attributed to it"""
+    path = _stack.get() + (name,)
+    token = _stack.set(path)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stack.reset(token)
+        tracer.record_span(name, time.perf_counter() - start, path, **attrs)
+
+def count(name: str, value=1, **attrs):
+    tracer.count(name, value, **attrs)
+
+def record_usage(model: str, response):
+    """input/output tokens from a response's usage metadata, nothing if it has none"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    tracer.record_usage(model, getattr(usage, "prompt_token_count", None) or 0,
+                        getattr(usage, "candidates_token_count", None) or 0)
+    cached = getattr(usage, "cached_content_token_count", None)
+    if cached:
+        tracer.count("api.cached_tokens", cached) # part of the input tokens, served from a cached context
@@ -1,71 +1,233 @@
-from bs4 import BeautifulSoup
+import re
+from html.parser import HTMLParser
 import requests
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit
 
-def scrape_website(url: str, max_pages=50) -> dict:
+from functions.css_cache import StylesheetCache
+from functions.frontier import Frontier
+from functions.trace import count
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".tif", ".tiff") # css url()s to other files are fonts etc.
+HTML_TYPES = ("text/html", "application/xhtml+xml") # responses recorded as pages, pdfs, images, json etc. are skipped
+CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)", re.IGNORECASE)
+
+def resolve(base_url: str, reference: str):
+    """absolute url of a reference on a page, None if it is too malformed to join ("http://[oops/")"""
+    try:
+        return urljoin(base_url, reference)
+    except ValueError:
+        return None
+
+def css_image_urls(css: str, base_url: str) -> list:
+    """absolute urls of the images a stylesheet's url()s point to, relative to the sheet (or page) it came from"""
+    urls = []
+    for _, reference in CSS_URL.findall(css):
+        reference = reference.strip()
+        url = resolve(base_url, reference)
+        if url is None or reference.startswith("data:") or not urlsplit(url).path.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        urls.append(url)
+    return urls
+
+def largest_candidate(srcset: str):
+    """url of the widest (or highest density) candidate of a srcset, None if it has none"""
+    best, best_size = None, -1.0
+    for candidate in srcset.split(","):
+        parts = candidate.split()
+        if not parts:
+            continue
+        try:
+            size = float(parts[1][:-1]) if len(parts) > 1 else 1.0 # "800w" / "2x", a bare url counts as 1x
+        except ValueError:
+            size = 1.0
+        if size > best_size:
+            best, best_size = parts[0], size
+    return best
+
+class SiteMap(dict):
+    """
+    crawl result: {page_url: {"html": html, "css": inline_css, "stylesheets": [blob_id, ...], "images": [{"src", "alt"}, ...]}}
+    external stylesheets are kept once in .stylesheets {blob_id: css} and pages only reference them
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stylesheets = {}
+
+class PageExtractor(HTMLParser):
+    """
+    collects what the crawler needs from a page in one pass over the tokens, no tree is built
+    same results as find_all on a BeautifulSoup("html.parser") tree of the page
+    """
+
+    def __init__(self, page_url: str):
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        self.links = []
+        self.style_attributes = []
+        self.style_blocks = []
+        self.stylesheets = []
+        self.images = [] # {"src": url, "alt": text} of <img> and <picture> <source> elements
+        self._style_text = None # text of the <style> element being read
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs) # a repeated attribute keeps its last value, like bs4
+        # references too malformed to resolve are skipped, one bad href must not cost the page
+        if tag == "a" and attributes.get("href"):
+            url = resolve(self.page_url, attributes["href"])
+            if url is not None:
+                self.links.append(url)
+        elif tag == "link" and attributes.get("href") and "stylesheet" in (attributes.get("rel") or "").split():
+            url = resolve(self.page_url, attributes["href"])
+            if url is not None:
+                self.stylesheets.append(url)
+        elif tag in ("img", "source") and (attributes.get("src") or attributes.get("srcset")):
+            # the fallback src, or the biggest srcset candidate (everything is downscaled anyway)
+            src = attributes.get("src") if tag == "img" and attributes.get("src") else largest_candidate(attributes.get("srcset") or "")
+            url = resolve(self.page_url, src) if src and not src.startswith("data:") else None
+            if url is not None:
+                self.images.append({"src": url, "alt": (attributes.get("alt") or "").strip()})
+        if "style" in attributes:
+            self.style_attributes.append(attributes["style"] or "")
+        if tag == "style":
+            self._style_text = []
+
+    def handle_endtag(self, tag):
+        if tag == "style" and self._style_text is not None:
+            self.style_blocks.append("".join(self._style_text))
+            self._style_text = None
+
+    def handle_data(self, data):
+        if self._style_text is not None:
+            self._style_text.append(data)
+
+    def close(self):
+        super().close()
+        if self._style_text is not None: # <style> never closed, bs4 keeps what was read
+            self.style_blocks.append("".join(self._style_text))
+            self._style_text = None
+
+def parse_page(html: str, page_url: str) -> dict:
+    """
+    pull the crawl-relevant pieces out of a page in a single streaming pass
+    returns: dict {"links": [...], "inline_css": [...], "stylesheets": [...], "images": [{"src", "alt"}, ...]}
+    images are the page's <img>/<source> elements plus url()s of its inline css (linked sheets are the caller's)
+    """
+    extractor = PageExtractor(page_url)
+    extractor.feed(html)
+    extractor.close()
+
+    # inline styles + internal <style> blocks, in the order the tree walk used to give them
+    inline_css = extractor.style_attributes + extractor.style_blocks
+    images = extractor.images + [{"src": src, "alt": ""} for css in inline_css for src in css_image_urls(css, page_url)]
+    return {"links": extractor.links, "inline_css": inline_css, "stylesheets": extractor.stylesheets, "images": images}
+
+def unique_images(images) -> list:
+    """first reference of every image url, an alt text given anywhere is kept"""
+    unique = {}
+    for image in images:
+        kept = unique.setdefault(image["src"], dict(image))
+        if not kept["alt"] and image["alt"]:
+            kept["alt"] = image["alt"]
+    return list(unique.values())
+
+def media_type(content_type) -> str:
+    """lowercase media type of a Content-Type header ("text/html; charset=utf-8" -> "text/html"), "" if missing"""
+    return (content_type or "").split(";", 1)[0].strip().lower()
+
+class Fetched:
+    """body of a downloaded url, the url it finally came from (after redirects) and its media type"""
+
+    def __init__(self, text: str, url: str, content_type=""):
+        self.text = text
+        self.url = url
+        self.content_type = media_type(content_type)
+
+    @property
+    def is_html(self) -> bool:
+        """True if the response can be a page, a server that sends no Content-Type gets the benefit of the doubt"""
+        return not self.content_type or self.content_type in HTML_TYPES
+
+def fetch(url: str, crawl_cache=None):
+    """
+    download a url, returns a Fetched on a 200 and None otherwise
+    with a crawl cache the request is conditional and a 304 is answered from disk
+    """
+    headers = crawl_cache.conditional_headers(url) if crawl_cache else {}
+    try:
+        response = requests.get(url, timeout=5, headers=headers)
+        count("crawl.requests")
+        count("crawl.bytes", len(response.content))
+        if response.status_code == 304 and crawl_cache:
+            count("crawl.not_modified")
+            body = crawl_cache.load(url)
+            if body is not None:
+                return Fetched(body, crawl_cache.final_url(url), crawl_cache.content_type(url))
+            response = requests.get(url, timeout=5) # cached body went missing, download it again
+    except:
+        return None
+
+    if response.status_code != 200:
+        return None
+    if crawl_cache:
+        crawl_cache.store(url, response.text, response.headers, response.url)
+    return Fetched(response.text, response.url, response.headers.get("Content-Type"))
+
+def fetch_text(url: str, crawl_cache=None):
+    """body of a url on a 200 (or a 304 answered from the crawl cache), None otherwise"""
+    fetched = fetch(url, crawl_cache)
+    return fetched.text if fetched is not None else None
+
+def scrape_website(url: str, max_pages=50, css_cache=None, crawl_cache=None) -> SiteMap:
     """
     crawl internal pages of a website and extract html + css
-    returns: dict {page_url: {"html": html_string, "css": combined_css_string}}
+    returns: SiteMap {page_url: {"html": html_string, "css": inline_css_string, "stylesheets": [blob_id, ...], "images": [...]}}
     """
-    visited = set()
-    queue = [url]
-    site_map = {}
+    css_cache = css_cache or StylesheetCache() # each shared stylesheet is downloaded once
+    frontier = Frontier(url, max_pages) # O(1) pops, every distinct page is queued once
+    frontier.push(url)
+    site_map = SiteMap()
 
-    while queue and len(visited) < max_pages:
-        current_url = queue.pop(0)
-        if current_url in visited:
-            continue
-        visited.add(current_url)
+    while frontier:
+        current_url = frontier.pop()
 
         # download html of the page
-        try:
-            response = requests.get(current_url, timeout=5)
-            if response.status_code != 200:
-                continue
-            html = response.text
-        except:
+        fetched = fetch(current_url, crawl_cache)
+        if fetched is None:
             continue
+        if not fetched.is_html: # a linked pdf or api endpoint is not a page of the site
+            count("crawl.not_html")
+            continue
+        html = fetched.text
+
+        # parse html, relative links are resolved against where the page ended up after redirects
+        page = parse_page(html, fetched.url)
+
+        # crawl links and add new internal pages to queue (external and already seen links are dropped)
+        for full_link in page["links"]:
+            frontier.push(full_link)
+
+        # external css files, referenced by blob id (their url() images count as the page's)
+        blob_ids = []
+        images = page["images"]
+        for css_url in page["stylesheets"]:
+            cached = css_cache.get(css_url)
+            if cached is None:
+                css = fetch_text(css_url, crawl_cache)
+                if css is None:
+                    continue
+                cached = css_cache.put(css_url, css), css
+
+            blob_id, css = cached
+            site_map.stylesheets[blob_id] = css
+            images = images + [{"src": src, "alt": ""} for src in css_image_urls(css, css_url)]
+            if blob_id not in blob_ids:
+                blob_ids.append(blob_id)
 
-        # parse html
-        soup = BeautifulSoup(html, "html.parser")
-
-        # crawl links and add new internal pages to queue
-        for a in soup.find_all("a"):
-            href = a.get("href")
-            if href:
-                full_link = urljoin(current_url, href)
-                # only keep internal links
-                if url in full_link and full_link not in visited:
-                    queue.append(full_link)
-
-        # extract css
-        css_collection = []
-
-        # inline styles
-        inline_styles = [tag['style'] for tag in soup.find_all(style=True)]
-        css_collection.extend(inline_styles)
-
-        # internal <style> blocks
-        style_blocks = [style_tag.text for style_tag in soup.find_all('style')]
-        css_collection.extend(style_blocks)
-
-        # external css files
-        link_tags = soup.find_all('link', rel="stylesheet")
-        for link_tag in link_tags:
-            css_href = link_tag.get('href')
-            if css_href:
-                css_url = urljoin(current_url, css_href)
-                try:
-                    css_response = requests.get(css_url, timeout=5)
-                    if css_response.status_code == 200:
-                        css_collection.append(css_response.text)
-                except:
-                    pass
-
-        # merge all css into a single string per page
-        combined_css = "\n".join(css_collection)
-
-        # store html + css in site_map
-        site_map[current_url] = {"html": html, "css": combined_css}
+        # store html + inline css + stylesheet references + image references in site_map
+        site_map[current_url] = {"html": html, "css": "\n".join(page["inline_css"]), "stylesheets": blob_ids,
+                                 "images": unique_images(images)}
 
+    if crawl_cache:
+        print(crawl_cache.report())
     return site_map
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+
+SNAPSHOT_DIR = "iterations" # manifests + shared blob store for iteration snapshots
+
+_workspaces = {} # absolute root -> Workspace, looked up by the file tools
+
+def blob_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def atomic_write(path, data: bytes):
+    """atomic, durable write: temp file, fsync, rename"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class Workspace:
+    """
+    in-memory copy of the generated site (final_product)
+    files are kept as content-addressed blobs, the file tools read and write here, and
+    changes only reach the disk on flush() (at iteration boundaries)
+    snapshot() stores an iteration as a manifest plus the blobs not stored yet, restore() brings one back
+    """
+
+    def __init__(self, root: str, snapshot_dir=SNAPSHOT_DIR):
+        self.root = os.path.abspath(root)
+        self.snapshot_dir = snapshot_dir
+        self.files = {}   # relative path -> blob hash
+        self.blobs = {}   # blob hash -> bytes
+        self.dirty = set()
+        self.stored = set() # blob hashes already in the snapshot store
+        self.lock = threading.Lock() # tool calls of a batch run on several threads
+
+        # start from whatever is on disk already
+        if os.path.isdir(self.root):
+            for directory, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    path = os.path.join(directory, filename)
+                    with open(path, "rb") as f:
+                        self._put(os.path.relpath(path, self.root), f.read())
+        self.dirty.clear()
+
+    def _put(self, relpath, data: bytes):
+        digest = blob_hash(data)
+        self.blobs.setdefault(digest, data)
+        if self.files.get(relpath) != digest:
+            self.files[relpath] = digest
+            self.dirty.add(relpath)
+
+    def write(self, relpath: str, content: str):
+        with self.lock:
+            self._put(os.path.normpath(relpath), content.encode("utf-8"))
+
+    def read(self, relpath: str):
+        """file contents as text, None if there is no such file"""
+        with self.lock:
+            digest = self.files.get(os.path.normpath(relpath))
+            if digest is None:
+                return None
+            return self.blobs[digest].decode("utf-8", errors="replace")
+
+    def isfile(self, relpath: str) -> bool:
+        return os.path.normpath(relpath) in self.files
+
+    def isdir(self, relpath: str) -> bool:
+        relpath = os.path.normpath(relpath)
+        if relpath == ".":
+            return True
+        prefix = relpath + os.sep
+        return any(path.startswith(prefix) for path in self.files)
+
+    def listdir(self, relpath: str = ".") -> dict:
+        """{name: {"is_dir": bool, "file_size": int}} like get_files_info returns"""
+        relpath = os.path.normpath(relpath)
+        prefix = "" if relpath == "." else relpath + os.sep
+        entries = {}
+        with self.lock:
+            for path, digest in self.files.items():
+                if not path.startswith(prefix):
+                    continue
+                name, _, rest = path[len(prefix):].partition(os.sep)
+                if rest:
+                    entries.setdefault(name, {"is_dir": True, "file_size": 0})
+                else:
+                    entries[name] = {"is_dir": False, "file_size": len(self.blobs[digest])}
+        return entries
+
+    def flush(self):
+        """writes every changed file back to the root directory (fsynced)"""
+        with self.lock:
+            for relpath in sorted(self.dirty):
+                atomic_write(os.path.join(self.root, relpath), self.blobs[self.files[relpath]])
+            self.dirty.clear()
+
+    def snapshot(self, name: str) -> str:
+        """stores the current tree as <snapshot_dir>/<name>.json, only blobs not stored before are written"""
+        blob_dir = os.path.join(self.snapshot_dir, "blobs")
+        os.makedirs(blob_dir, exist_ok=True)
+        with self.lock:
+            manifest = dict(sorted(self.files.items()))
+            for digest in set(manifest.values()) - self.stored:
+                blob_path = os.path.join(blob_dir, digest)
+                if not os.path.exists(blob_path):
+                    atomic_write(blob_path, self.blobs[digest])
+                self.stored.add(digest)
+
+        manifest_path = os.path.join(self.snapshot_dir, f"{name}.json")
+        atomic_write(manifest_path, json.dumps(manifest, indent=1).encode("utf-8"))
+        return manifest_path
+
+    def restore(self, name: str):
+        """replaces the tree with a stored snapshot and writes it to disk"""
+        manifest = load_manifest(self.snapshot_dir, name)
+        with self.lock:
+            for relpath in set(self.files) - set(manifest):
+                path = os.path.join(self.root, relpath)
+                if os.path.exists(path):
+                    os.remove(path)
+            self.files = {}
+            self.dirty = set()
+            for relpath, digest in manifest.items():
+                with open(os.path.join(self.snapshot_dir, "blobs", digest), "rb") as f:
+                    self._put(relpath, f.read())
+        self.flush()
+
+def load_manifest(snapshot_dir: str, name: str) -> dict:
+    with open(os.path.join(snapshot_dir, f"{name}.json"), "r") as f:
+        return json.load(f)
+
+def restore_snapshot(name: str, root: str, snapshot_dir=SNAPSHOT_DIR) -> Workspace:
+    """restores snapshot `name` (e.g. "iteration_3") into root"""
+    workspace = Workspace(root, snapshot_dir)
+    workspace.restore(name)
+    return workspace
+
+def open_workspace(root: str, snapshot_dir=SNAPSHOT_DIR) -> Workspace:
+    """loads root into memory and routes the file tools for it through the workspace"""
+    workspace = Workspace(root, snapshot_dir)
+    _workspaces[workspace.root] = workspace
+    return workspace
+
+def close_workspace(workspace: Workspace):
+    workspace.flush()
+    _workspaces.pop(workspace.root, None)
+
+def active_workspace(working_directory: str):
+    """the open workspace for a working directory, None if the tools should go to disk"""
+    return _workspaces.get(os.path.abspath(working_directory))
+
+def load_file(working_directory: str, abs_path: str):
+    """text of a file in the working directory (workspace first, then disk), None if it does not exist"""
+    workspace = active_workspace(working_directory)
+    if workspace is not None:
+        return workspace.read(os.path.relpath(abs_path, os.path.abspath(working_directory)))
+    if not os.path.isfile(abs_path):
+        return None
+    with open(abs_path, "r") as f:
+        return f.read()
+
+def store_file(working_directory: str, abs_path: str, content: str):
+    """writes a file in the working directory (workspace if one is open, disk otherwise)"""
+    workspace = active_workspace(working_directory)
+    if workspace is not None:
+        workspace.write(os.path.relpath(abs_path, os.path.abspath(working_directory)), content)
+        return
+    with open(abs_path, "w") as f:
+        f.write(content)
@@ -1,6 +1,8 @@
 import os
 from google.genai import types
 
+from functions.workspace import active_workspace
+
 MAX_CHARS = 20000 # to prevent overusing token limits
 
 def write_file(working_directory: str, filepath: str, content: str) -> str:
@@ -21,6 +23,15 @@ def write_file(working_directory: str, filepath: str, content: str) -> str:
     if not abs_filepath.startswith(abs_working_dir):
         return f"error: {filepath} is not a valid file to write to in the working directory"
     
+    # in-memory workspace (if one is open), written to disk at the end of the iteration
+    workspace = active_workspace(working_directory)
+    if workspace is not None:
+        relpath = os.path.relpath(abs_filepath, abs_working_dir)
+        if not workspace.isfile(relpath):
+            return f"error: {filepath} is either not a file or doesn't exist yet"
+        workspace.write(relpath, content)
+        return f''
+
     # checks if given path is actually a file/actually exists
     if not os.path.isfile(abs_filepath):
         return f"error: {filepath} is either not a file or doesn't exist yet"
@@ -1,111 +1,61 @@
 import os
-import sys
+import argparse
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from bs4 import BeautifulSoup
 from google.genai import types
-from google import genai
 from dotenv import load_dotenv
-import time
-import shutil
 
 # import tools
-from functions.web_scraper import scrape_website
-from functions.call_functions import execute_function_call
+from functions.crawler import AsyncCrawler
+from functions.crawl_cache import CrawlCache, CACHE_DIR
+from functions.pipeline import Summarizer, stream_summaries
+from functions.preprocess import ContentView, StyleView
+from functions.dedup import merge_paragraphs
+from functions.assets import AssetPipeline, ASSETS_DIR, MANIFEST, load_manifest, format_manifest
+from functions.key_pool import KeyPool, keys_from_env
+from functions.response_cache import ResponseCache, CACHE_DIR as RESPONSE_CACHE_DIR
+from functions.agent_loop import run_agent
+from functions.context_cache import SharedContext
+from functions.call_functions import run_batch, StreamingBatch
+from functions.workspace import open_workspace, close_workspace
+from functions.local_checks import LocalChecker, site_files, has_errors, format_findings
+from functions.coverage import CoverageIndex, evaluator_verdict
+from functions.checkpoint import Run, RUNS_DIR
+from functions.trace import tracer, span
 
 # import schemas
 from functions.create_file import create_file_schema
 from functions.get_files_info import get_files_info_schema
 from functions.read_file_contents import read_file_contents_schema
 from functions.write_file import write_file_schema
-import random
-
-def api_call_with_retry(client, *args, **kwargs):
-    """calls api with a waiting time if limits exhausted"""
-
-    backoff = 1
-    max_retries = 10
-    retries = 0
-
-    while retries < max_retries:
-        try:
-            return client.models.generate_content(*args, **kwargs) # generate response
-        except Exception as e: 
-            if "429" in str(e): # catch 429 error
-                wait = backoff + random.random() # increase wait time
-                print(f"429 received - waiting {wait:.2f}s...")
-                time.sleep(wait) # sleep
-                backoff = min(backoff * 4, 60)
-            else:
-                raise e
-            
-        retries += 1 # increment
-
-MAX_CHARS_PER_CHUNK = 50000  # keep prompt under gemini 2.0 flash-lite token (1 million lmao) for chunking
-
-# NOTE: time.sleep() is used to reset api limits
-
-def chunk_text(text, max_chars=MAX_CHARS_PER_CHUNK):
-    """split a long string into chunks of max_chars each"""
-    chunks = []
-    start = 0
-    while start < len(text):
-        chunks.append(text[start:start + max_chars])
-        start += max_chars
-    return chunks
-
-def main():
-
-    load_dotenv() # loads .env file
-
-    # loads our api key securely
-    # NOTE: all of these are gemini keys
-    api_key_1 = os.environ.get("KEY_1") 
-    api_key_2 = os.environ.get("KEY_2") 
-    
-    # 3 and 4 not in use yet (unavailable)
-    api_key_3 = os.environ.get("KEY_3") 
-    api_key_4 = os.environ.get("KEY_4") 
-
-    url = sys.argv[1]   # grab url
-    style = sys.argv[2] # style of new website
+from functions.patch_file import patch_file_schema
+from functions.read_file_range import read_file_range_schema
 
-    # scrape webpages
-    results = scrape_website(url)
+SUMMARY_MODEL = 'gemini-2.0-flash'    # use cheaper model for higher token limits
+AGENT3_MODEL = 'gemini-2.5-flash'     # coding agent
+AGENT4_MODEL = 'gemini-2.0-flash-lite' # reviewer
+SITES_DIR = "sites" # batch mode writes every site to sites/<run_id>/
+BATCH_SITES = 4     # sites worked on at the same time in batch mode
 
-    # build page prompts individually
-    prompt_chunks = []
+def revamp_site(run, pool, site_dir="final_product", response_cache=None):
+    """
+    one site from crawl to finished build, every stage checkpoints into the run directory
+    all model calls go through the key pool, the generated site is written to site_dir
+    """
 
-    print("chunking")
+    url = run.state["url"]     # grab url
+    style = run.state["style"] # style of new website
 
-    chunk_counter = 0
-
-    for page_url, data in results.items():
-        page_html = data["html"]
-        page_css = data["css"]
-
-        # combine html + css for this page
-        page_content = f"URL: {page_url}\nCSS:\n{page_css}\nHTML:\n{page_html}\n"
-
-        # split if too long
-        for chunk in chunk_text(page_content):
-            chunk_counter += 1
-            prompt_chunks.append(
-                f"This is a website page of a small business. Redesign it in the following style: {style}.\n"
-                "Keep content intact, maintain brand identity, ensure mobile-first responsiveness. "
-                "Do not alter content, focus on UI/UX.\n"
-                f"{chunk}"
-            )
-            print(f"chunk {chunk_counter}")
-
-    print("\n\n\n-------------------------\n\n\n")
-    
     # NOTE: agent_1 is a model that summarizes contents
     # NOTE: agent_2 is a model that analyzes for flaws in styling
 
-    # create genai client
-    client = genai.Client(api_key=api_key_1)
-
     # create system prompt
     AGENT_1_SYSTEM_PROMPT = (
-        f"You are a person who is reading a website, and trying to get as much information as possible, who will look at the following chunks of code (pay attention to HTML), and extract ALL of the content related.\n"
+        f"You are a person who is reading a website, and trying to get as much information as possible, who will look at the following chunks of the website (the text and structure of each page, under its URL), and extract ALL of the content related.\n"
+        f"The website belongs to a small business and will be redesigned in the following style: {style}. Keep content intact and maintain brand identity.\n"
         f"Some examples are: phone numbers, addresses, business plans, locations, descriptions, about us, ANYTHING related to their company/business, etc\n"
         f"GET ALL OF THE IMPORTANT INFORMATION THAT YOU CAN!\n"
         f"Ignore CSS, JS, animations, and layout. Only extract meaningful business content.\n"
@@ -116,37 +66,10 @@ def main():
 
     agent1_config = types.GenerateContentConfig(system_instruction=AGENT_1_SYSTEM_PROMPT) # pass sys prompt
 
-    agent1_response = "" # summaries will be appended
-
-    print("getting agent 1 summary")
-
-    chunk_counter = 0
-
-    # gets a summary for each chunk (agent1)
-    for chunk in prompt_chunks:
-        chunk_counter += 1
-        try:
-            # generate response
-            response = api_call_with_retry(
-                client=client,
-                contents=[chunk], # prompt
-                model='gemini-2.0-flash', # use cheaper model for higher token limits
-                config=agent1_config
-            )
-            agent1_response += f"\n{response.text}\n"
-        except Exception as e:
-            print(f"exception: {e}")
-            return
-
-        print(f"chunk {chunk_counter}")
-
-    print("\n\n\n-------------------------\n\n\n")
-
-    client = genai.Client(api_key=api_key_2)
-    
     # create system prompt
     AGENT_2_SYSTEM_PROMPT = (
         f"You are a website reviewer who is tasked with analyzing the styles of this website.\n"
+        f"The website belongs to a small business. You will get the CSS rules each page (under its URL) actually uses, every rule only once. The redesign must ensure mobile-first responsiveness and focus on UI/UX, without altering content.\n"
         f"You must be extremely critical, and try to point out as many flaws as possible.\n"
         f"The chose revamped style is: {style}, so tailor feedback to that.\n"
         f"Pay attention to CSS for the most part, but also feel free to analyze JS if it includes something like animations.\n"
@@ -157,38 +80,76 @@ def main():
 
     agent2_config = types.GenerateContentConfig(system_instruction=AGENT_2_SYSTEM_PROMPT) # pass sys prompt
 
-    agent2_response = "" # summaries will be appended
-
-    print("getting agent 2 summary")
-
-    chunk_counter = 0
-
-    # gets a summary for each chunk (agent2)
-    for chunk in prompt_chunks:
-        chunk_counter += 1
+    # every request goes to whichever key in the pool has rpm/tpm quota left first
+    # agent 1 only sees visible text and structure, agent 2 only the (minified, pruned) css each page uses
+    agent1 = Summarizer("agent 1", pool, SUMMARY_MODEL, agent1_config, ContentView(), cache=response_cache,
+                        checkpoint=run.chunks("agent1"))
+    agent2 = Summarizer("agent 2", pool, SUMMARY_MODEL, agent2_config, StyleView(), cache=response_cache,
+                        checkpoint=run.chunks("agent2"))
+
+    # scrape webpages (pages and stylesheets are fetched concurrently)
+    # pages seen on a previous run are revalidated against the on-disk crawl cache
+    # the crawl is recorded in the run directory, a resumed run replays it instead of crawling again
+    # (an interrupted crawl replays the pages it recorded and only downloads the rest)
+    if run.done("crawl"):
+        crawler = run.saved_crawl()
+    else:
+        crawl_cache = CrawlCache(os.environ.get("CRAWL_CACHE_DIR", CACHE_DIR))
+        crawler = run.record(AsyncCrawler(url, crawl_cache=crawl_cache))
+    coverage = CoverageIndex() # crawled pages + key content, checked against the build after each iteration
+    assets = AssetPipeline(site_dir) # the site's images, fetched and shrunk into site_dir/assets/ while the crawl runs
+
+    if run.done("summaries"):
+        agent1_response = run.load_text("agent1_response.txt")
+        agent2_response = run.load_text("agent2_response.txt")
+        for page_url, page in crawler.pages():
+            coverage.add_page(page_url, BeautifulSoup(page["html"], "html.parser"))
+            assets.add(page_url, page.get("images", ()))
+        print("summaries loaded from the run checkpoint")
+    else:
+        # pages stream from the crawler into the chunker and on to both summarizers (running side by side) as they arrive
+        # chunks summarized before an interruption come from the run's chunk checkpoints
+        print("crawling, chunking and summarizing")
         try:
-            # generate response
-            response = api_call_with_retry(
-                client=client,
-                contents=[chunk], # prompt
-                model='gemini-2.0-flash', # use cheaper model for higher token limits
-                config=agent2_config
-            )
-            agent2_response += f"\n{response.text}\n"
+            with span("crawl + summaries"):
+                agent1_response, agent2_response = asyncio.run(stream_summaries(crawler, style, [agent1, agent2], coverage, assets))
         except Exception as e:
             print(f"exception: {e}")
+            print(f"finished chunks are checkpointed, continue with --resume {run.run_id}")
             return
-        print(f"chunk {chunk_counter}")
+        run.complete("crawl", pages=len(crawler.crawled))
+        run.complete("assets", images=len(assets.entries))
+
+        if response_cache is not None:
+            print(response_cache.report())
+
+        # chunk summaries repeat what the template said on every page, keep each paragraph once
+        merged = [merge_paragraphs(response) for response in (agent1_response, agent2_response)]
+        print(f"merged summaries: {len(agent1_response) + len(agent2_response)} -> {sum(map(len, merged))} chars")
+        agent1_response, agent2_response = merged
+        run.save_text("agent1_response.txt", agent1_response)
+        run.save_text("agent2_response.txt", agent2_response)
+        run.complete("summaries")
+
+    # images only have to be fetched here if the site directory lost them since the crawl
+    if not (run.done("assets") and os.path.isfile(os.path.join(site_dir, ASSETS_DIR, MANIFEST))):
+        with span("assets"):
+            asyncio.run(assets.run())
+        run.complete("assets", images=len(assets.entries))
+    asset_manifest = load_manifest(site_dir)
+    print(f"{len(asset_manifest)} images in {os.path.join(site_dir, ASSETS_DIR)}")
 
     print("\n\n\n-------------------------\n\n\n")
 
-    time.sleep(300) # wait for TPM and RPM to reset to avoid exhausting limits
+    # no cool-down needed here: the summaries were paced by the rate limiters and
+    # agents 3/4 draw on their own model quotas
 
-    # save to .txt files
-    with open("agent1_response.txt", "w") as f:
+    # save to .txt files next to the generated site
+    os.makedirs(site_dir, exist_ok=True)
+    with open(os.path.join(site_dir, "agent1_response.txt"), "w") as f:
         f.write(agent1_response)
     
-    with open("agent2_response.txt", "w") as f:
+    with open(os.path.join(site_dir, "agent2_response.txt"), "w") as f:
         f.write(agent2_response)
 
     # create agentic website coder
@@ -200,6 +161,8 @@ def main():
             write_file_schema,
             read_file_contents_schema,
             create_file_schema,
+            patch_file_schema,
+            read_file_range_schema,
         ]
     )
 
@@ -209,12 +172,15 @@ def main():
         f"You will not be given the original code, but rather a summary of flaws and important information that the website needs to have."
         f"Write code in HTML, CSS, and JS. Code the website with this style: {style}"
         f"Feel free to make as many files as you need."
-        f"You will be bound the hardcoded working directory: final_product."
+        f"You will be bound the hardcoded working directory: {site_dir}."
         f"Here are the functions at your disposal:"
         f"1. get_files_info(working_directory, directory) -> lists directory contents\n"
         f"2. write_file(working_directory, filepath, content) -> writes to a file\n"
         f"3. read_file_contents(working_directory, filepath) -> reads a file\n"
         f"4. create_file(working_directory, filepath, content) -> creates a file\n"
+        f"5. patch_file(working_directory, filepath, edits or diff) -> changes part of a file with search/replace edits or a unified diff\n"
+        f"6. read_file_range(working_directory, filepath, start_line, end_line or offset) -> reads part of a file, lines come numbered\n"
+        f"For fixes to existing files ALWAYS prefer patch_file over write_file, and page through big files with read_file_range instead of reading them whole."
         f"You will receive feedback from an evaluator model and will make changes based on that!"
         f"You will ABSOLUTELY NEED to use these functions if you are to satisfy the objective."
         f"Your first step should definitely be creating files for various pages/scripts/styles."
@@ -224,15 +190,21 @@ def main():
         f"Add tons of responsive animations and overall make it look as good as possible."
         f"Make sure that the homepage is properly styled, as well as all of the other pages."
         f"Do your best, this must be absolutely perfect."
+        f"You can call as many functions as you need in a single response, and you will get all of their results back."
+        f"When every change is made, reply with a short summary of what you did and no function calls, that ends your turn."
         f"THE MAIN FOCUS IS STYLING, IT MUST LOOK PROFESSIONAL, DO NOT WORRY ABOUT FILE SIZE OF CSS FILES."
-        f"If you make any images, add the respective image data (binary) into the file."
-        f"Keep it low resolution as well as grayscale. "
+        f"The images of the original site are already in the assets/ directory (low resolution, grayscale), listed under IMAGES in your context with their size, alt text and the pages that used them."
+        f"Reference them by path (for example <img src='assets/...'>), NEVER write image data into files. "
     )
 
-    # create config
-    agent3_config = types.GenerateContentConfig(system_instruction=AGENT_3_SYSTEM_PROMPT, # pass sys prompt
-                                         tools=[agent3_available_functions]) # pass tools
-    
+    # the summaries every agent 3/4 call needs, uploaded once per key as cached content instead of resent each turn
+    SUMMARIES = (f"Here are your summaries - CONTENT: {agent1_response}\n\n STYLES AND MORE: {agent2_response}"
+                 f"\n\n IMAGES (path, size, alt text, pages): {format_manifest(asset_manifest) or 'none'}")
+
+    # create config (sys prompt, tools and summaries live in the cached context, or inline if caching is unavailable)
+    agent3_config = SharedContext(AGENT3_MODEL, AGENT_3_SYSTEM_PROMPT, SUMMARIES, tools=[agent3_available_functions],
+                                  display_name=f"agent 3 {run.run_id}")
+
     # create website evaluator
 
     # list available functions for the model to use
@@ -240,6 +212,7 @@ def main():
         function_declarations=[
             get_files_info_schema,
             read_file_contents_schema,
+            read_file_range_schema,
         ]
     )
 
@@ -248,98 +221,221 @@ def main():
         f"You are a website reviewer who must analyze the code for possible flaws or visual mistakes."
         f"Fit this style: {style}"
         f"Code is written in HTML, CSS, AND JS."
-        f"You will be bound the hardcoded working directory: final_product."
+        f"You will be bound the hardcoded working directory: {site_dir}."
         f"Here are the functions at your disposal:"
         f"1. get_files_info(working_directory, directory) -> lists directory contents\n"
         f"2. read_file_contents(working_directory, filepath) -> reads a file\n"
+        f"3. read_file_range(working_directory, filepath, start_line, end_line or offset) -> reads part of a file (use it for files bigger than 10000 characters)\n"
         f"Your job is not to actually fix any code, but instead review it and return a summary of things that are good, and things that should be fixed."
         f"When mentioning fixes, if applicable, also say the filename of where the fix should be."
         f"Use these functions to your advantage to read and view files."
+        f"Once you have read what you need, reply with your full review as text and no function calls."
+        f"End the review with a line that is exactly VERDICT: PASS if the site is complete and ready to ship, or VERDICT: FAIL if anything important still needs fixing."
     )
 
     # create config
-    agent4_config = types.GenerateContentConfig(system_instruction=AGENT_4_SYSTEM_PROMPT, # pass sys prompt
-                                                tools=[agent4_available_functions]) # pass tools
+    agent4_config = SharedContext(AGENT4_MODEL, AGENT_4_SYSTEM_PROMPT, SUMMARIES, tools=[agent4_available_functions],
+                                  display_name=f"agent 4 {run.run_id}")
 
     # agentic loop
     MAX_ITERS = 5
+    AGENT3_MAX_TURNS = 12 # model calls per build session
+    AGENT4_MAX_TURNS = 8  # model calls per review session
+    COVERAGE_THRESHOLD = float(os.environ.get("COVERAGE_THRESHOLD", 0.95)) # stop once this much of the crawl is rebuilt and agent 4 passes it
+    AGENT3_STREAM = os.environ.get("AGENT3_STREAM", "1") != "0" # stream agent 3's turns, files are written as each call arrives
 
     prev_feedback = None
-    global prompt
 
-    # client3 = genai.Client(api_key=api_key_3)
-    # client4 = genai.Client(api_key=api_key_4)
+    # calls are paced by each pooled key's quota (and 429 retry hints) instead of fixed sleeps
+    # the tools of both agents work inside this site's directory
+    tools = partial(run_batch, working_directory=site_dir)
 
-    client3 = genai.Client(api_key=api_key_1)
-    client4 = genai.Client(api_key=api_key_2)
+    # generated site lives in memory during the loop, restore_snapshot() brings back any iteration
+    workspace = open_workspace(site_dir, run.snapshot_dir)
 
-    print("beginning agent loop...")
-    for iteration in range(1, MAX_ITERS+1):
-            
-        for build in range(0,3):
-            # call agent 3 to create website
+    # pages agent 3 finished are parsed for the local checks while it keeps generating the rest
+    checker = LocalChecker()
+    WRITE_TOOLS = {"create_file", "write_file", "patch_file"}
 
-            if prev_feedback is None: # checks for first iteration
-                prompt = f"Generate a website based on this summary with a {style} style. Make sure to include the following content as well as fixes. Create website in the final_product/ working directory. Make sure to create separate .html, .css, and .js files for each page if they are required. Here are your summaries - CONTENT: {agent1_response}\n\n STYLES AND MORE: {agent2_response}"
-            else:
-                prompt = f"The eval model has said this: {prev_feedback}, now refactor and improve the code to relfect these changes. The code is located in the final_product directory. Check the files agent1_response.txt and agent2_response.txt in the final_product directory (the working directory) to make double check code quality and accuracy to content."
-
-            time.sleep(120)
-
-            # generate response
-            response = api_call_with_retry(
-                client=client3,
-                contents=[prompt], # prompt
-                model='gemini-2.5-flash', # use cheaper model for higher token limits
-                config=agent3_config,
-            )
-
-            # call appropriate functions
-            if response.function_calls:
-                for call in response.function_calls:
-                    result = execute_function_call(call)
-                    print(result)
-            else:
-                print(response.text)
+    def file_written(call, call_result):
+        filepath = (call.args or {}).get("filepath")
+        if call.name not in WRITE_TOOLS or not filepath:
+            return
+        relpath = os.path.relpath(os.path.abspath(os.path.join(site_dir, filepath)), os.path.abspath(site_dir))
+        text = workspace.read(relpath)
+        if text is not None:
+            checker.add(relpath.replace(os.sep, "/"), text)
+
+    build_batch = partial(StreamingBatch, working_directory=site_dir, after_call=file_written) if AGENT3_STREAM else None
+
+    # a resumed run picks up after the last finished build or review
+    first_iteration = 1
+    build_done = False
+    loop = run.state.get("loop")
+    if run.done("loop"):
+        print("the agent loop of this run already finished")
+        close_workspace(workspace)
+        return
+    if loop:
+        workspace.restore(loop["snapshot"])
+        prev_feedback = loop["prev_feedback"]
+        if loop["step"] == "build":
+            first_iteration, build_done = loop["iteration"], True
+        else:
+            first_iteration = loop["iteration"] + 1
 
-        # call agent 4 to review website
+    print("beginning agent loop...")
+    for iteration in range(first_iteration, MAX_ITERS+1):
+
+        # call agent 3 to create website
+        # one multi-turn session per iteration: tool results go back to the model until it says it is done
 
         if prev_feedback is None: # checks for first iteration
-            prompt = f"Review the code in the final_product directory, and make suggestions for improvements based on this style: {style}. Check the files agent1_response.txt and agent2_response.txt in the final_product directory (the working directory) to make double check code quality and accuracy to content."
+            prompt = f"Generate a website based on this summary with a {style} style. Make sure to include the following content as well as fixes. Create website in the {site_dir}/ working directory. Make sure to create separate .html, .css, and .js files for each page if they are required. The summaries (CONTENT and STYLES AND MORE) are in your context."
+        else:
+            prompt = f"The eval model has said this: {prev_feedback}, now refactor and improve the code to relfect these changes. The code is located in the {site_dir} directory. Check the summaries in your context to make double check code quality and accuracy to content."
+
+        if build_done:
+            build_done = False
+            print(f"iteration {iteration}: build restored from the checkpoint")
         else:
-            prompt = f"The coding agent has updated the code, now review it to see if it has improved. The files will be located in the final_product directory. Check the files agent1_response.txt and agent2_response.txt in the final_product directory (the working directory) to make double check code quality and accuracy to content."
-        
-        # generate response
-        response = api_call_with_retry(
-            client=client4,
-            contents=[prompt], # prompt
-            model='gemini-2.0-flash-lite', # use cheaper model for higher token limits
-            config=agent4_config,
-        )
-        time.sleep(30)
-
-        # call function
-        if response.function_calls:
-            for call in response.function_calls:
-                result = execute_function_call(call)
-                print(result)
+            with span("agent 3", iteration=iteration):
+                summary = run_agent(pool, AGENT3_MODEL, agent3_config, prompt, max_turns=AGENT3_MAX_TURNS, execute=tools,
+                                    stream_batch=build_batch)
+            print(summary)
+
+            # checkpoint the build so an interrupted review does not cost another one
+            workspace.flush()
+            build_snapshot = f"iteration_{iteration}_build"
+            workspace.snapshot(build_snapshot)
+            run.save_loop(iteration, "build", build_snapshot, prev_feedback)
+
+        # cheap deterministic checks first, agent 4 is only asked once these pass
+        with span("local checks"):
+            findings = checker.run(site_files(workspace), crawler.crawled)
+        if has_errors(findings):
+            feedback = "The local checks found these problems, fix all the errors:\n" + format_findings(findings)
+            print(f"iteration {iteration}: local checks failed, skipping review")
         else:
-            prev_feedback = response.text
-            print(response.text)
+            # call agent 4 to review website
+
+            if prev_feedback is None: # checks for first iteration
+                prompt = f"Review the code in the {site_dir} directory, and make suggestions for improvements based on this style: {style}. Check the summaries in your context to make double check code quality and accuracy to content."
+            else:
+                prompt = f"The coding agent has updated the code, now review it to see if it has improved. The files will be located in the {site_dir} directory. Check the summaries in your context to make double check code quality and accuracy to content."
+            if findings: # warnings only, links/files/tags were already checked locally
+                prompt += f"\n\nBroken links, missing files and unclosed tags were already checked and are fine. Local warnings (unused css, pages of the original site not rebuilt yet):\n{format_findings(findings)}"
+
+            # the reviewer reads files over several turns, its final text is the feedback
+            with span("agent 4", iteration=iteration):
+                feedback = run_agent(pool, AGENT4_MODEL, agent4_config, prompt, max_turns=AGENT4_MAX_TURNS, execute=tools)
+
+        # how much of the original site is in the build, only files changed by this build are rescanned
+        with span("coverage"):
+            score = coverage.update(workspace)
+        print(f"coverage {score:.0%} ({coverage.rescanned} files rescanned)")
+        if score < COVERAGE_THRESHOLD and feedback:
+            feedback += f"\n\nStill missing from the original site:\n{coverage.missing()}"
+
+        if feedback:
+            prev_feedback = feedback
+        print(feedback)
 
         print(f"iteration {iteration}")
-        time.sleep(120) # reset API limits
 
-        # copy directory
-        snapshot_dir = f"iterations/iteration_{iteration}"
-        os.makedirs("iterations", exist_ok=True)
-        
-        if os.path.exists(snapshot_dir):
-            shutil.rmtree(snapshot_dir)
+        # write this iteration's changes to disk, then snapshot it (only changed files are stored again)
+        workspace.flush()
+        manifest_path = workspace.snapshot(f"iteration_{iteration}")
+        run.save_loop(iteration, "review", f"iteration_{iteration}", prev_feedback)
+        print(f"Saved snapshot: {manifest_path}")
+
+        # done early once the content is there and the reviewer is happy with it
+        if score >= COVERAGE_THRESHOLD and evaluator_verdict(feedback):
+            print(f"coverage and review passed after {iteration} iterations, stopping")
+            break
+
+    run.complete("loop")
+    close_workspace(workspace)
+
+    # drop the cached summaries, after a crash they simply expire with their ttl
+    agent3_config.close()
+    agent4_config.close()
+
+def read_jobs(path: str) -> list:
+    """batch file: one job per line, the url then the style ("https://site.com dark and minimal"), # comments"""
+    jobs = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            url, _, style = line.partition(" ")
+            if not style.strip():
+                raise ValueError(f"job without a style: {line}")
+            jobs.append((url, style.strip()))
+    return jobs
+
+def main():
+
+    load_dotenv() # loads .env file
+
+    parser = argparse.ArgumentParser(description="rebuild a website in a new style")
+    parser.add_argument("url", nargs="?", help="website to rebuild")
+    parser.add_argument("style", nargs="?", help="style of the new website")
+    parser.add_argument("--resume", metavar="RUN_ID", help="continue a run from its last checkpoint")
+    parser.add_argument("--batch", metavar="JOBS_FILE", help="rebuild every (url, style) job in the file, several at a time")
+    parser.add_argument("--sites", type=int, default=BATCH_SITES, help="sites worked on at the same time in batch mode")
+    args = parser.parse_args()
+
+    # loads our api keys securely
+    # NOTE: all of these are gemini keys, KEY_1 ... KEY_N all go into one pool
+    pool = KeyPool(keys_from_env())
+
+    # chunks answered on a previous run (same model, prompt and config) are not sent again
+    ttl = os.environ.get("RESPONSE_CACHE_TTL") # seconds, unset keeps entries until they are evicted
+    response_cache = ResponseCache(os.environ.get("RESPONSE_CACHE_DIR", RESPONSE_CACHE_DIR),
+                                   ttl=float(ttl) if ttl else None)
+
+    if args.batch:
+        # every site gets its own run (checkpoints) and output directory, sites share the key pool:
+        # while one waits on quota or on its crawl the others keep going
+        tracer.open(os.path.join(RUNS_DIR, f"batch-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")) # one trace for all sites
+        runs = []
+        for url, style in read_jobs(args.batch):
+            run = Run.start(url, style)
+            run.state["site_dir"] = os.path.join(SITES_DIR, run.run_id)
+            run.save()
+            runs.append(run)
+            print(f"run {run.run_id}: {url} -> {run.state['site_dir']}")
+
+        def revamp(run):
+            try:
+                with span("site", run=run.run_id):
+                    revamp_site(run, pool, run.state["site_dir"], response_cache)
+            except Exception as e:
+                print(f"run {run.run_id} failed: {e} (continue it with --resume {run.run_id})")
+
+        with ThreadPoolExecutor(max_workers=max(args.sites, 1)) as executor:
+            list(executor.map(revamp, runs))
+    else:
+        # every stage checkpoints into runs/<run_id>/, a resumed run skips whatever already finished
+        if args.resume:
+            run = Run.resume(args.resume)
+            print(f"resuming run {run.run_id}")
+        elif args.url and args.style:
+            run = Run.start(args.url, args.style, site_dir="final_product")
+            print(f"run {run.run_id} (continue it with --resume {run.run_id})")
+        else:
+            parser.error("pass a url and a style, --batch JOBS_FILE, or --resume RUN_ID")
 
-        shutil.copytree("final_product", snapshot_dir)
-        print(f"Saved snapshot: {snapshot_dir}")
+        # spans, token usage and retry counters of the run go to runs/<run_id>/trace.jsonl
+        tracer.open(os.path.join(run.directory, "trace.jsonl"))
+        with span("site", run=run.run_id):
+            revamp_site(run, pool, run.state.get("site_dir") or "final_product", response_cache)
 
+    print(pool.report([SUMMARY_MODEL, AGENT3_MODEL, AGENT4_MODEL]))
+    print(tracer.summary())
+    tracer.close()
 
 if __name__ == "__main__":
     main()
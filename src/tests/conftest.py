@@ -0,0 +1,50 @@
+import os
+import random
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # src/, for "functions.*"
+
+@pytest.fixture
+def serve():
+    """
+    serve(routes) -> base url of a local server, routes: {path: (status, headers, body)}
+    serve(routes, delay=0.05) answers every request after a random pause of up to `delay` seconds
+    a route with an ETag header answers a matching If-None-Match with a 304 (serve.revalidated lists those paths)
+    """
+    servers = []
+    revalidated = []
+
+    def start(routes: dict, delay=0) -> str:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if delay:
+                    time.sleep(random.uniform(0, delay))
+                status, headers, body = routes.get(self.path, (404, {}, b""))
+                body = body.encode("utf-8") if isinstance(body, str) else body
+                if "ETag" in headers and self.headers.get("If-None-Match") == headers["ETag"]:
+                    status, body = 304, b""
+                    revalidated.append(self.path)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/"
+
+    start.revalidated = revalidated
+    yield start
+    for server in servers:
+        server.shutdown()
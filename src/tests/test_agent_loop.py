@@ -0,0 +1,126 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from google.genai import types
+
+import functions.call_functions as call_functions
+from functions.agent_loop import stream_turn
+from functions.call_functions import StreamingBatch
+
+def call_chunk(name: str, **args) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(
+        role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))]))])
+
+def text_chunk(text: str) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(
+        role="model", parts=[types.Part(text=text)]))])
+
+class StreamClient:
+    """stands in for genai.Client, generate_content_stream runs `generate` (a generator function) as the response"""
+
+    def __init__(self, generate):
+        self.closed = threading.Event()
+
+        def generate_content_stream(model, contents, config=None):
+            try:
+                yield from generate()
+            finally:
+                self.closed.set()
+
+        self.models = SimpleNamespace(generate_content_stream=generate_content_stream)
+
+def existing_files(directory, *names):
+    for name in names: # write_file only overwrites files the agent created
+        (directory / name).write_text("")
+
+def test_calls_run_while_the_response_is_still_streaming(tmp_path):
+    existing_files(tmp_path, "index.html", "about.html")
+    written = threading.Event()
+    seen_before_next_chunk = []
+
+    def generate():
+        yield call_chunk("write_file", filepath="index.html", content="<p>home</p>")
+        seen_before_next_chunk.append(written.wait(5)) # the model is still "generating" here
+        yield call_chunk("write_file", filepath="about.html", content="<p>about</p>")
+
+    batch = StreamingBatch(working_directory=str(tmp_path), after_call=lambda call, call_result: written.set())
+    try:
+        parts, calls, _, cut_off = stream_turn(StreamClient(generate), "model", None, ["build it"], batch)
+        results = batch.results()
+    finally:
+        batch.close()
+
+    assert seen_before_next_chunk == [True]
+    assert [call.args["filepath"] for call in calls] == ["index.html", "about.html"]
+    assert len(parts) == 2 and len(results) == 2 and cut_off is None
+    assert (tmp_path / "index.html").read_text() == "<p>home</p>"
+    assert (tmp_path / "about.html").read_text() == "<p>about</p>"
+
+def test_calls_on_one_file_keep_their_order(tmp_path, monkeypatch):
+    write_file = call_functions.FUNCTION_MAP["write_file"]
+
+    def slow_write(working_directory, filepath, content):
+        if content == "first":
+            time.sleep(0.2)
+        return write_file(working_directory, filepath, content)
+
+    monkeypatch.setitem(call_functions.FUNCTION_MAP, "write_file", slow_write)
+    existing_files(tmp_path, "index.html", "style.css")
+    finished = []
+    batch = StreamingBatch(working_directory=str(tmp_path), after_call=lambda call, call_result: finished.append(call.args["content"]))
+    try:
+        batch.submit(types.FunctionCall(name="write_file", args={"filepath": "index.html", "content": "first"}))
+        batch.submit(types.FunctionCall(name="write_file", args={"filepath": "index.html", "content": "second"}))
+        batch.submit(types.FunctionCall(name="write_file", args={"filepath": "style.css", "content": "other"}))
+        results = batch.results()
+    finally:
+        batch.close()
+
+    assert (tmp_path / "index.html").read_text() == "second"
+    assert finished == ["other", "first", "second"] # another file does not wait for the slow one
+    assert [call_result.name for call_result in results] == ["write_file"] * 3
+
+def test_stalled_stream_is_cut_off(tmp_path):
+    existing_files(tmp_path, "index.html")
+    release = threading.Event()
+
+    def generate():
+        yield call_chunk("write_file", filepath="index.html", content="<p>home</p>")
+        release.wait(5) # no further output
+        yield call_chunk("write_file", filepath="never.html", content="<p>late</p>")
+
+    client = StreamClient(generate)
+    batch = StreamingBatch(working_directory=str(tmp_path))
+    try:
+        _, calls, _, cut_off = stream_turn(client, "model", None, ["build it"], batch, stall_seconds=0.2)
+        results = batch.results()
+    finally:
+        release.set()
+        batch.close()
+
+    assert cut_off == "no output for 0.2s"
+    assert [call.args["filepath"] for call in calls] == ["index.html"] # what arrived is kept
+    assert len(results) == 1
+    assert client.closed.wait(5)
+    assert (tmp_path / "index.html").read_text() == "<p>home</p>"
+
+def test_runaway_stream_is_cut_off(tmp_path):
+    produced = []
+
+    def generate():
+        for number in range(1000):
+            produced.append(number)
+            yield text_chunk("word " * 200)
+
+    client = StreamClient(generate)
+    batch = StreamingBatch(working_directory=str(tmp_path))
+    try:
+        parts, calls, _, cut_off = stream_turn(client, "model", None, ["build it"], batch, max_output=1000)
+    finally:
+        batch.close()
+
+    assert cut_off == "more than 1000 output tokens"
+    assert calls == []
+    assert client.closed.wait(5)
+    assert len(produced) < 1000 # the stream was closed, not read to the end
@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+from functions.checkpoint import RecordingCrawler, SavedCrawl
+from functions.crawler import AsyncCrawler
+from functions.css_cache import StylesheetCache
+
+from test_pipeline import shop_site
+
+def crawl(base: str, path: str, stop_after=None) -> list:
+    """urls a recorded crawl hands out, optionally interrupted after `stop_after` pages"""
+    crawler = RecordingCrawler(AsyncCrawler(base, css_cache=StylesheetCache(), parse_workers=0), path)
+
+    async def run():
+        urls = []
+        async for page_url, _ in crawler.stream():
+            urls.append(page_url)
+            if len(urls) == stop_after:
+                break
+        return urls
+
+    return asyncio.run(run())
+
+def test_resume_replays_recorded_pages_and_crawls_the_rest(serve, tmp_path):
+    routes = shop_site()
+    base = serve(routes)
+    expected = crawl(base, str(tmp_path / "full.jsonl"))
+
+    path = str(tmp_path / "pages.jsonl")
+    first = crawl(base, path, stop_after=7)
+    with open(path, "a") as f:
+        f.write('{"url": "half a line') # killed in the middle of a write
+
+    # recorded pages must come from the file: the server no longer has them
+    for page_url in first:
+        routes.pop("/" + page_url.removeprefix(base), None)
+    resumed = crawl(base, path)
+
+    assert first == expected[:7]
+    assert resumed == expected
+    with open(path) as f:
+        assert [json.loads(line)["url"] for line in f] == expected # appended once each, nothing truncated
+    saved = SavedCrawl(path)
+    assert [page_url for page_url, _ in saved.pages()] == expected
+    assert any("nav a{color:red}" in css for css in saved.stylesheets.values())
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+from functions.context_cache import CACHE_TTL, REFRESH_MARGIN, LocalCaches, SharedContext
+
+SUMMARIES = "summary of the site " * 500 # ~2500 tokens, above the caching minimum
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def client(available=True):
+    """the part of genai.Client a SharedContext touches"""
+    return SimpleNamespace(caches=LocalCaches(available))
+
+def context(text=SUMMARIES, clock=None) -> SharedContext:
+    return SharedContext("model", "you build websites", text, clock=clock or Clock())
+
+def test_cache_is_created_once_and_reused():
+    shared, key_client = context(), client()
+    first = shared.resolve("key-1", key_client)
+    second = shared.resolve("key-1", key_client)
+
+    assert first.cached_content == second.cached_content
+    assert first.system_instruction is None # everything is in the cache
+    assert key_client.caches.created == 1
+    cached = key_client.caches.get(name=first.cached_content)
+    assert cached.system_instruction == "you build websites"
+    assert cached.contents[0].parts[0].text == SUMMARIES
+    assert cached.ttl == f"{CACHE_TTL}s"
+
+def test_cache_is_refreshed_before_it_expires():
+    clock = Clock()
+    shared, key_client = context(clock=clock), client()
+    name = shared.resolve("key-1", key_client).cached_content
+
+    clock.now = CACHE_TTL - REFRESH_MARGIN - 1 # still comfortably alive
+    shared.resolve("key-1", key_client)
+    assert key_client.caches.refreshed == 0
+
+    clock.now = CACHE_TTL - REFRESH_MARGIN + 1
+    assert shared.resolve("key-1", key_client).cached_content == name
+    assert key_client.caches.refreshed == 1
+
+    clock.now += CACHE_TTL - REFRESH_MARGIN - 1 # the refresh restarted the ttl
+    shared.resolve("key-1", key_client)
+    assert (key_client.caches.created, key_client.caches.refreshed) == (1, 1)
+
+def test_a_cache_deleted_on_the_server_is_created_again():
+    clock = Clock()
+    shared, key_client = context(clock=clock), client()
+    name = shared.resolve("key-1", key_client).cached_content
+    key_client.caches.delete(name=name)
+
+    clock.now = CACHE_TTL # the refresh fails, a new cache replaces it
+    assert shared.resolve("key-1", key_client).cached_content != name
+    assert key_client.caches.created == 2
+
+def test_every_key_gets_its_own_cache():
+    shared = context()
+    clients = {"key-1": client(), "key-2": client()}
+    for key, key_client in clients.items():
+        name = shared.resolve(key, key_client).cached_content
+        assert key_client.caches.get(name=name) is not None # created with the key that uses it
+    assert [key_client.caches.created for key_client in clients.values()] == [1, 1]
+
+    shared.close()
+    assert all(not key_client.caches.entries for key_client in clients.values())
+
+def test_inline_when_caching_fails():
+    shared, key_client = context(), client(available=False)
+    config = shared.resolve("key-1", key_client)
+    assert config.cached_content is None
+    assert config.system_instruction == f"you build websites\n\n{SUMMARIES}"
+
+    # the key is not asked again, other keys still try
+    shared.resolve("key-1", key_client)
+    assert shared.inline == {"key-1"}
+    assert shared.resolve("key-2", client()).cached_content is not None
+
+def test_inline_below_the_minimum_size():
+    shared, key_client = context("a short summary"), client()
+    config = shared.resolve("key-1", key_client)
+    assert config.cached_content is None
+    assert config.system_instruction == "you build websites\n\na short summary"
+    assert key_client.caches.created == 0
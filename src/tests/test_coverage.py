@@ -0,0 +1,60 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from functions.coverage import CoverageIndex, evaluator_verdict
+from functions.workspace import Workspace
+
+HOME = "<h1>Joe's Bakery</h1><p>Call (555) 010-9999 or mail hello@joes.com</p><p>Visit 12 Baker Street</p>"
+MENU = "<h2>Fresh bread</h2><p>Sourdough every morning</p>"
+
+def crawled() -> CoverageIndex:
+    coverage = CoverageIndex()
+    coverage.add_page("https://joes.com/", BeautifulSoup(HOME, "html.parser"))
+    coverage.add_page("https://joes.com/menu", BeautifulSoup(MENU, "html.parser"))
+    return coverage
+
+def test_complete_build(tmp_path):
+    coverage, workspace = crawled(), Workspace(str(tmp_path / "site"), str(tmp_path / "iterations"))
+    # different markup and formatting, same content
+    workspace.write("index.html", "<header><h1>JOE'S  BAKERY</h1></header><a href='tel:5550109999'>555.010.9999</a>"
+                                  "<p>HELLO@joes.com</p><address>12 Baker Street</address>")
+    workspace.write("menu/index.html", "<h2>Fresh bread</h2>")
+    assert coverage.update(workspace) == 1.0
+    assert coverage.missing() == ""
+    assert coverage.rescanned == 2
+
+    assert coverage.update(workspace) == 1.0
+    assert coverage.rescanned == 0 # nothing changed, nothing scanned
+
+def test_build_with_missing_pages_and_facts(tmp_path):
+    coverage, workspace = crawled(), Workspace(str(tmp_path / "site"), str(tmp_path / "iterations"))
+    workspace.write("index.html", "<h1>Joe's Bakery</h1><p>Call 555-010-9999</p>")
+    score = coverage.update(workspace)
+
+    # 2 pages + 5 facts (phone, email, address, 2 headings), 1 page and 2 facts are there
+    assert score == pytest.approx(3 / 7)
+    missing = coverage.missing()
+    assert "- page https://joes.com/menu -> menu.html" in missing
+    assert "- email: hello@joes.com (from https://joes.com/)" in missing
+    assert "- address: 12 baker street" in missing
+    assert "phone" not in missing
+
+    workspace.write("menu.html", MENU)
+    workspace.write("index.html", HOME)
+    assert coverage.update(workspace) == 1.0
+    assert coverage.rescanned == 2
+
+@pytest.mark.parametrize("feedback, verdict", [
+    ("Looks great.\nVERDICT: PASS", True),
+    ("Fix the nav.\n\n**VERDICT: FAIL**", False),
+    ("verdict: pass\n", True),
+    ("VERDICT: FAIL\nsecond thoughts\nVERDICT: PASS", True), # the last one counts
+    ("Everything is fine, no verdict line", None),
+    ("VERDICT: PASSABLE", None),
+    ("I would say VERDICT: PASS once the footer is fixed", None),
+    ("VERDICT: maybe", None),
+    ("", None),
+    (None, None),
+])
+def test_evaluator_verdict(feedback, verdict):
+    assert evaluator_verdict(feedback) is verdict
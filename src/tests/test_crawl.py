@@ -0,0 +1,66 @@
+import pytest
+
+from functions.crawl_cache import CrawlCache
+from functions.crawler import scrape_website_concurrent
+from functions.web_scraper import scrape_website
+
+HTML = {"Content-Type": "text/html"}
+
+def blog_site(home_link: str) -> dict:
+    return {
+        "/": (200, HTML, f"<a href='{home_link}'>blog</a>"),
+        "/blog": (301, {"Location": "/blog/"}, ""),
+        "/blog/": (200, HTML, "<a href='post-1.html'>post</a>"),
+        "/blog/post-1.html": (200, HTML, "<p>post</p>"),
+    }
+
+@pytest.mark.parametrize("crawl", [scrape_website, scrape_website_concurrent])
+@pytest.mark.parametrize("home_link", ["blog/", "blog"])
+def test_links_resolve_against_the_final_url(serve, crawl, home_link):
+    base = serve(blog_site(home_link))
+    site_map = crawl(base)
+    assert any(url.endswith("/blog/post-1.html") for url in site_map)
+    assert len(site_map) == 3
+
+@pytest.mark.parametrize("crawl", [scrape_website, scrape_website_concurrent])
+def test_only_html_responses_become_pages(serve, crawl, tmp_path):
+    base = serve({
+        "/": (200, {"Content-Type": "text/html; charset=utf-8"},
+              "<a href='menu.pdf'>menu</a> <a href='contact.php'>contact</a> <a href='api/hours'>hours</a> <a href='plain'>plain</a>"),
+        "/menu.pdf": (200, {"Content-Type": "application/pdf", "ETag": '"pdf"'}, b"%PDF-1.4 <a href='/secret'>"),
+        "/contact.php": (200, {"Content-Type": "text/html", "ETag": '"php"'}, "<p>call us</p>"),
+        "/api/hours": (200, {"Content-Type": "application/json"}, '{"open": "9-5"}'),
+        "/plain": (200, {}, "<p>no content type</p>"),
+    })
+    crawl_cache = CrawlCache(str(tmp_path / "crawl_cache"))
+    for _ in range(2): # the second crawl gets 304s, the cache has to remember the content types
+        site_map = crawl(base, crawl_cache=crawl_cache)
+        assert sorted(url.removeprefix(base) for url in site_map) == ["", "contact.php", "plain"]
+    assert sorted(serve.revalidated) == ["/contact.php", "/menu.pdf"]
+
+@pytest.mark.parametrize("crawl", [scrape_website, scrape_website_concurrent])
+def test_changed_stylesheets_are_picked_up(serve, crawl, tmp_path):
+    routes = {
+        "/": (200, HTML, "<link rel='stylesheet' href='/site.css'><p>home</p>"),
+        "/site.css": (200, {"Content-Type": "text/css", "ETag": '"v1"'}, "p{color:red}"),
+    }
+    base = serve(routes)
+    crawl_cache = CrawlCache(str(tmp_path / "crawl_cache"))
+    assert list(crawl(base, crawl_cache=crawl_cache).stylesheets.values()) == ["p{color:red}"]
+    assert list(crawl(base, crawl_cache=crawl_cache).stylesheets.values()) == ["p{color:red}"] # 304, from disk
+    routes["/site.css"] = (200, {"Content-Type": "text/css", "ETag": '"v2"'}, "p{color:blue}")
+    assert list(crawl(base, crawl_cache=crawl_cache).stylesheets.values()) == ["p{color:blue}"]
+    assert serve.revalidated.count("/site.css") == 1
+
+@pytest.mark.parametrize("crawl", [scrape_website, scrape_website_concurrent])
+def test_malformed_links_are_skipped(serve, crawl):
+    base = serve({
+        "/": (200, HTML, "<a href='http://127.0.0.1:8000:80/x'>bad port</a> <a href='http://127.0.0.1:abc/'>bad port</a>"
+                         "<a href='http://[oops/'>bad host</a> <link rel='stylesheet' href='http://[oops/site.css'>"
+                         "<link rel='stylesheet' href='http://127.0.0.1:abc/site.css'><img src='http://[oops/a.png'>"
+                         "<a href='about.html'>about</a>"),
+        "/about.html": (200, HTML, "<p>about</p>"),
+    })
+    site_map = crawl(base)
+    assert sorted(url.removeprefix(base) for url in site_map) == ["", "about.html"]
+    assert site_map[base]["images"] == []
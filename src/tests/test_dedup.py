@@ -0,0 +1,35 @@
+from functions.dedup import NearDuplicateIndex, merge_paragraphs
+
+BRANCH = ("Our {city} branch is open Monday to Friday from nine to five and on Saturday mornings, "
+          "with free parking behind the building and a team that is happy to help with any question. "
+          "Call us on {phone} or write to {email}.")
+
+def test_paragraphs_differing_in_a_phone_number_are_kept():
+    first = BRANCH.format(city="Town", phone="555-0101", email="town@example.com")
+    second = BRANCH.format(city="Town", phone="555-0199", email="town@example.com")
+    assert merge_paragraphs(f"{first}\n\n{second}") == f"{first}\n\n{second}"
+
+def test_paragraphs_differing_in_an_email_are_kept():
+    first = BRANCH.format(city="Town", phone="555-0101", email="town@example.com")
+    second = BRANCH.format(city="Town", phone="555-0101", email="sales@example.com")
+    assert merge_paragraphs(f"{first}\n\n{second}") == f"{first}\n\n{second}"
+
+def test_repeats_are_merged():
+    first = BRANCH.format(city="Town", phone="555-0101", email="town@example.com")
+    reworded = first.replace("happy to help", "glad to help")
+    assert merge_paragraphs(f"{first}\n\n{first.upper()}\n\n{reworded}") == first
+
+def test_exact_only_index():
+    index = NearDuplicateIndex(max_distance=None)
+    first = BRANCH.format(city="Town", phone="555-0101", email="town@example.com")
+    assert not index.seen(first)
+    assert index.seen(f"  {first}  ")
+    assert not index.seen(first.replace("happy to help", "glad to help"))
+
+def test_repeated_headings_keep_their_sections():
+    summary = ("**Contact**\n\nPhone: 555-0101\n\n## Opening hours\n\nMonday to Friday\n\n"
+               "**Contact**\n\nPhone: 555-0199\n\n## Opening hours\n\nMonday to Friday")
+    merged = merge_paragraphs(summary)
+    assert merged == summary # short repeats are not merged either, they belong to their section
+    assert merged.count("**Contact**") == 2
+    assert merged.index("555-0199") > merged.rindex("**Contact**")
@@ -0,0 +1,68 @@
+import pytest
+
+from functions.patch_file import apply_edits, apply_unified_diff, patch_file
+from functions.read_file_range import read_file_range
+
+CSS = ":root {\n--a: red;\n--b: blue;\n}\nbody { color: var(--a); }\n"
+
+def test_edits_replace_exact_matches():
+    text = apply_edits(CSS, [{"old_text": "--b: blue;", "new_text": "--b: navy;"},
+                             {"old_text": "body {", "new_text": "main {"}])
+    assert text == ":root {\n--a: red;\n--b: navy;\n}\nmain { color: var(--a); }\n"
+
+@pytest.mark.parametrize("old_text, message", [
+    ("--a", "matches 2 times"),
+    ("--c: green;", "not found"),
+    ("", "old_text is empty"),
+])
+def test_edits_refuse_ambiguous_or_missing_text(old_text, message):
+    with pytest.raises(ValueError, match=message):
+        apply_edits(CSS, [{"old_text": old_text, "new_text": "x"}])
+
+def test_diff_with_several_hunks():
+    text = "\n".join(f"line {number}" for number in range(1, 21)) + "\n"
+    diff = ("--- a/page.html\n+++ b/page.html\n"
+            "@@ -2,3 +2,3 @@\n line 2\n-line 3\n+line three\n line 4\n"
+            "@@ -15,2 +15,3 @@\n line 15\n+line 15.5\n line 16\n")
+    lines = apply_unified_diff(text, diff).splitlines()
+    assert lines[1:4] == ["line 2", "line three", "line 4"]
+    assert lines[14:17] == ["line 15", "line 15.5", "line 16"]
+    assert len(lines) == 21
+
+def test_diff_removes_a_line_starting_with_dashes():
+    diff = "@@ -2,1 +2,1 @@\n---a: red;\n+--a: blue;\n"
+    assert apply_unified_diff(CSS, diff) == CSS.replace("--a: red;", "--a: blue;")
+    with_context = "@@ -1,3 +1,3 @@\n :root {\n---a: red;\n+--a: blue;\n --b: blue;\n\\ No newline at end of file\n"
+    assert apply_unified_diff(CSS, with_context) == CSS.replace("--a: red;", "--a: blue;")
+
+def test_diff_with_unknown_context_fails():
+    with pytest.raises(ValueError, match="hunk 1"):
+        apply_unified_diff(CSS, "@@ -2,1 +2,1 @@\n--c: green;\n+--c: lime;\n")
+    with pytest.raises(ValueError, match="no @@ hunks"):
+        apply_unified_diff(CSS, "--- a/x\n+++ b/x\n")
+
+def test_patch_file_leaves_the_file_alone_on_error(tmp_path):
+    (tmp_path / "style.css").write_text(CSS)
+    assert "error" in patch_file(str(tmp_path), "style.css", edits=[{"old_text": "--a", "new_text": "--z"}])
+    assert (tmp_path / "style.css").read_text() == CSS
+    assert patch_file(str(tmp_path), "style.css", diff="@@ -3,1 +3,1 @@\n---b: blue;\n+--b: navy;\n")["success"]
+    assert (tmp_path / "style.css").read_text() == CSS.replace("blue;\n}", "navy;\n}")
+    assert "not a valid file" in patch_file(str(tmp_path), "../outside.css", edits=[{"old_text": "a", "new_text": "b"}])
+
+def test_read_file_range_pages_through_lines(tmp_path):
+    (tmp_path / "page.html").write_text("\n".join(f"line {number}" for number in range(1, 11)))
+    window = read_file_range(str(tmp_path), "page.html", start_line=9, end_line=50)
+    assert window["content"] == "9: line 9\n10: line 10\n"
+    assert (window["end_line"], window["next_start_line"], window["total_lines"]) == (10, None, 10)
+
+    window = read_file_range(str(tmp_path), "page.html", start_line=2, end_line=3)
+    assert window["content"] == "2: line 2\n3: line 3\n" and window["next_start_line"] == 4
+
+    assert "past the end" in read_file_range(str(tmp_path), "page.html", start_line=11)["error"]
+    assert "not a file" in read_file_range(str(tmp_path), "missing.html")["error"]
+
+def test_read_file_range_character_window(tmp_path):
+    (tmp_path / "page.html").write_text("abcdefghij")
+    assert read_file_range(str(tmp_path), "page.html", offset=4, max_chars=3) == {
+        "content": "efg", "offset": 4, "next_offset": 7, "total_chars": 10}
+    assert read_file_range(str(tmp_path), "page.html", offset=8)["next_offset"] is None
@@ -0,0 +1,54 @@
+from functions.local_checks import ERROR, WARNING, LocalChecker, expected_page, has_errors
+
+HEAD = '<head><meta name="viewport" content="width=device-width, initial-scale=1"><link rel="stylesheet" href="/css/style.css"></head>'
+
+def page(body: str) -> str:
+    return f"<html>{HEAD}<body>{body}</body></html>"
+
+def checks(findings) -> list:
+    return sorted((finding.severity, finding.check, finding.file, finding.line) for finding in findings)
+
+def test_a_clean_site_passes():
+    files = {
+        "index.html": page("<nav><a href='about.html'>about</a> <a href='/blog/'>blog</a> <a href='#top'>top</a></nav><p>home<p>more"),
+        "about.html": page("<a href='index.html'>home</a> <a href='https://example.com'>elsewhere</a>"),
+        "blog/index.html": page("<a href='../about'>about</a><br><img src='/img/logo.png' alt=''>"),
+        "img/logo.png": "",
+        "css/style.css": "nav a{color:red}p{margin:0}",
+    }
+    findings = LocalChecker().run(files, ["https://site.com/", "https://site.com/about", "https://site.com/blog/"])
+    assert checks(findings) == []
+
+def test_tag_balance():
+    html = page("<div>\n<section>\n<p>text\n</div>\n</span>\n<ul><li>one<li>two</ul>")
+    findings = LocalChecker().run({"index.html": html, "css/style.css": ""})
+    assert checks(findings) == [(ERROR, "unclosed-tag", "index.html", 2), (ERROR, "unclosed-tag", "index.html", 5)]
+    assert "<section> is never closed" in str(findings[0])
+    assert "</span> closes nothing" in str(findings[1])
+
+def test_broken_links_and_missing_files():
+    html = page("<a href='contact.html'>contact</a>\n<img src='img/missing.png'>\n<a href='mailto:hi@site.com'>mail</a>")
+    findings = LocalChecker().run({"index.html": html})
+    assert checks(findings) == [(ERROR, "broken-link", "index.html", 1), (ERROR, "missing-file", "index.html", 1),
+                                (ERROR, "missing-file", "index.html", 2)]
+    assert has_errors(findings)
+
+def test_missing_pages_are_warnings():
+    files = {"index.html": page(""), "css/style.css": ""}
+    findings = LocalChecker().run(files, ["https://site.com/", "https://site.com/menu.php", "https://site.com/team/"])
+    assert checks(findings) == [(WARNING, "missing-page", "menu.html", None), (WARNING, "missing-page", "team.html", None)]
+    assert not has_errors(findings) # agent 4 still gets to review a partial rebuild
+
+def test_expected_page():
+    assert expected_page("https://site.com") == "index.html"
+    assert expected_page("https://site.com/about/") == "about.html"
+    assert expected_page("https://site.com/a/b.php?x=1") == "a/b.html"
+
+def test_pages_are_parsed_once_per_content():
+    checker = LocalChecker()
+    checker.add("index.html", page("<p>home</p>"))
+    parsed = dict(checker.pages)
+    checker.run({"index.html": page("<p>home</p>"), "css/style.css": ""})
+    assert checker.pages == parsed # reused, not parsed again
+    checker.run({"index.html": page("<p>changed</p>"), "css/style.css": ""})
+    assert len(checker.pages) == 1 and checker.pages != parsed # the old version is dropped
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from google.genai import types
+
+from functions.crawler import AsyncCrawler
+from functions.css_cache import StylesheetCache
+from functions.pipeline import Summarizer, stream_summaries
+from functions.preprocess import ContentView, StyleView
+
+HTML = {"Content-Type": "text/html"}
+CSS = {"Content-Type": "text/css"}
+
+def shop_site(sections=4, products=5) -> dict:
+    """a home page linking to sections, each linking to products, every page with the same nav and stylesheet"""
+    nav = "<nav>" + "".join(f"<a href='/s{s}/'>section {s}</a>" for s in range(sections)) + "</nav>"
+    head = "<head><link rel='stylesheet' href='/site.css'></head>"
+    routes = {
+        "/": (200, HTML, f"<html>{head}<body>{nav}<h1>shop</h1><p class='intro'>welcome</p></body></html>"),
+        "/site.css": (200, CSS, "nav a{color:red}.intro{margin:0}.price{font-weight:bold}.unused{top:0}"),
+    }
+    for s in range(sections):
+        links = "".join(f"<li><a href='/s{s}/p{p}.html'>product {p}</a></li>" for p in range(products))
+        routes[f"/s{s}/"] = (200, HTML, f"<html>{head}<body>{nav}<h1>section {s}</h1><ul>{links}</ul></body></html>")
+        for p in range(products):
+            routes[f"/s{s}/p{p}.html"] = (200, HTML, f"<html>{head}<body>{nav}<h2>product {s}.{p}</h2>"
+                                                     f"<p class='price'>{s * 10 + p} euro</p><p>{'details ' * 40}</p></body></html>")
+    return routes
+
+class RecordingClient:
+    """stands in for genai.Client, remembers every prompt it was sent"""
+
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, model, contents, config=None):
+        with self.lock:
+            self.prompts.append(contents[0])
+        return types.GenerateContentResponse(candidates=[types.Candidate(
+            content=types.Content(role="model", parts=[types.Part(text="summary")]))])
+
+def crawl_chunks(base: str) -> list:
+    """every chunk each summarizer was sent, after one crawl of the site"""
+    clients = [RecordingClient(), RecordingClient()]
+    summarizers = [Summarizer("content", clients[0], "model", None, ContentView(), chunk_tokens=300),
+                   Summarizer("style", clients[1], "model", None, StyleView(), chunk_tokens=300)]
+    crawler = AsyncCrawler(base, max_pages=30, css_cache=StylesheetCache(), parse_workers=0)
+    asyncio.run(stream_summaries(crawler, "style", summarizers))
+    return [sorted(client.prompts) for client in clients]
+
+def test_chunks_do_not_depend_on_network_timing(serve):
+    base = serve(shop_site(), delay=0.05)
+    first = crawl_chunks(base)
+    second = crawl_chunks(base)
+    assert len(first[0]) > 1 # several chunks, so packing across pages is exercised
+    assert first == second
@@ -0,0 +1,127 @@
+import pytest
+from types import SimpleNamespace
+
+from google.genai import types
+
+import functions.api as api
+import functions.key_pool as key_pool
+import functions.trace as trace
+from functions.api import api_call_with_retry
+from functions.key_pool import KeyPool
+from functions.rate_limit import DEFAULT_LIMIT, RateLimiter, TokenBucket, limiter_for, parse_rate_limits, rate_limit
+from functions.trace import Tracer
+
+class FakeClock:
+    """monotonic() and sleep() of a clock that only moves when something sleeps"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+class FakeClient:
+    """stands in for genai.Client, raises the queued errors first, then answers with `tokens` of usage"""
+
+    def __init__(self, errors=(), tokens=100):
+        self.errors = list(errors)
+        self.tokens = tokens
+        self.calls = 0
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text="ok")]))],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(total_token_count=self.tokens))
+
+def test_bucket_waits_only_for_the_missing_units():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock.monotonic) # one unit per second
+    assert bucket.reserve(60) == 0
+    assert bucket.delay(1) == pytest.approx(1)
+    assert bucket.reserve(3) == pytest.approx(3) # booked anyway, the caller sleeps
+    clock.sleep(3)
+    assert bucket.delay(1) == pytest.approx(1)
+    clock.sleep(600)
+    assert bucket.reserve(60) == 0 # refills up to its capacity only
+    assert bucket.delay(1) == pytest.approx(1)
+
+def test_limiter_corrects_estimates_and_pauses():
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=60, tpm=600, clock=clock.monotonic)
+    assert limiter.reserve(100) == 0
+    limiter.record(100, 600) # the request was much bigger than estimated
+    assert limiter.delay(100) == pytest.approx(10) # the budget is used up, 100 tokens come back in 10 s
+    assert (limiter.request_count, limiter.token_count) == (1, 600)
+
+    clock.sleep(60)
+    limiter.pause(30)
+    assert limiter.delay(1) == pytest.approx(30)
+    clock.sleep(30)
+    assert limiter.delay(1) == 0
+
+def test_rate_limits_from_the_environment(monkeypatch):
+    monkeypatch.setenv("RATE_LIMITS", "gemini-2.5-flash=1000:2000000, *=500:900000")
+    assert rate_limit("gemini-2.5-flash") == (1000, 2_000_000)
+    assert rate_limit("gemini-2.0-flash") == (500, 900_000)
+    limiter = limiter_for("env-key", "gemini-2.5-flash")
+    assert limiter.requests.rate == pytest.approx(1000 / 60)
+
+    monkeypatch.delenv("RATE_LIMITS")
+    assert rate_limit("some-new-model") == DEFAULT_LIMIT
+    assert parse_rate_limits("") == {}
+    with pytest.raises(ValueError, match="model=rpm:tpm"):
+        parse_rate_limits("gemini-2.5-flash=1000")
+
+def test_retry_waits_for_the_server_hint(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(api, "time", clock)
+    limiter = RateLimiter(rpm=60, tpm=100_000, clock=clock.monotonic)
+    client = FakeClient(errors=[Exception("429 RESOURCE_EXHAUSTED {'retryDelay': '7s'}")])
+
+    response = api_call_with_retry(client=client, contents=["hello"], model="model", limiter=limiter)
+    assert response.text == "ok"
+    assert client.calls == 2
+    assert clock.slept == [pytest.approx(7)] # the hint, not the exponential fallback
+    assert (limiter.request_count, limiter.token_count) == (2, 100) # the rejected try costs no tokens
+
+def test_pool_moves_a_rejected_request_to_the_next_key(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(key_pool, "time", clock)
+    clients = {"pool-key-0001": FakeClient(errors=[Exception("429 RESOURCE_EXHAUSTED")]), "pool-key-0002": FakeClient()}
+    for key in clients:
+        limiter_for(key, "model", rpm=60, tpm=100_000, clock=clock.monotonic)
+    pool = KeyPool(list(clients), make_client=clients.get)
+
+    assert pool.models.generate_content(model="model", contents=["hello"]).text == "ok"
+    assert [client.calls for client in clients.values()] == [1, 1]
+    assert clock.slept == [] # the second key had quota, nobody waited
+    assert limiter_for("pool-key-0001", "model").delay(1) == pytest.approx(key_pool.RETRY_PAUSE)
+
+def test_quota_waits_are_not_timed_as_api_calls(monkeypatch):
+    clock = FakeClock()
+    for module in (api, key_pool):
+        monkeypatch.setattr(module, "time", clock)
+    monkeypatch.setattr(trace, "time", SimpleNamespace(perf_counter=clock.monotonic, time=lambda: 0.0)) # spans see the fake clock
+    monkeypatch.setattr(trace, "tracer", Tracer())
+
+    limiter = RateLimiter(rpm=60, tpm=100_000, clock=clock.monotonic)
+    limiter.pause(5)
+    api_call_with_retry(client=FakeClient(), contents=["hello"], model="model", limiter=limiter)
+
+    limiter_for("span-key-0001", "model", rpm=60, tpm=100_000, clock=clock.monotonic).pause(7)
+    pool = KeyPool(["span-key-0001"], make_client=lambda key: FakeClient())
+    api_call_with_retry(client=pool, contents=["hello"], model="model")
+
+    assert clock.slept == [pytest.approx(5), pytest.approx(7)]
+    assert trace.tracer.spans["quota wait"][:2] == [2, pytest.approx(12)]
+    assert trace.tracer.spans["api call"][:2] == [2, 0.0] # one span per request, the pool's included, no waiting in it
+    assert trace.tracer.counters["api.quota_wait_s"] == pytest.approx(12)
@@ -0,0 +1,84 @@
+import json
+from types import SimpleNamespace
+
+from google.genai import types
+
+import functions.response_cache as response_cache
+from functions.response_cache import ResponseCache, cache_key
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class FakeClient:
+    """stands in for genai.Client, answers every request with its own number"""
+
+    def __init__(self):
+        self.calls = 0
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=f"answer {self.calls}")]))])
+
+def entry_size(text: str) -> int:
+    return len(json.dumps({"created": Clock().now, "text": text}))
+
+def test_repeated_requests_are_answered_from_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "api_call_with_retry", lambda client, **kwargs: client.models.generate_content(**kwargs))
+    cache, client = ResponseCache(str(tmp_path), clock=Clock()), FakeClient()
+    config = types.GenerateContentConfig(system_instruction="summarize")
+
+    assert cache.call(client, "model", ["page one"], config).text == "answer 1"
+    assert cache.call(client, "model", ["page one"], config).text == "answer 1"
+    assert cache.call(client, "model", ["page two"], config).text == "answer 2"
+    other = types.GenerateContentConfig(system_instruction="translate") # the config is part of the request
+    assert cache.call(client, "model", ["page one"], other).text == "answer 3"
+    assert client.calls == 3
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert cache.report() == "response cache: 1 hits, 3 misses (25% hit rate)"
+
+    # a new run reads what the last one stored
+    reopened = ResponseCache(str(tmp_path), clock=Clock())
+    assert reopened.get(cache_key("model", ["page two"], config)) == "answer 2"
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    clock = Clock()
+    cache = ResponseCache(str(tmp_path), max_bytes=2 * entry_size("a"), clock=clock)
+    cache.put("a", "a")
+    clock.now += 1
+    cache.put("b", "b")
+    clock.now += 1
+    assert cache.get("a") == "a" # a is now more recent than b
+    clock.now += 1
+    cache.put("c", "c")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("a", "c")
+    assert cache.size == 2 * entry_size("a")
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.json", "c.json"]
+
+    # the order survives a restart, it lives in the file mtimes
+    clock.now += 1
+    cache.get("a")
+    reopened = ResponseCache(str(tmp_path), max_bytes=2 * entry_size("a"), clock=clock)
+    clock.now += 1
+    reopened.put("d", "d")
+    assert (reopened.get("c"), reopened.get("a")) == (None, "a")
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    clock = Clock()
+    cache = ResponseCache(str(tmp_path), ttl=60, clock=clock)
+    cache.put("key", "text")
+
+    clock.now += 60
+    assert cache.get("key") == "text" # reading does not make an entry younger
+    clock.now += 1
+    assert cache.get("key") is None
+    assert cache.size == 0 and not list(tmp_path.iterdir())
+
+    assert ResponseCache(str(tmp_path)).get("key") is None
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+from google.genai import types
+
+from functions.call_functions import execute_function_call
+from functions.workspace import close_workspace, open_workspace
+
+def call(site, name, **args):
+    return execute_function_call(types.FunctionCall(name=name, args=args), str(site))
+
+@pytest.fixture
+def workspace(tmp_path):
+    site = tmp_path / "site"
+    site.mkdir()
+    (site / "index.html").write_text("<p>old home</p>")
+    workspace = open_workspace(str(site), str(tmp_path / "iterations"))
+    yield workspace
+    close_workspace(workspace)
+
+def test_tools_go_through_the_workspace(workspace):
+    site = workspace.root
+    assert call(site, "create_file", filepath="css/style.css", content="p{color:red}")["success"]
+    assert call(site, "write_file", filepath="index.html", content="<p>new home</p>") == ""
+    assert call(site, "patch_file", filepath="css/style.css", edits=[{"old_text": "red", "new_text": "blue"}])["success"]
+    assert call(site, "create_file", filepath="empty.html", content=None)["success"]
+
+    # nothing reached the disk yet, the tools still see every change
+    assert open(os.path.join(site, "index.html")).read() == "<p>old home</p>"
+    assert not os.path.exists(os.path.join(site, "css"))
+    assert call(site, "read_file_contents", filepath="css/style.css") == "p{color:blue}"
+    assert call(site, "read_file_range", filepath="index.html")["content"] == "1: <p>new home</p>\n"
+    assert call(site, "get_files_info")["css"]["is_dir"]
+    assert call(site, "get_files_info", directory="css") == {"style.css": {"is_dir": False, "file_size": 13}}
+    assert workspace.read("empty.html") == ""
+
+    workspace.flush()
+    assert open(os.path.join(site, "index.html")).read() == "<p>new home</p>"
+    assert open(os.path.join(site, "css", "style.css")).read() == "p{color:blue}"
+    assert workspace.dirty == set()
+
+def test_snapshots_share_unchanged_blobs(workspace):
+    workspace.write("style.css", "p{color:red}")
+    first = json.load(open(workspace.snapshot("iteration_1")))
+    workspace.write("index.html", "<p>new home</p>")
+    second = json.load(open(workspace.snapshot("iteration_2")))
+
+    assert first["style.css"] == second["style.css"]
+    assert first["index.html"] != second["index.html"]
+    assert len(os.listdir(os.path.join(workspace.snapshot_dir, "blobs"))) == 3 # two files, one of them twice
+
+def test_restore_undoes_a_failed_turn(workspace):
+    workspace.write("about.html", "<p>about</p>")
+    workspace.flush()
+    workspace.snapshot("iteration_1")
+
+    # a turn that broke a page and added a file before it failed
+    workspace.write("about.html", "<p>broken")
+    workspace.write("stray.html", "<p>half done</p>")
+    workspace.flush()
+
+    workspace.restore("iteration_1")
+    site = workspace.root
+    assert workspace.read("about.html") == "<p>about</p>"
+    assert not workspace.isfile("stray.html")
+    assert open(os.path.join(site, "about.html")).read() == "<p>about</p>"
+    assert not os.path.exists(os.path.join(site, "stray.html"))
+    assert open(os.path.join(site, "index.html")).read() == "<p>old home</p>"
+
+def test_flush_only_writes_changed_files(workspace):
+    index = os.path.join(workspace.root, "index.html")
+    os.utime(index, (0, 0))
+    workspace.write("index.html", "<p>old home</p>") # same content, nothing to write
+    workspace.write("new.html", "<p>new</p>")
+    workspace.flush()
+
+    assert os.path.getmtime(index) == 0
+    assert open(os.path.join(workspace.root, "new.html")).read() == "<p>new</p>"
+    assert not [name for name in os.listdir(workspace.root) if name.endswith(".tmp")]
+
+def test_create_file_without_content_on_disk(tmp_path):
+    assert call(tmp_path, "create_file", filepath="blank.html", content=None)["success"]
+    assert (tmp_path / "blank.html").read_text() == ""